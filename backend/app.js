@@ -3,12 +3,122 @@ const bodyParser = require('body-parser');
 const cors = require('cors');
 const { spawn } = require('child_process');
 const path = require('path');
+const PythonWorker = require('./python_worker');
 
 const app = express();
 const PORT = process.env.PORT || 3008;
 
+// Worker Python thường trực: nạp mô hình một lần, dùng lại cho mọi request
+const pythonWorker = new PythonWorker();
+
+// Tham số mà /cocomo/monte-carlo chuyển sang Python
+const MONTE_CARLO_FIELDS = [
+  'size', 'mode', 'iterations', 'seed', 'sampler', 'workers', 'streaming', 'maxIterations',
+  'batchSize', 'tolerance', 'histogramBins', 'formulaOnly', 'timings'
+];
+
+// Tham số mô tả một dự án COCOMO II chi tiết
+const PROJECT_FIELDS = ['size', 'sizingMethod', 'unadjustedFP', 'scaleDrivers', 'costDrivers', 'sced', 'rcpx'];
+
+// Tham số mà /cocomo/sensitivity chuyển sang Python
+const SENSITIVITY_FIELDS = [...PROJECT_FIELDS, 'pairwise', 'top', 'formulaOnly', 'timings'];
+
+// Số cặp driver tối đa (21 driver)
+const MAX_TOP_PAIRS = 210;
+
+// Tham số mà /cocomo/optimize chuyển sang Python
+const OPTIMIZE_FIELDS = [
+  ...PROJECT_FIELDS, 'target', 'maxChanges', 'beamWidth', 'solutions', 'locked', 'formulaOnly', 'timings'
+];
+
+// Mỗi bước beam search dự đoán beamWidth * 21 driver * 5 mức hàng
+const MAX_BEAM_WIDTH = 256;
+const MAX_CHANGES = 21;
+const MAX_SOLUTIONS = 50;
+
+// Tham số mà /cocomo/portfolio chuyển sang Python, và của từng dự án trong danh mục
+const PORTFOLIO_FIELDS = ['iterations', 'correlation', 'chunkSize', 'costPerPM', 'seed', 'formulaOnly', 'timings'];
+const PORTFOLIO_PROJECT_FIELDS = [...PROJECT_FIELDS, 'id', 'start'];
+
+// Mỗi lần lặp mô phỏng mọi dự án: giới hạn số dự án và tổng số hàng (lần lặp x dự án)
+const MAX_PORTFOLIO_PROJECTS = 200;
+const MAX_PORTFOLIO_ITERATIONS = 100000;
+const MAX_PORTFOLIO_ROWS = 2000000;
+const MAX_CHUNK_SIZE = 100000;
+
+// Chỉ giữ các trường được liệt kê của body
+function pick(body, fields) {
+  const picked = {};
+  for (const field of fields) {
+    if (body[field] !== undefined) {
+      picked[field] = body[field];
+    }
+  }
+  return picked;
+}
+
+// Giới hạn một tham số nguyên trong [min, max]; để trống thì Python dùng giá trị mặc định,
+// giá trị không phải số được chuyển nguyên để Python báo lỗi
+function clamp(params, field, max, min = 1) {
+  const value = Math.floor(Number(params[field]));
+  if (params[field] !== undefined && Number.isFinite(value)) {
+    params[field] = Math.min(Math.max(value, min), max);
+  }
+  return params;
+}
+
 // Middleware
 app.use(cors());
+
+// API endpoint ước tính hàng loạt: nhận mảng JSON, JSONL hoặc CSV, trả về JSONL.
+// Đăng ký trước bodyParser.json để body được chuyển thẳng sang Python mà không bị đọc vào bộ nhớ.
+app.post('/cocomo/batch', (req, res) => {
+  let format = 'json';
+  if (req.is('text/csv')) {
+    format = 'csv';
+  } else if (req.is('application/x-ndjson') || req.is('application/jsonl')) {
+    format = 'jsonl';
+  }
+
+  const python = spawn('python', [
+    path.join(__dirname, 'ml_models', 'predict_batch.py'),
+    '--format', format
+  ]);
+
+  let errorString = '';
+
+  python.stdout.on('data', (data) => {
+    if (!res.headersSent) {
+      res.status(200).type('application/x-ndjson');
+    }
+    res.write(data);
+  });
+
+  python.stderr.on('data', (data) => {
+    errorString += data.toString();
+    console.error(`Python Error: ${data}`);
+  });
+
+  python.on('close', (code) => {
+    if (code !== 0 && !res.headersSent) {
+      return res.status(500).json({
+        success: false,
+        error: errorString.trim() || `Python process exited with code ${code}`
+      });
+    }
+    res.end();
+  });
+
+  // Nếu client ngắt kết nối thì dừng tiến trình Python
+  res.on('close', () => {
+    if (python.exitCode === null) {
+      python.kill();
+    }
+  });
+
+  req.pipe(python.stdin);
+});
+
 app.use(bodyParser.json());
 
 // Trang chủ
@@ -26,53 +136,28 @@ app.post('/predict', (req, res) => {
   try {
     const { softwareSize, mode, reliability = 1.15, complexity = 1.30 } = req.body;
     
-    // Gọi script Python để thực hiện dự đoán
-    const python = spawn('python', [
-      path.join(__dirname, 'ml_models', 'predict_basic.py'),
-      softwareSize.toString(),
-      mode,
-      reliability.toString(),
-      complexity.toString()
-    ]);
-    
-    let dataString = '';
-    
-    // Nhận dữ liệu từ quá trình Python
-    python.stdout.on('data', (data) => {
-      dataString += data.toString();
-    });
-    
-    // Xử lý lỗi từ quá trình Python
-    python.stderr.on('data', (data) => {
-      console.error(`Python Error: ${data}`);
-    });
-    
-    // Khi quá trình Python kết thúc
-    python.on('close', (code) => {
-      if (code !== 0) {
-        return res.status(500).json({
-          success: false,
-          error: `Python process exited with code ${code}`
-        });
-      }
-      
-      try {
-        const results = JSON.parse(dataString);
-        
+    // Gọi worker Python để thực hiện dự đoán
+    pythonWorker.request('basic', {
+      size: softwareSize,
+      mode: mode,
+      reliability: reliability,
+      complexity: complexity
+    })
+      .then((results) => {
         res.json({
           success: true,
           prediction: results.effort,
           schedule: results.schedule,
           teamSize: results.teamSize
         });
-      } catch (error) {
-        console.error('Error parsing Python output:', error);
+      })
+      .catch((error) => {
+        console.error('Error in Python prediction:', error);
         res.status(500).json({
           success: false,
-          error: 'Error parsing prediction results'
+          error: error.message || 'Error calculating effort'
         });
-      }
-    });
+      });
   } catch (error) {
     console.error('Error calculating effort:', error);
     res.status(500).json({
@@ -137,62 +222,53 @@ app.post('/cocomo/detailed', (req, res) => {
       unadjustedFP = 0,
       sced = 0, 
       rcpx = 0,
-      riskAnalysis = false 
+      riskAnalysis = false,
+      iterations,
+      chunkSize,
+      nJobs,
+      seed,
+      streaming,
+      tolerance,
+      interactive,
+      gridMaxError,
+      timings,
+      sampler
     } = req.body;
     
-    // Chuẩn bị tham số cho script Python
-    const pythonArgs = [
-      path.join(__dirname, 'ml_models', 'predict_advanced.py'),
-      JSON.stringify({
-        size: size,
-        sizingMethod: sizingMethod,
-        scaleDrivers: scaleDrivers,
-        costDrivers: costDrivers,
-        unadjustedFP: unadjustedFP,
-        sced: sced,
-        rcpx: rcpx,
-        riskAnalysis: riskAnalysis
-      })
-    ];
-    
-    // Gọi script Python để thực hiện dự đoán với mô hình ML
-    const python = spawn('python', pythonArgs);
-    
-    let dataString = '';
-    
-    // Nhận dữ liệu từ quá trình Python
-    python.stdout.on('data', (data) => {
-      dataString += data.toString();
-    });
-    
-    // Xử lý lỗi từ quá trình Python
-    python.stderr.on('data', (data) => {
-      console.error(`Python Error: ${data}`);
-    });
-    
-    // Khi quá trình Python kết thúc
-    python.on('close', (code) => {
-      if (code !== 0) {
-        return res.status(500).json({
-          success: false,
-          error: `Python process exited with code ${code}`
-        });
-      }
-      
-      try {
-        const results = JSON.parse(dataString);
+    // Gọi worker Python để thực hiện dự đoán với mô hình ML
+    pythonWorker.request('advanced', {
+      size: size,
+      sizingMethod: sizingMethod,
+      scaleDrivers: scaleDrivers,
+      costDrivers: costDrivers,
+      unadjustedFP: unadjustedFP,
+      sced: sced,
+      rcpx: rcpx,
+      riskAnalysis: riskAnalysis,
+      iterations: iterations,
+      chunkSize: chunkSize,
+      nJobs: nJobs,
+      seed: seed,
+      streaming: streaming,
+      tolerance: tolerance,
+      interactive: interactive,
+      gridMaxError: gridMaxError,
+      timings: timings,
+      sampler: sampler
+    })
+      .then((results) => {
         res.json({
           success: true,
           result: results
         });
-      } catch (error) {
-        console.error('Error parsing Python output:', error);
+      })
+      .catch((error) => {
+        console.error('Error in Python prediction:', error);
         res.status(500).json({
           success: false,
-          error: 'Error parsing prediction results'
+          error: error.message || 'Error calculating effort'
         });
-      }
-    });
+      });
   } catch (error) {
     console.error('Error calculating detailed COCOMO:', error);
     res.status(500).json({
@@ -205,51 +281,179 @@ app.post('/cocomo/detailed', (req, res) => {
 // API endpoint cho phân tích Monte Carlo
 app.post('/cocomo/monte-carlo', (req, res) => {
   try {
-    const pythonArgs = [
-      path.join(__dirname, 'ml_models', 'monte_carlo.py'),
-      JSON.stringify(req.body)
-    ];
-    
-    // Gọi script Python để thực hiện phân tích Monte Carlo
-    const python = spawn('python', pythonArgs);
-    
-    let dataString = '';
-    
-    python.stdout.on('data', (data) => {
-      dataString += data.toString();
+    // Chỉ chuyển các tham số mô phỏng đã biết; không cho client HTTP chọn đường dẫn ghi file mẫu
+    // trên server (samplesOut) hay ghi file profile. Số worker bị giới hạn ở phía Python.
+    const params = pick(req.body, MONTE_CARLO_FIELDS);
+
+    // Gọi worker Python để thực hiện phân tích Monte Carlo
+    pythonWorker.request('monte-carlo', params)
+      .then((results) => {
+        res.json({
+          success: true,
+          analysis: results
+        });
+      })
+      .catch((error) => {
+        console.error('Error in Python Monte Carlo analysis:', error);
+        res.status(500).json({
+          success: false,
+          error: error.message || 'Error in risk analysis'
+        });
+      });
+  } catch (error) {
+    console.error('Error in Monte Carlo analysis:', error);
+    res.status(500).json({
+      success: false,
+      error: error.message || 'Error in risk analysis'
     });
-    
-    python.stderr.on('data', (data) => {
-      console.error(`Python Error: ${data}`);
+  }
+});
+
+// API endpoint cho phân tích độ nhạy (tornado): đổi từng driver qua mọi mức, tùy chọn thêm từng cặp driver
+app.post('/cocomo/sensitivity', (req, res) => {
+  try {
+    // Chỉ chuyển các tham số đã biết; worker dùng chung cho mọi request
+    const params = clamp(pick(req.body, SENSITIVITY_FIELDS), 'top', MAX_TOP_PAIRS);
+
+    // Gọi worker Python: mọi biến thể được dự đoán trong một lần gọi mô hình
+    pythonWorker.request('sensitivity', params)
+      .then((results) => {
+        res.json({
+          success: true,
+          analysis: results
+        });
+      })
+      .catch((error) => {
+        console.error('Error in Python sensitivity analysis:', error);
+        res.status(500).json({
+          success: false,
+          error: error.message || 'Error in sensitivity analysis'
+        });
+      });
+  } catch (error) {
+    console.error('Error in sensitivity analysis:', error);
+    res.status(500).json({
+      success: false,
+      error: error.message || 'Error in sensitivity analysis'
     });
-    
-    python.on('close', (code) => {
-      if (code !== 0) {
-        return res.status(500).json({
+  }
+});
+
+// API endpoint tìm cấu hình driver: ít thay đổi nhất để đạt mục tiêu effort hoặc lịch trình
+app.post('/cocomo/optimize', (req, res) => {
+  try {
+    // Chỉ chuyển các tham số đã biết và giới hạn kích thước tìm kiếm; worker dùng chung cho mọi request
+    const params = pick(req.body, OPTIMIZE_FIELDS);
+    clamp(params, 'beamWidth', MAX_BEAM_WIDTH);
+    clamp(params, 'maxChanges', MAX_CHANGES, 0);
+    clamp(params, 'solutions', MAX_SOLUTIONS);
+
+    // Gọi worker Python: beam search, mỗi bước dự đoán cả tập ứng viên trong một lần gọi mô hình
+    pythonWorker.request('optimize', params)
+      .then((results) => {
+        res.json({
+          success: true,
+          optimization: results
+        });
+      })
+      .catch((error) => {
+        console.error('Error in Python driver optimization:', error);
+        res.status(500).json({
           success: false,
-          error: `Python process exited with code ${code}`
+          error: error.message || 'Error in driver optimization'
+        });
+      });
+  } catch (error) {
+    console.error('Error in driver optimization:', error);
+    res.status(500).json({
+      success: false,
+      error: error.message || 'Error in driver optimization'
+    });
+  }
+});
+
+// API endpoint mô phỏng Monte Carlo cho cả danh mục dự án (tổng effort, chi phí, quy mô nhóm cao nhất)
+app.post('/cocomo/portfolio', (req, res) => {
+  try {
+    // Chỉ chuyển các tham số đã biết và giới hạn kích thước mô phỏng; worker dùng chung cho mọi request
+    const params = pick(req.body, PORTFOLIO_FIELDS);
+    if (Array.isArray(req.body.projects)) {
+      if (req.body.projects.length > MAX_PORTFOLIO_PROJECTS) {
+        return res.status(400).json({
+          success: false,
+          error: `At most ${MAX_PORTFOLIO_PROJECTS} projects per portfolio`
         });
       }
-      
-      try {
-        const results = JSON.parse(dataString);
+      params.projects = req.body.projects.map((project) => pick(project || {}, PORTFOLIO_PROJECT_FIELDS));
+    }
+    const projectCount = Math.max(1, (params.projects || []).length);
+    clamp(params, 'iterations', Math.min(MAX_PORTFOLIO_ITERATIONS, Math.floor(MAX_PORTFOLIO_ROWS / projectCount)));
+    clamp(params, 'chunkSize', MAX_CHUNK_SIZE);
+
+    // Gọi worker Python để mô phỏng theo từng khối, dự đoán hàng loạt trong mỗi khối
+    pythonWorker.request('portfolio', params)
+      .then((results) => {
         res.json({
           success: true,
           analysis: results
         });
-      } catch (error) {
-        console.error('Error parsing Python output:', error);
+      })
+      .catch((error) => {
+        console.error('Error in Python portfolio simulation:', error);
         res.status(500).json({
           success: false,
-          error: 'Error parsing risk analysis results'
+          error: error.message || 'Error in portfolio simulation'
         });
-      }
+      });
+  } catch (error) {
+    console.error('Error in portfolio simulation:', error);
+    res.status(500).json({
+      success: false,
+      error: error.message || 'Error in portfolio simulation'
     });
+  }
+});
+
+// API endpoint liệt kê các mô hình trong model registry (tên, phiên bản, feature)
+app.get('/cocomo/models', (req, res) => {
+  pythonWorker.request('models', {})
+    .then((results) => {
+      res.json({
+        success: true,
+        models: results.models
+      });
+    })
+    .catch((error) => {
+      console.error('Error listing models:', error);
+      res.status(500).json({
+        success: false,
+        error: error.message || 'Error listing models'
+      });
+    });
+});
+
+// API endpoint dự đoán với một mô hình bất kỳ trong registry: { model, version, features | rows }
+app.post('/cocomo/models/predict', (req, res) => {
+  try {
+    pythonWorker.request('predict', req.body)
+      .then((results) => {
+        res.json({
+          success: true,
+          ...results
+        });
+      })
+      .catch((error) => {
+        console.error('Error in Python model prediction:', error);
+        res.status(500).json({
+          success: false,
+          error: error.message || 'Error in model prediction'
+        });
+      });
   } catch (error) {
-    console.error('Error in Monte Carlo analysis:', error);
+    console.error('Error in model prediction:', error);
     res.status(500).json({
       success: false,
-      error: error.message || 'Error in risk analysis'
+      error: error.message || 'Error in model prediction'
     });
   }
 });
@@ -262,6 +466,12 @@ app.listen(PORT, () => {
   console.log(`- POST /predict (basic mode - with ML model)`);
   console.log(`- POST /cocomo/detailed (advanced mode - with ML model)`);
   console.log(`- POST /cocomo/monte-carlo (risk analysis - with ML model)`);
+  console.log(`- POST /cocomo/batch (batch estimation - JSONL output)`);
+  console.log(`- POST /cocomo/sensitivity (tornado analysis - with ML model)`);
+  console.log(`- POST /cocomo/optimize (driver search for a target - with ML model)`);
+  console.log(`- POST /cocomo/portfolio (portfolio risk analysis - with ML model)`);
+  console.log(`- GET  /cocomo/models`);
+  console.log(`- POST /cocomo/models/predict (any registered model by name and version)`);
   console.log(`Current Date and Time (UTC): 2025-05-05 18:16:50`);
   console.log(`Current User's Login: Huy-VNNIC`);
 });
\ No newline at end of file
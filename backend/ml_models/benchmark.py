@@ -0,0 +1,230 @@
+#!/usr/bin/env python3
+"""Benchmarks for the prediction and simulation scripts.
+
+Cases:
+  cold.*     spawn the CLI scripts (interpreter start, imports, model load)
+  warm.*     one estimate with models already loaded, result cache off
+  batch.*    predict_batch.estimate_batch at 1, 1k and 1M projects
+  mc.*       basic and advanced Monte Carlo at several iteration counts
+
+Every case reports min/median/mean seconds over its repeats. Results are
+printed as JSON (or written with --output). --compare BASELINE flags cases
+whose median grew by more than --threshold and exits with status 1.
+
+--import-budget [MS] is the startup regression check: it imports each CLI
+entry point under `python -X importtime` and fails if one takes longer than
+the budget or pulls in numpy, sklearn, scipy or joblib at import time.
+
+Usage: python benchmark.py [--quick] [--only PREFIX] [--output FILE]
+                           [--compare BASELINE] [--threshold 0.2]
+       python benchmark.py --import-budget [MS]
+"""
+import sys
+import os
+import json
+import time
+import platform
+import argparse
+import subprocess
+import numpy as np
+
+import model_store
+import predict_basic
+import predict_advanced
+import predict_batch
+import monte_carlo
+from instrumentation import measure
+
+DIRECTORY = os.path.dirname(os.path.abspath(__file__))
+
+DEFAULT_THRESHOLD = 0.2
+
+# Entry points that must start without heavy dependencies, and their import budget
+IMPORT_CHECK_MODULES = ('predict_basic', 'predict_advanced', 'monte_carlo')
+DEFAULT_IMPORT_BUDGET_MS = 100
+HEAVY_MODULES = ('numpy', 'sklearn', 'scipy', 'joblib')
+
+# A mid-size project with a few non-nominal drivers
+ADVANCED_PARAMS = {
+    'size': 120000,
+    'scaleDrivers': {'precedentedness': 'High', 'teamCohesion': 'Low'},
+    'costDrivers': {'complexity': 'Very High', 'reliability': 'High', 'toolUse': 'Low'}
+}
+
+def run_script(*args):
+    subprocess.run([sys.executable, *args], cwd=DIRECTORY, check=True,
+                   stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+def random_projects(n, seed=0):
+    """Parameter sets with random sizes and driver ratings"""
+    rng = np.random.default_rng(seed)
+    labels = list(predict_advanced.COST_VALUE_MAP)
+    sizes = rng.uniform(5000, 500000, n)
+    scale = rng.integers(0, len(labels), (n, len(predict_advanced.SCALE_DRIVERS)))
+    cost = rng.integers(0, len(labels), (n, len(predict_advanced.COST_DRIVERS)))
+    return [{
+        'size': float(sizes[i]),
+        'scaleDrivers': {name: labels[r] for (name, _), r in zip(predict_advanced.SCALE_DRIVERS, scale[i])},
+        'costDrivers': {name: labels[r] for name, r in zip(predict_advanced.COST_DRIVERS, cost[i])}
+    } for i in range(n)]
+
+def benchmark_cases(quick=False):
+    """(name, fn, repeat) for every case; setup happens lazily inside the closures"""
+    scale = 10 if quick else 1
+    cases = []
+
+    # Cold start: a new interpreter per call, as the scripts were originally used
+    cases.append(('cold.basic', lambda: run_script('predict_basic.py', '50000', 'organic', '1.0', '1.0'), 5))
+    cases.append(('cold.advanced', lambda: run_script('predict_advanced.py', json.dumps(ADVANCED_PARAMS)), 5))
+    cases.append(('cold.monte_carlo', lambda: run_script('monte_carlo.py', json.dumps({'size': 50000})), 5))
+
+    basic_model = model_store.get_model(predict_basic.basic_model_path())
+    advanced_model = model_store.get_model(predict_advanced.advanced_model_path())
+    # Bulk cases get the model served for large batches
+    bulk_model = model_store.get_model(predict_advanced.advanced_model_path(predict_advanced.DEFAULT_CHUNK_SIZE))
+
+    cases.append(('warm.basic', lambda: predict_basic.estimate_basic(50000, 'organic', 1.0, 1.0, basic_model), 200))
+    cases.append(('warm.advanced', lambda: predict_advanced.estimate_advanced(ADVANCED_PARAMS, advanced_model), 50))
+
+    for n, repeat in ((1, 50), (1000, 10), (1000000 // scale, 1)):
+        projects = []
+        def run(n=n, projects=projects):
+            # Build the inputs on first use so skipped cases cost nothing
+            if not projects:
+                projects.extend(random_projects(n))
+            predict_batch.estimate_batch(projects, advanced_model if n == 1 else bulk_model)
+        cases.append((f'batch.{n}', run, repeat))
+
+    for iterations, repeat in ((1000, 20), (10000, 10), (1000000 // scale, 2)):
+        params = {'size': 50000, 'iterations': iterations, 'seed': 1}
+        cases.append((f'mc.basic.{iterations}',
+                      lambda params=params: monte_carlo.run_monte_carlo(params, basic_model), repeat))
+
+    scale_drivers = predict_advanced.encode_scale_drivers(ADVANCED_PARAMS['scaleDrivers'])
+    cost_drivers = predict_advanced.encode_cost_drivers(ADVANCED_PARAMS['costDrivers'])
+    for iterations, repeat in ((1000, 10), (100000 // scale, 2)):
+        cases.append((f'mc.advanced.{iterations}', lambda iterations=iterations: predict_advanced.perform_monte_carlo(
+            ADVANCED_PARAMS['size'], scale_drivers, cost_drivers, bulk_model, iterations=iterations, seed=1
+        ), repeat))
+
+    return cases
+
+def run_benchmarks(quick=False, only=None):
+    """Run every case (or those whose name starts with one of `only`) and collect the results"""
+    # Warm calls should measure the estimators, not the result cache
+    os.environ['COCOMO_CACHE_SIZE'] = '0'
+
+    results = {}
+    for name, fn, repeat in benchmark_cases(quick):
+        if only and not any(name.startswith(prefix) for prefix in only):
+            continue
+        fn()  # warm-up call, not timed
+        results[name] = measure(fn, repeat)
+        print(f"{name}: {results[name]['median'] * 1000:.3f} ms", file=sys.stderr)
+
+    return {
+        'meta': {
+            'python': platform.python_version(),
+            'numpy': np.__version__,
+            'platform': platform.platform(),
+            'cpus': os.cpu_count(),
+            'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'quick': quick
+        },
+        'results': results
+    }
+
+def import_profile(module):
+    """Cumulative import time (ms) of a module and the top-level packages it imported"""
+    completed = subprocess.run([sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+                               cwd=DIRECTORY, check=True, capture_output=True, text=True)
+    cumulative_ms = None
+    imported = set()
+    # Lines look like "import time:  self [us] | cumulative | imported package"
+    for line in completed.stderr.splitlines():
+        if not line.startswith('import time:') or '|' not in line:
+            continue
+        parts = line.split('|')
+        name = parts[2].strip()
+        if not parts[1].strip().isdigit():
+            continue
+        imported.add(name.split('.')[0])
+        if parts[2].rstrip() == f' {module}':
+            cumulative_ms = int(parts[1]) / 1000
+    return cumulative_ms, imported
+
+def check_import_budget(budget_ms=DEFAULT_IMPORT_BUDGET_MS, repeat=5):
+    """Best-of-repeat import time of each entry point against the budget"""
+    report = {}
+    for module in IMPORT_CHECK_MODULES:
+        profiles = [import_profile(module) for _ in range(repeat)]
+        heavy = sorted(set(HEAVY_MODULES) & profiles[0][1])
+        best = min(ms for ms, _ in profiles)
+        report[module] = {
+            'importMs': best,
+            'budgetMs': budget_ms,
+            'heavyImports': heavy,
+            'ok': best <= budget_ms and not heavy
+        }
+    return report
+
+def compare(current, baseline, threshold=DEFAULT_THRESHOLD):
+    """Median ratios against a baseline; a case regresses when its ratio exceeds 1 + threshold"""
+    report = {}
+    for name, result in current['results'].items():
+        previous = baseline['results'].get(name)
+        if previous is None:
+            continue
+        ratio = result['median'] / previous['median']
+        report[name] = {
+            'baseline': previous['median'],
+            'current': result['median'],
+            'ratio': ratio,
+            'regression': ratio > 1 + threshold
+        }
+    return report
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the COCOMO prediction and simulation code")
+    parser.add_argument('--quick', action='store_true', help="Scale the largest cases down 10x")
+    parser.add_argument('--only', action='append', help="Run only cases with this name prefix (repeatable)")
+    parser.add_argument('--output', help="Write the results to a file instead of stdout")
+    parser.add_argument('--compare', help="Baseline results file to check for regressions")
+    parser.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD,
+                        help="Allowed median slowdown before a case counts as a regression (default 0.2)")
+    parser.add_argument('--import-budget', type=float, nargs='?', const=DEFAULT_IMPORT_BUDGET_MS,
+                        help=f"Only check entry-point import times against a budget in ms "
+                             f"(default {DEFAULT_IMPORT_BUDGET_MS})")
+    args = parser.parse_args()
+
+    try:
+        if args.import_budget is not None:
+            report = check_import_budget(args.import_budget)
+            print(json.dumps(report, indent=2))
+            failed = [name for name, entry in report.items() if not entry['ok']]
+            if failed:
+                print(f"Over the import budget: {', '.join(failed)}", file=sys.stderr)
+                sys.exit(1)
+            sys.exit(0)
+
+        results = run_benchmarks(args.quick, args.only)
+
+        if args.output:
+            with open(args.output, 'w') as f:
+                json.dump(results, f, indent=2)
+                f.write('\n')
+
+        if args.compare:
+            with open(args.compare) as f:
+                baseline = json.load(f)
+            report = compare(results, baseline, args.threshold)
+            print(json.dumps(report, indent=2))
+            regressions = [name for name, entry in report.items() if entry['regression']]
+            if regressions:
+                print(f"Regressions: {', '.join(regressions)}", file=sys.stderr)
+                sys.exit(1)
+        elif not args.output:
+            print(json.dumps(results, indent=2))
+    except subprocess.CalledProcessError as e:
+        print(f"Error: benchmark script failed: {e.cmd}", file=sys.stderr)
+        sys.exit(1)
@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+"""Formula-only COCOMO estimation in pure Python.
+
+The COCOMO equations the placeholder models are trained on, packaged as
+model objects with the same predict() interface, so the estimators can run
+without loading numpy, sklearn or a model file:
+
+    basic:     effort = a * KLOC^b * reliability * complexity
+    advanced:  effort = 2.94 * KLOC^(0.91 + 0.01 * sum(scale drivers)) * prod(EM)
+
+Formula-only mode is chosen per request with "formulaOnly": true, for the
+whole process with COCOMO_FORMULA_ONLY=1, or with --formula-only on
+predict_basic.py. In that mode the CLIs import nothing heavier than the
+standard library. Risk analysis in predict_advanced still needs numpy;
+monte_carlo.py uses the pure-Python simulate_formula_monte_carlo, whose
+random stream differs from the numpy one, so seeded results differ too.
+"""
+import os
+
+# (a, b) of the basic COCOMO equation by mode number (1=organic, 2=semi-detached, 3=embedded)
+BASIC_COEFFICIENTS = {
+    1: (2.4, 1.05),
+    2: (3.0, 1.12),
+    3: (3.6, 1.20)
+}
+
+# Effort multiplier of a cost driver rated 1..6:
+# 1=Very Low: 1.3, 2=Low: 1.15, 3=Nominal: 1.0, 4=High: 0.85, 5=Very High: 0.7, 6=Extra High: 0.55
+EFFORT_MULTIPLIERS = (1.3, 1.15, 1.0, 0.85, 0.7, 0.55)
+
+# Number of scale drivers at the start of an advanced feature row (after size)
+NUM_SCALE_DRIVERS = 5
+
+def formula_only(params=None):
+    """Whether a request (or the whole process) should skip the ML models"""
+    if params and params.get('formulaOnly'):
+        return True
+    return os.environ.get('COCOMO_FORMULA_ONLY', '').lower() in ('1', 'true', 'yes')
+
+class BasicFormulaModel:
+    """Basic COCOMO equation over [size, mode, reliability, complexity] rows"""
+
+    def predict_one(self, row):
+        size, mode_num, reliability, complexity = row
+        a, b = BASIC_COEFFICIENTS.get(int(mode_num), BASIC_COEFFICIENTS[3])
+        return a * (size / 1000) ** b * reliability * complexity
+
+    def predict(self, rows):
+        return [self.predict_one(row) for row in rows]
+
+class AdvancedFormulaModel:
+    """COCOMO II equation over [size, 5 scale drivers, 16 cost drivers] rows"""
+
+    def predict_one(self, row):
+        size = row[0]
+        scale = row[1:1 + NUM_SCALE_DRIVERS]
+        exponent = 0.91 + 0.01 * sum(scale)
+        em = 1.0
+        for value in row[1 + NUM_SCALE_DRIVERS:]:
+            # Ratings are clipped to 1..6 and rounded, as the table has one entry per rating
+            em *= EFFORT_MULTIPLIERS[min(max(int(round(value)), 1), 6) - 1]
+        return 2.94 * (size / 1000) ** exponent * em
+
+    def predict(self, rows):
+        return [self.predict_one(row) for row in rows]
+
+def _summarize(values, percentiles):
+    # Same index rule as monte_carlo.summarize_samples
+    values = sorted(values)
+    n = len(values)
+    summary = {'min': values[0]}
+    for p in percentiles:
+        summary[f'p{p}'] = values[min(int(n * p / 100), n - 1)]
+    summary['max'] = values[-1]
+    return summary
+
+def simulate_formula_monte_carlo(size, mode, iterations, output_percentiles, seed=None):
+    """Basic Monte Carlo with the COCOMO formula and the random module (same distributions as simulate_basic)"""
+    import random
+    rng = random.Random(seed)
+    mode_map = {'organic': 1, 'semi-detached': 2, 'embedded': 3}
+    a, b = BASIC_COEFFICIENTS[mode_map.get(mode.lower(), 3)]
+    schedule_exponent = 0.32 + 0.2 * (b - 0.91)
+
+    samples = {name: [] for name in output_percentiles}
+    for _ in range(iterations):
+        random_size = size * (1 + rng.uniform(-0.2, 0.2))
+        random_a = a * (1 + rng.uniform(-0.15, 0.15))
+        effort = random_a * (random_size / 1000) ** b * rng.uniform(0.7, 1.65) * rng.uniform(0.7, 1.65)
+        schedule = 2.5 * effort ** schedule_exponent
+        samples['effort'].append(effort)
+        samples['schedule'].append(schedule)
+        samples['teamSize'].append(effort / schedule)
+        samples['cost'].append(effort * 10000)
+
+    return {name: _summarize(values, output_percentiles[name]) for name, values in samples.items()}
@@ -0,0 +1,310 @@
+#!/usr/bin/env python3
+"""Smaller variants of the advanced forest, with an accuracy/latency report.
+
+Variants of cocomo_advanced_model.pkl, each saved in a format model_store
+loads:
+    trees-N        N trees chosen by greedy ensemble selection: starting
+                   empty, repeatedly add the tree that brings the mean of
+                   the chosen trees closest to the full forest on a
+                   selection set (relative squared error)
+    depth-D        every tree cut at depth D (a cut node predicts the mean
+                   of its subtree)
+    float32        leaf values stored as float32 (split thresholds already
+                   are, see forest_engine.float32_thresholds)
+    trees-N-depth-D-float32
+                   the three combined
+    log-linear     a surrogate fitted on the forest's outputs:
+                   log(effort) from log(size), a piecewise-linear term per
+                   driver rating and log(size) x each scale driver (the
+                   COCOMO exponent); stored as a small JSON .surrogate file
+    gbm            HistGradientBoostingRegressor on log(effort), distilled
+                   from the forest's outputs on random inputs
+
+Tree variants are written as flattened .forest directories. The original
+model is reported twice, as the sklearn pickle and as its flattened forest
+(the format served by predict_advanced when exported).
+
+Every variant is compared with the original forest on a held-out grid: 64
+geometrically spaced sizes from 1K to 500K SLOC, each with the same 256
+random driver vectors. The report gives its size on disk, load time,
+single-row and 1000-row latency and relative error (mean, p95, max). It
+also names the variant with the lowest single-row latency whose error
+(--metric) is within --budget (default 0.02).
+
+Usage: python compress_model.py [model.pkl] [--output-dir DIR] [--trees 10,25,50]
+                                [--depths 6,8,10,12] [--no-distill]
+                                [--budget 0.02] [--metric p95]
+"""
+import sys
+import os
+import json
+import time
+import pickle
+import argparse
+import numpy as np
+
+from forest_engine import flatten_forest
+from predict_advanced import MODEL_PATH, SCALE_DRIVERS
+from instrumentation import measure
+
+DIRECTORY = os.path.dirname(os.path.abspath(__file__))
+
+DEFAULT_OUTPUT_DIRECTORY = os.path.join(DIRECTORY, 'compressed')
+DEFAULT_TREES = (10, 25, 50)
+DEFAULT_DEPTHS = (6, 8, 10, 12)
+
+# Input ranges of the synthetic data: size plus 21 drivers rated 1..6
+SIZE_RANGE = (1000, 500000)
+RATINGS = np.arange(1, 7)
+
+# Rows used to choose trees, to fit the surrogates and to measure error
+SELECTION_ROWS = 4096
+DISTILL_ROWS = 200000
+GRID_SIZES = 64
+GRID_DRIVER_VECTORS = 256
+
+ERROR_METRICS = ('mean', 'p95', 'max')
+
+def random_inputs(n, n_features, rng):
+    """Random rows: log-uniform size, integer driver ratings"""
+    sizes = np.exp(rng.uniform(np.log(SIZE_RANGE[0]), np.log(SIZE_RANGE[1]), n))
+    return np.column_stack((sizes, rng.integers(1, 7, (n, n_features - 1)))).astype(float)
+
+def held_out_grid(n_features, seed):
+    """Every grid size combined with the same random driver vectors"""
+    rng = np.random.default_rng(seed)
+    sizes = np.geomspace(SIZE_RANGE[0], SIZE_RANGE[1], GRID_SIZES)
+    drivers = rng.integers(1, 7, (GRID_DRIVER_VECTORS, n_features - 1))
+    return np.column_stack((
+        np.repeat(sizes, len(drivers)),
+        np.tile(drivers, (len(sizes), 1))
+    )).astype(float)
+
+def select_trees(model, X, count):
+    """Greedy forward selection of trees whose mean best matches the full forest on X"""
+    target = model.predict(X)
+    # sklearn's trees expect float32 inputs, as inside the forest
+    X32 = X.astype(np.float32)
+    per_tree = np.array([tree.predict(X32) for tree in model.estimators_])
+
+    chosen = []
+    total = np.zeros(len(X))
+    available = np.ones(len(per_tree), dtype=bool)
+    for k in range(1, min(count, len(per_tree)) + 1):
+        candidates = (total + per_tree) / k
+        error = (((candidates - target) / target) ** 2).mean(axis=1)
+        error[~available] = np.inf
+        best = int(np.argmin(error))
+        chosen.append(best)
+        available[best] = False
+        total += per_tree[best]
+    return chosen
+
+def driver_basis(ratings):
+    """Piecewise-linear (hat) weights of each rating on the knots 2..6
+
+    Knot 1 is left out so the basis is not collinear with the intercept;
+    fractional ratings such as the nominal scale values interpolate.
+    """
+    weights = np.maximum(0, 1 - np.abs(ratings[:, :, np.newaxis] - RATINGS[1:]))
+    return weights.reshape(len(ratings), -1)
+
+class SurrogateModel:
+    """Log-linear surrogate of the advanced model, see surrogate_features"""
+
+    def __init__(self, coef, intercept, n_features):
+        self.coef = np.asarray(coef, dtype=float)
+        self.intercept = float(intercept)
+        self.n_features_in_ = int(n_features)
+
+    def predict(self, X):
+        X = np.asarray(X, dtype=float)
+        if X.ndim != 2 or X.shape[1] != self.n_features_in_:
+            raise ValueError(f"Expected an (N x {self.n_features_in_}) array, got shape {X.shape}")
+        return np.exp(surrogate_features(X) @ self.coef + self.intercept)
+
+    def save(self, path):
+        with open(path, 'w') as f:
+            json.dump({
+                'type': 'log-linear',
+                'n_features': self.n_features_in_,
+                'coef': self.coef.tolist(),
+                'intercept': self.intercept
+            }, f)
+            f.write('\n')
+        return path
+
+    @classmethod
+    def load(cls, path):
+        with open(path) as f:
+            data = json.load(f)
+        if data.get('type') != 'log-linear':
+            raise ValueError(f"Not a surrogate model file: {path}")
+        return cls(data['coef'], data['intercept'], data['n_features'])
+
+def surrogate_features(X):
+    """[log size, driver basis..., log size x scale driver...]"""
+    log_size = np.log(np.maximum(X[:, :1], 1))
+    scale = X[:, 1:1 + len(SCALE_DRIVERS)]
+    return np.hstack((log_size, driver_basis(X[:, 1:]), log_size * scale))
+
+def fit_log_linear(X, y):
+    """Least-squares SurrogateModel of log(y)"""
+    features = surrogate_features(X)
+    design = np.column_stack((features, np.ones(len(X))))
+    solution, *_ = np.linalg.lstsq(design, np.log(y), rcond=None)
+    return SurrogateModel(solution[:-1], solution[-1], X.shape[1])
+
+def fit_gbm(X, y, seed):
+    """Gradient-boosted trees on log(y), predicting y"""
+    from sklearn.compose import TransformedTargetRegressor
+    from sklearn.ensemble import HistGradientBoostingRegressor
+    model = TransformedTargetRegressor(
+        regressor=HistGradientBoostingRegressor(max_iter=300, learning_rate=0.1, random_state=seed),
+        func=np.log,
+        inverse_func=np.exp
+    )
+    return model.fit(X, y)
+
+def load_surrogate(path):
+    """model_store loader for .surrogate files"""
+    return SurrogateModel.load(path)
+
+def build_variants(model, output_dir, trees=DEFAULT_TREES, depths=DEFAULT_DEPTHS, distill=True, seed=0):
+    """Write every variant to output_dir; returns [(name, path)]"""
+    if not trees:
+        raise ValueError("No tree counts given")
+    # Keeping more trees than the forest has would be the full forest under another name
+    too_many = [count for count in trees if count > len(model.estimators_)]
+    if too_many:
+        raise ValueError(f"Tree counts {', '.join(map(str, too_many))} exceed the {len(model.estimators_)} trees of the forest")
+    os.makedirs(output_dir, exist_ok=True)
+    selection_seed, distill_seed = np.random.SeedSequence(seed).spawn(2)
+    variants = []
+
+    def save_forest(name, **options):
+        path = os.path.join(output_dir, f'{name}.forest')
+        flatten_forest(model, **options).save(path)
+        variants.append((name, path))
+
+    save_forest('flat')
+    X = random_inputs(SELECTION_ROWS, model.n_features_in_, np.random.default_rng(selection_seed))
+    order = select_trees(model, X, max(trees))
+    for count in trees:
+        save_forest(f'trees-{count}', estimators=[model.estimators_[i] for i in order[:count]])
+    for depth in depths:
+        save_forest(f'depth-{depth}', max_depth=depth)
+    save_forest('float32', value_dtype=np.float32)
+    for count in trees:
+        for depth in depths:
+            save_forest(f'trees-{count}-depth-{depth}-float32',
+                        estimators=[model.estimators_[i] for i in order[:count]],
+                        max_depth=depth, value_dtype=np.float32)
+
+    if distill:
+        # Both surrogates learn the forest's outputs, not the training data
+        X = random_inputs(DISTILL_ROWS, model.n_features_in_, np.random.default_rng(distill_seed))
+        y = model.predict(X)
+        path = fit_log_linear(X, y).save(os.path.join(output_dir, 'log-linear.surrogate'))
+        variants.append(('log-linear', path))
+        path = os.path.join(output_dir, 'gbm.pkl')
+        with open(path, 'wb') as f:
+            pickle.dump(fit_gbm(X, y, seed), f)
+        variants.append(('gbm', path))
+
+    return variants
+
+def disk_size(path):
+    if os.path.isdir(path):
+        return sum(os.path.getsize(os.path.join(path, name)) for name in os.listdir(path))
+    return os.path.getsize(path)
+
+def measure_variant(path, X, expected, repeat=20):
+    """Size, load time, latency and relative error of one saved variant"""
+    import model_store
+    loader = model_store.LOADERS[os.path.splitext(path)[1]]
+
+    start = time.perf_counter()
+    model = loader(path)
+    load_seconds = time.perf_counter() - start
+
+    actual = np.asarray(model.predict(X), dtype=float)
+    relative = np.abs(actual - expected) / np.abs(expected)
+    return {
+        'path': path,
+        'bytes': disk_size(path),
+        'loadSeconds': load_seconds,
+        'latency1': measure(lambda: model.predict(X[:1]), repeat)['median'],
+        'latency1000': measure(lambda: model.predict(X[:1000]), max(1, repeat // 4))['median'],
+        'relativeError': {
+            'mean': float(relative.mean()),
+            'p95': float(np.percentile(relative, 95)),
+            'max': float(relative.max())
+        }
+    }
+
+def pick_variant(variants, budget, metric='p95'):
+    """Name of the variant with the lowest single-row latency within the error budget"""
+    within = [(result['latency1'], name) for name, result in variants.items()
+              if result['relativeError'][metric] <= budget]
+    return min(within)[1] if within else None
+
+def compress_model(model_path=MODEL_PATH, output_dir=DEFAULT_OUTPUT_DIRECTORY, trees=DEFAULT_TREES,
+                   depths=DEFAULT_DEPTHS, distill=True, budget=None, metric='p95', seed=0):
+    """Build every variant and report it against the original forest"""
+    import model_store
+    model = model_store.get_model(model_path)
+    if not hasattr(model, 'estimators_'):
+        raise ValueError(f"{model_path} is not a fitted forest")
+
+    X = held_out_grid(model.n_features_in_, seed + 1)
+    expected = model.predict(X)
+
+    results = {'original': measure_variant(model_path, X, expected)}
+    for name, path in build_variants(model, output_dir, trees, depths, distill, seed):
+        results[name] = measure_variant(path, X, expected)
+
+    report = {
+        'model': os.path.abspath(model_path),
+        'gridRows': len(X),
+        'variants': results
+    }
+    if budget is not None:
+        report['budget'] = {'metric': metric, 'relativeError': budget,
+                            'choice': pick_variant(results, budget, metric)}
+    return report
+
+def parse_counts(value):
+    """Comma-separated positive integers, at least one"""
+    try:
+        counts = tuple(int(item) for item in value.split(',') if item.strip())
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"expected comma-separated integers, got {value!r}")
+    if not counts:
+        raise argparse.ArgumentTypeError("expected at least one count")
+    if min(counts) < 1:
+        raise argparse.ArgumentTypeError(f"counts must be positive, got {value!r}")
+    return counts
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compressed variants of the advanced forest")
+    parser.add_argument('model', nargs='?', default=MODEL_PATH, help="Pickled forest (default: cocomo_advanced_model.pkl)")
+    parser.add_argument('--output-dir', default=DEFAULT_OUTPUT_DIRECTORY)
+    parser.add_argument('--trees', type=parse_counts, default=DEFAULT_TREES, help="Tree counts to keep, e.g. 10,25,50")
+    parser.add_argument('--depths', type=parse_counts, default=DEFAULT_DEPTHS, help="Depth caps, e.g. 6,8,10,12")
+    parser.add_argument('--no-distill', action='store_true', help="Skip the log-linear and gbm surrogates")
+    parser.add_argument('--budget', type=float, default=0.02, help="Largest acceptable relative error (default 0.02)")
+    parser.add_argument('--metric', choices=ERROR_METRICS, default='p95', help="Error compared with --budget")
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    try:
+        report = compress_model(args.model, args.output_dir, args.trees, args.depths, not args.no_distill,
+                                args.budget, args.metric, args.seed)
+        with open(os.path.join(args.output_dir, 'report.json'), 'w') as f:
+            json.dump(report, f, indent=2)
+            f.write('\n')
+        print(json.dumps(report, indent=2))
+    except Exception as e:
+        print(f"Error: {str(e)}", file=sys.stderr)
+        sys.exit(1)
@@ -3,8 +3,25 @@ import pickle
 import numpy as np
 from sklearn.linear_model import LinearRegression
 import os
+import sys
+import json
+import time
+import hashlib
+import platform
+import argparse
+from datetime import datetime, timezone
 
-def create_basic_model():
+from linear_predictor import export_linear_model, coefficients_path
+from forest_engine import forest_path, export_forest
+
+# Feature order of the basic model
+BASIC_FEATURES = ['size', 'mode', 'reliability', 'complexity']
+
+def export_basic_coefficients(model, model_path):
+    """Write the closed-form coefficient file used by predict_basic without sklearn"""
+    return export_linear_model(model, coefficients_path(model_path), BASIC_FEATURES)
+
+def create_basic_model(**advanced_options):
     """Create a simple linear regression model as a placeholder"""
     # Generate some synthetic COCOMO data
     sizes = np.array([10000, 20000, 30000, 40000, 50000, 60000, 70000, 80000, 90000, 100000])
@@ -35,74 +52,167 @@ def create_basic_model():
     
     # Save the model
     directory = os.path.dirname(os.path.abspath(__file__))
-    with open(os.path.join(directory, 'cocomo_basic_model.pkl'), 'wb') as f:
+    model_path = os.path.join(directory, 'cocomo_basic_model.pkl')
+    with open(model_path, 'wb') as f:
         pickle.dump(model, f)
     
+    # Export coefficients for the closed-form predictor
+    export_basic_coefficients(model, model_path)
+    
     print("Created basic COCOMO model placeholder")
     
     # Also create an advanced model placeholder
-    create_advanced_model()
+    create_advanced_model(**advanced_options)
 
-def create_advanced_model():
-    """Create a more complex regression model for advanced COCOMO"""
-    # Generate 100 samples of synthetic data
-    np.random.seed(42)
-    samples = 100
+# Effort multiplier of a cost driver rated 1..6:
+# 1=Very Low: 1.3, 2=Low: 1.15, 3=Nominal: 1.0, 4=High: 0.85, 5=Very High: 0.7, 6=Extra High: 0.55
+EFFORT_MULTIPLIERS = np.array([1.3, 1.15, 1.0, 0.85, 0.7, 0.55])
+
+# Hyperparameters of the advanced RandomForestRegressor
+DEFAULT_HYPERPARAMETERS = {
+    'n_estimators': 100,
+    'max_depth': None,
+    'min_samples_leaf': 1,
+    'max_features': 1.0
+}
+
+def generate_advanced_data(samples=100, seed=42):
+    """Synthetic COCOMO II training rows, returns (X, efforts)"""
+    # RandomState draws the same numbers as the former global np.random.seed(42)
+    rng = np.random.RandomState(seed)
     
     # Features:
     # 1. Size (5K to 500K)
-    sizes = np.random.uniform(5000, 500000, samples)
+    sizes = rng.uniform(5000, 500000, samples)
     
     # 2. Scale drivers (5 features, values 1-6)
-    scale_drivers = np.random.randint(1, 7, (samples, 5))
+    scale_drivers = rng.randint(1, 7, (samples, 5))
     
     # 3. Cost drivers (16 features, values 1-6)
-    cost_drivers = np.random.randint(1, 7, (samples, 16))
+    cost_drivers = rng.randint(1, 7, (samples, 16))
     
     # Combine all features
     X = np.column_stack((sizes.reshape(-1, 1), scale_drivers, cost_drivers))
     
     # Calculate target efforts using COCOMO II formulas
-    efforts = []
-    for i in range(samples):
-        # Size in KLOC
-        size_in_kloc = sizes[i] / 1000
-        
-        # Calculate scale factor (sum of scale drivers)
-        scale_factor = sum(scale_drivers[i])
-        
-        # Calculate exponent
-        exponent = 0.91 + 0.01 * scale_factor
-        
-        # Base effort
-        base_effort = 2.94 * (size_in_kloc ** exponent)
-        
-        # Apply effort multipliers (simplified for dummy model)
-        em = 1.0
-        for j in range(len(cost_drivers[i])):
-            # Convert cost driver value (1-6) to multiplier
-            # 1=Very Low: 1.3, 2=Low: 1.15, 3=Nominal: 1.0, 4=High: 0.85, 5=Very High: 0.7, 6=Extra High: 0.55
-            multipliers = [1.3, 1.15, 1.0, 0.85, 0.7, 0.55]
-            em *= multipliers[cost_drivers[i][j] - 1]
-        
-        # Final effort
-        effort = base_effort * em
-        efforts.append(effort)
+    exponent = 0.91 + 0.01 * scale_drivers.sum(axis=1)
+    base_effort = 2.94 * (sizes / 1000) ** exponent
     
-    efforts = np.array(efforts)
+    # Apply effort multipliers (simplified for dummy model) with one table gather
+    em = EFFORT_MULTIPLIERS[cost_drivers - 1].prod(axis=1)
     
-    # Create and train a linear regression model
+    return X, base_effort * em
+
+def data_hash(X, y):
+    """SHA-256 of the training matrix and targets"""
+    digest = hashlib.sha256()
+    for array in (X, y):
+        array = np.ascontiguousarray(array, dtype=np.float64)
+        digest.update(str(array.shape).encode('ascii'))
+        digest.update(array.tobytes())
+    return digest.hexdigest()
+
+def manifest_path(model_path):
+    """Metadata file written next to a trained model"""
+    return os.path.splitext(model_path)[0] + '.manifest.json'
+
+def write_manifest(model_path, model, data_sha256, samples, feature_names, hyperparameters, seed,
+                   training_seconds):
+    """Record how a model was trained: feature order, library versions, timing and data hash"""
+    import sklearn
+    
+    manifest = {
+        'model': os.path.basename(model_path),
+        'estimator': type(model).__name__,
+        'features': list(feature_names),
+        'hyperparameters': hyperparameters,
+        'seed': seed,
+        'samples': int(samples),
+        'dataSha256': data_sha256,
+        'trainedAt': datetime.now(timezone.utc).isoformat(),
+        'trainingSeconds': training_seconds,
+        'versions': {
+            'python': platform.python_version(),
+            'numpy': np.__version__,
+            'sklearn': sklearn.__version__
+        }
+    }
+    path = manifest_path(model_path)
+    with open(path, 'w') as f:
+        json.dump(manifest, f, indent=2)
+        f.write('\n')
+    return path
+
+def create_advanced_model(samples=100, seed=42, n_jobs=-1, model_path=None, **hyperparameters):
+    """Train the random forest for advanced COCOMO and save it with its manifest"""
     from sklearn.ensemble import RandomForestRegressor
-    model = RandomForestRegressor(n_estimators=100, random_state=42)
+    from predict_advanced import FEATURE_NAMES
+    
+    params = dict(DEFAULT_HYPERPARAMETERS, **hyperparameters)
+    X, efforts = generate_advanced_data(samples, seed)
+    
+    start = time.perf_counter()
+    model = RandomForestRegressor(random_state=seed, n_jobs=n_jobs, **params)
     model.fit(X, efforts)
+    training_seconds = time.perf_counter() - start
+    
+    # Served models predict single rows; threads only pay off while training
+    model.n_jobs = None
     
     # Save the model
-    directory = os.path.dirname(os.path.abspath(__file__))
-    with open(os.path.join(directory, 'cocomo_advanced_model.pkl'), 'wb') as f:
+    if model_path is None:
+        model_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'cocomo_advanced_model.pkl')
+    with open(model_path, 'wb') as f:
         pickle.dump(model, f)
+    write_manifest(model_path, model, data_hash(X, efforts), len(efforts), FEATURE_NAMES, params, seed,
+                   training_seconds)
     
-    print("Created advanced COCOMO model placeholder")
+    # An exported flat forest would otherwise keep serving the previous model
+    if os.path.isdir(forest_path(model_path)):
+        export_forest(model_path)
+    
+    print(f"Created advanced COCOMO model placeholder ({samples} samples, {training_seconds:.2f}s)")
+    return model_path
+
+def parse_max_features(value):
+    """--max-features accepts a fraction, a count or sqrt/log2"""
+    if value in ('sqrt', 'log2'):
+        return value
+    number = float(value)
+    return int(number) if number > 1 else number
 
 if __name__ == "__main__":
-    create_basic_model()
-    print("Dummy models created successfully")
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Train the placeholder COCOMO models")
+    parser.add_argument('--export-linear', action='store_true',
+                        help="Only export coefficients of the existing basic model, without retraining")
+    parser.add_argument('--advanced-only', action='store_true', help="Retrain only the advanced model")
+    parser.add_argument('--samples', type=int, default=100, help="Synthetic rows for the advanced model")
+    parser.add_argument('--seed', type=int, default=42, help="Seed for the data and the forest")
+    parser.add_argument('--n-estimators', type=int, default=DEFAULT_HYPERPARAMETERS['n_estimators'])
+    parser.add_argument('--max-depth', type=int, default=DEFAULT_HYPERPARAMETERS['max_depth'])
+    parser.add_argument('--min-samples-leaf', type=int, default=DEFAULT_HYPERPARAMETERS['min_samples_leaf'])
+    parser.add_argument('--max-features', type=parse_max_features, default=DEFAULT_HYPERPARAMETERS['max_features'])
+    parser.add_argument('--n-jobs', type=int, default=-1, help="Training threads (default: all cores)")
+    parser.add_argument('--output', help="Advanced model path (default: cocomo_advanced_model.pkl)")
+    args = parser.parse_args()
+    
+    if args.export_linear:
+        model_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'cocomo_basic_model.pkl')
+        with open(model_path, 'rb') as f:
+            print(export_basic_coefficients(pickle.load(f), model_path))
+    else:
+        advanced_options = {
+            'samples': args.samples,
+            'seed': args.seed,
+            'n_jobs': args.n_jobs,
+            'model_path': args.output,
+            'n_estimators': args.n_estimators,
+            'max_depth': args.max_depth,
+            'min_samples_leaf': args.min_samples_leaf,
+            'max_features': args.max_features
+        }
+        if args.advanced_only:
+            create_advanced_model(**advanced_options)
+        else:
+            create_basic_model(**advanced_options)
+        print("Dummy models created successfully")
@@ -0,0 +1,258 @@
+#!/usr/bin/env python3
+"""Precomputed effort grid for interactive what-if queries.
+
+Every advanced-model input except size is a discrete driver rating, so the
+model can be evaluated ahead of time over log-spaced size knots for the
+driver combinations a UI actually visits: the defaults and all-'Nominal'
+ratings, each with any single driver moved to another rating. The table
+is stored as .npy files in `<model>.grid/` and memory-mapped on load.
+
+A lookup finds the combination with a dict probe, then interpolates
+log(effort) linearly in log(size) between the two surrounding knots, which
+takes a few microseconds. GridPredictor falls back to the real model for
+combinations or sizes outside the grid. Building the grid also measures
+the interpolation error of every cell (combination x knot interval) at a
+few sizes inside it. GridPredictor also falls back to the model in cells
+whose error exceeds max_error, and reports the largest error among the
+cells it answered from, so callers can mark those results as approximate.
+The forest is piecewise constant in size, so a measured error is an
+estimate rather than a guarantee.
+
+Usage: python effort_grid.py build [--knots N] [--min-size S] [--max-size S] [--combos FILE]
+       python effort_grid.py info
+"""
+import sys
+import os
+import json
+import math
+import bisect
+import argparse
+import numpy as np
+
+import model_store
+from predict_advanced import (
+    MODEL_PATH, advanced_model_path, prepare_batch, encode_scale_drivers, encode_cost_drivers,
+    SCALE_DRIVERS, COST_DRIVERS
+)
+
+DEFAULT_KNOTS = 512
+DEFAULT_SIZE_RANGE = (1000, 1000000)
+
+# Cells whose measured interpolation error is larger are answered by the model
+DEFAULT_MAX_CELL_ERROR = 0.01
+
+ARRAY_NAMES = ['knots', 'combos', 'effort']
+# Written by builds that measure the per-cell error; older grids lack it
+OPTIONAL_ARRAY_NAMES = ['cell_error']
+
+# Positions inside each cell (fractions of the log-size interval) where the error is measured
+ERROR_SAMPLE_POINTS = (0.25, 0.5, 0.75)
+
+def grid_path(model_path=MODEL_PATH):
+    """Directory holding the precomputed grid for a model"""
+    return os.path.splitext(model_path)[0] + '.grid'
+
+def driver_combinations(extra_params=()):
+    """Driver vectors to precompute: two baselines, each with one driver moved at a time"""
+    labelled = {name: 'Nominal' for name, _ in SCALE_DRIVERS}
+    bases = [
+        encode_scale_drivers({}) + encode_cost_drivers({}),
+        encode_scale_drivers(labelled) + encode_cost_drivers({name: 'Nominal' for name in COST_DRIVERS})
+    ]
+
+    combos = {}
+    for base in bases:
+        combos[tuple(base)] = None
+        for i in range(len(base)):
+            for rating in range(1, 7):
+                row = list(base)
+                row[i] = float(rating)
+                combos[tuple(row)] = None
+
+    # Extra parameter sets, e.g. saved scenarios, are added with their own drivers
+    if extra_params:
+        features, _ = prepare_batch(list(extra_params))
+        for row in features[:, 1:].tolist():
+            combos[tuple(row)] = None
+
+    return np.array(list(combos), dtype=float)
+
+def evaluate(model, knots, combos):
+    """Model effort for every (combination, size) pair, shape (len(combos), len(knots))"""
+    X = np.empty((len(combos) * len(knots), 1 + combos.shape[1]))
+    X[:, 0] = np.tile(knots, len(combos))
+    X[:, 1:] = np.repeat(combos, len(knots), axis=0)
+    return model.predict(X).reshape(len(combos), len(knots))
+
+def interpolate(knots, effort, sizes):
+    """Log-log interpolation of each row of effort at the given sizes"""
+    log_effort = np.log(effort)
+    return np.exp(np.array([np.interp(np.log(sizes), np.log(knots), row) for row in log_effort]))
+
+def interpolation_error(model, knots, combos, effort):
+    """Relative error of the interpolation at ERROR_SAMPLE_POINTS inside each knot interval
+
+    Returns the summary and the largest error of each cell, shape
+    (combinations x knots - 1).
+    """
+    log_knots = np.log(knots)
+    relative = None
+    for fraction in ERROR_SAMPLE_POINTS:
+        sizes = np.exp(log_knots[:-1] + fraction * np.diff(log_knots))
+        exact = evaluate(model, sizes, combos)
+        error = np.abs(interpolate(knots, effort, sizes) - exact) / exact
+        relative = error if relative is None else np.maximum(relative, error)
+    return {
+        'mean': float(relative.mean()),
+        'p99': float(np.quantile(relative, 0.99)),
+        'max': float(relative.max())
+    }, relative.astype(np.float32)
+
+class EffortGrid:
+    """Precomputed effort table with per-combination size interpolation"""
+
+    def __init__(self, knots, combos, effort, meta=None, cell_error=None):
+        self.knots = knots
+        self.combos = combos
+        self.effort = effort
+        self.meta = meta or {}
+        self.cell_error = cell_error
+        # Without per-cell errors every cell gets the worst one measured
+        self._worst_error = float(self.meta.get('interpolationError', {}).get('max', math.inf))
+        # Plain Python copies make a single lookup cheaper than any numpy call
+        self._knots = [float(k) for k in knots]
+        self._log_knots = [math.log(k) for k in self._knots]
+        self._index = {tuple(row): i for i, row in enumerate(np.asarray(combos).tolist())}
+        # Plain ndarray view of the (possibly memory-mapped) table skips np.memmap indexing overhead
+        self._effort = np.asarray(effort).view(np.ndarray)
+
+    def lookup(self, features):
+        """Interpolated effort for one feature row, or None when it is not on the grid"""
+        found = self.lookup_with_error(features)
+        return None if found is None else found[0]
+
+    def lookup_with_error(self, features):
+        """(effort, interpolation error of its cell) for one feature row, or None when it is not on the grid"""
+        row = self._index.get(tuple(map(float, features[1:])))
+        size = float(features[0])
+        if row is None or not self._knots[0] <= size <= self._knots[-1]:
+            return None
+
+        j = min(bisect.bisect_right(self._knots, size) - 1, len(self._knots) - 2)
+        t = (math.log(size) - self._log_knots[j]) / (self._log_knots[j + 1] - self._log_knots[j])
+        low, high = math.log(self._effort[row, j]), math.log(self._effort[row, j + 1])
+        error = float(self.cell_error[row, j]) if self.cell_error is not None else self._worst_error
+        return math.exp(low + t * (high - low)), error
+
+    def save(self, path):
+        """Write the arrays as .npy files plus metadata (written last, so it marks a complete grid)"""
+        os.makedirs(path, exist_ok=True)
+        for name in ARRAY_NAMES + OPTIONAL_ARRAY_NAMES:
+            if getattr(self, name) is not None:
+                np.save(os.path.join(path, f'{name}.npy'), getattr(self, name))
+        with open(os.path.join(path, 'meta.json'), 'w') as f:
+            json.dump(self.meta, f, indent=2)
+            f.write('\n')
+        return path
+
+    @classmethod
+    def load(cls, path, mmap_mode='r'):
+        """Load a grid written by save(), memory-mapped by default"""
+        with open(os.path.join(path, 'meta.json')) as f:
+            meta = json.load(f)
+        arrays = {
+            name: np.load(os.path.join(path, f'{name}.npy'), mmap_mode=mmap_mode)
+            for name in ARRAY_NAMES
+        }
+        for name in OPTIONAL_ARRAY_NAMES:
+            if os.path.exists(os.path.join(path, f'{name}.npy')):
+                arrays[name] = np.load(os.path.join(path, f'{name}.npy'), mmap_mode=mmap_mode)
+        return cls(meta=meta, **arrays)
+
+class GridPredictor:
+    """Model-compatible predict() that answers from the grid and falls back to the model"""
+
+    def __init__(self, grid, model, max_error=DEFAULT_MAX_CELL_ERROR):
+        self.grid = grid
+        self.model = model
+        self.max_error = max_error
+        self.hits = 0
+        self.misses = 0
+        # Largest cell error among the rows answered from the grid
+        self.error_bound = 0.0
+
+    def predict(self, X):
+        X = np.asarray(X, dtype=float)
+        out = np.empty(len(X))
+        missed = []
+        for i, row in enumerate(X):
+            found = self.grid.lookup_with_error(row)
+            if found is None or found[1] > self.max_error:
+                missed.append(i)
+            else:
+                out[i] = found[0]
+                self.error_bound = max(self.error_bound, found[1])
+        if missed:
+            out[missed] = self.model.predict(X[missed])
+        self.hits += len(X) - len(missed)
+        self.misses += len(missed)
+        return out
+
+def build_grid(model_path=None, knots=DEFAULT_KNOTS, size_range=DEFAULT_SIZE_RANGE, extra_params=()):
+    """Evaluate the served advanced model over the grid and write it next to the model"""
+    model_path = model_path or advanced_model_path()
+    model = model_store.get_model(model_path)
+
+    knot_sizes = np.geomspace(size_range[0], size_range[1], knots)
+    combos = driver_combinations(extra_params)
+    effort = evaluate(model, knot_sizes, combos)
+    error_summary, cell_error = interpolation_error(model, knot_sizes, combos, effort)
+
+    meta = {
+        'modelVersion': model_store.model_version(model_path),
+        'knots': int(knots),
+        'sizeRange': [float(size_range[0]), float(size_range[1])],
+        'combinations': int(len(combos)),
+        'interpolationError': error_summary
+    }
+    grid = EffortGrid(knot_sizes, combos, effort, meta, cell_error)
+    return grid.save(grid_path()), meta
+
+def current_grid(model_path):
+    """The grid for the model currently served from model_path, or None if missing or stale"""
+    path = grid_path()
+    if not os.path.exists(os.path.join(path, 'meta.json')):
+        return None
+    grid = model_store.get_model(path)
+    if grid.meta.get('modelVersion') != model_store.model_version(model_path):
+        return None
+    return grid
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Precompute the advanced-model effort grid")
+    parser.add_argument('command', choices=['build', 'info'])
+    parser.add_argument('--knots', type=int, default=DEFAULT_KNOTS, help="Log-spaced size knots")
+    parser.add_argument('--min-size', type=float, default=DEFAULT_SIZE_RANGE[0])
+    parser.add_argument('--max-size', type=float, default=DEFAULT_SIZE_RANGE[1])
+    parser.add_argument('--combos', help="JSON array of extra parameter sets whose drivers are added")
+    args = parser.parse_args()
+
+    try:
+        if args.command == 'build':
+            extra = []
+            if args.combos:
+                with open(args.combos) as f:
+                    extra = json.load(f)
+            path, meta = build_grid(knots=args.knots, size_range=(args.min_size, args.max_size),
+                                    extra_params=extra)
+            print(json.dumps(dict(meta, path=path), indent=2))
+        else:
+            grid = current_grid(advanced_model_path())
+            print(json.dumps({
+                'path': grid_path(),
+                'current': grid is not None,
+                'meta': grid.meta if grid is not None else None
+            }, indent=2))
+    except Exception as e:
+        print(f"Error: {str(e)}", file=sys.stderr)
+        sys.exit(1)
@@ -0,0 +1,334 @@
+#!/usr/bin/env python3
+"""asyncio HTTP estimation service with request coalescing.
+
+Serves the worker operations over plain HTTP/1.1 on TCP or a Unix socket:
+
+    POST /basic          {"size": 50000, "mode": "organic", ...}
+    POST /advanced       {"size": 120000, "costDrivers": {...}, ...}
+    POST /monte-carlo    {"size": 50000, "iterations": 10000, ...}
+    POST /<op>           any other EstimationWorker op (batch, cache-stats, ...)
+    GET  /health         liveness
+    GET  /stats          micro-batching counters
+
+Responses use the worker envelope: {"ok": true, "result": {...}} or
+{"ok": false, "error": "..."}.
+
+Single-row basic and advanced estimates go through a MicroBatcher: requests
+arriving within --max-wait-ms of each other (up to --max-batch of them) are
+predicted with one model.predict call in a thread pool, and every caller
+gets its own row back. A request therefore waits at most max-wait plus one
+batched predict. Invalid requests are rejected before they join a batch,
+and rows already in the worker's result cache are not predicted again.
+Risk analyses, Monte Carlo and the other ops run one by one on the same
+pool through EstimationWorker, which also confines samplesOut files to
+COCOMO_SAMPLES_DIR.
+
+Usage: python estimation_service.py [--host 127.0.0.1] [--port 8765] [--socket PATH]
+                                    [--max-wait-ms 2] [--max-batch 256] [--threads N]
+"""
+import sys
+import os
+import json
+import asyncio
+import argparse
+import functools
+from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
+
+import model_store
+import predict_basic
+import predict_advanced
+import predict_batch
+from result_cache import make_key
+from worker import EstimationWorker
+from cocomo_formulas import formula_only
+
+DEFAULT_MAX_WAIT_MS = 2
+DEFAULT_MAX_BATCH = 256
+
+# Largest request body accepted, in bytes
+MAX_BODY_SIZE = 10 * 1024 * 1024
+
+REASONS = {200: 'OK', 400: 'Bad Request', 404: 'Not Found', 405: 'Method Not Allowed', 413: 'Payload Too Large'}
+
+class MicroBatcher:
+    """Coalesce concurrent submit() calls into batched calls of predict_many(items)
+
+    validate(item), if given, runs on submit and its exception goes to that caller only.
+    """
+
+    def __init__(self, predict_many, executor, max_wait=DEFAULT_MAX_WAIT_MS / 1000, max_batch=DEFAULT_MAX_BATCH,
+                 validate=None):
+        self.predict_many = predict_many
+        self.validate = validate
+        self.executor = executor
+        self.max_wait = max_wait
+        self.max_batch = max_batch
+        self._pending = []
+        self._timer = None
+        self.batches = 0
+        self.items = 0
+        self.largest_batch = 0
+        self.retries = 0
+
+    async def submit(self, item):
+        """Queue one item and wait for its result"""
+        if self.validate is not None:
+            self.validate(item)
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending.append((item, future))
+
+        if len(self._pending) >= self.max_batch:
+            self._flush()
+        elif self._timer is None:
+            # The first item of a batch bounds everyone's wait
+            self._timer = loop.call_later(self.max_wait, self._flush)
+        return await future
+
+    def _flush(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        batch, self._pending = self._pending, []
+        if batch:
+            asyncio.get_running_loop().create_task(self._run(batch))
+
+    async def _run(self, batch):
+        items = [item for item, _ in batch]
+        self.batches += 1
+        self.items += len(items)
+        self.largest_batch = max(self.largest_batch, len(items))
+        loop = asyncio.get_running_loop()
+        try:
+            outcomes = [(True, result) for result in await loop.run_in_executor(self.executor, self.predict_many, items)]
+        except Exception as e:
+            if len(items) == 1:
+                outcomes = [(False, e)]
+            else:
+                # One bad row must not fail its neighbours: retry them one by one
+                self.retries += 1
+                outcomes = await loop.run_in_executor(self.executor, self._one_by_one, items)
+        for (_, future), (ok, value) in zip(batch, outcomes):
+            if future.done():
+                continue
+            if ok:
+                future.set_result(value)
+            else:
+                future.set_exception(value)
+
+    def _one_by_one(self, items):
+        outcomes = []
+        for item in items:
+            try:
+                outcomes.append((True, self.predict_many([item])[0]))
+            except Exception as e:
+                outcomes.append((False, e))
+        return outcomes
+
+    def stats(self):
+        return {
+            'batches': self.batches,
+            'items': self.items,
+            'largestBatch': self.largest_batch,
+            'retries': self.retries,
+            'meanBatch': self.items / self.batches if self.batches else 0.0
+        }
+
+def basic_row(params):
+    """Feature row of a basic request, as the worker builds it; raises on invalid input"""
+    return predict_basic.feature_row(
+        params['size'], params.get('mode', 'embedded'), params.get('reliability', 1.15), params.get('complexity', 1.30)
+    )
+
+def _cached_batch(params_list, keys, cache, predict_missing):
+    """Cached results where present, predict_missing(params) for the others, which are then cached"""
+    results = [cache.get(key) for key in keys] if cache is not None else [None] * len(params_list)
+    missing = [i for i, result in enumerate(results) if result is None]
+    if missing:
+        for i, result in zip(missing, predict_missing([params_list[i] for i in missing])):
+            results[i] = result
+            if cache is not None:
+                cache.set(keys[i], result)
+    return results
+
+def predict_basic_many(params_list, cache=None):
+    """One model.predict call for the uncached rows of a batch of basic requests"""
+    model_path = predict_basic.basic_model_path()
+    rows = [basic_row(params) for params in params_list]
+    keys = None
+    if cache is not None:
+        # Same keys as EstimationWorker.basic, so both paths share results
+        model_version = model_store.model_version(model_path)
+        keys = [make_key('basic', model_version, row) for row in rows]
+    model = model_store.get_model(model_path)
+    return _cached_batch(params_list, keys, cache, lambda missing: predict_basic.estimate_basic_batch(missing, model))
+
+def predict_advanced_many(params_list, cache=None):
+    """One model.predict call for the uncached rows of a batch of advanced requests, shaped like estimate_advanced results"""
+    model_path = predict_advanced.advanced_model_path(len(params_list))
+    # Raises on a request without a usable size, as estimate_advanced does
+    encoded = [predict_advanced.encode_params(params) for params in params_list]
+    keys = None
+    if cache is not None:
+        # Same keys as estimate_advanced, so both paths share results
+        model_version = model_store.model_version(model_path)
+        keys = [
+            predict_advanced.estimate_cache_key(size, scale, cost, float(params.get('sced', 0) or 0), model_version)
+            for params, (size, scale, cost) in zip(params_list, encoded)
+        ]
+    model = model_store.get_model(model_path)
+    timestamp = datetime.utcnow().strftime('%Y-%m-%d %H:%M:%S')
+
+    def predict_missing(missing):
+        results = predict_batch.estimate_batch(missing, model)
+        for result in results:
+            result.pop('id', None)
+            result['currentUser'] = 'Huy-VNNIC'
+            result['timestamp'] = timestamp
+        return results
+
+    results = _cached_batch(params_list, keys, cache, predict_missing)
+    for result in results:
+        result['timestamp'] = timestamp
+    return results
+
+class EstimationService:
+    """Routes HTTP requests to the micro-batchers or the worker"""
+
+    def __init__(self, max_wait_ms=DEFAULT_MAX_WAIT_MS, max_batch=DEFAULT_MAX_BATCH, threads=None):
+        self.worker = EstimationWorker()
+        self.executor = ThreadPoolExecutor(max_workers=threads)
+        cache = self.worker.cache
+        self.batchers = {
+            'basic': MicroBatcher(
+                functools.partial(predict_basic_many, cache=cache), self.executor, max_wait_ms / 1000, max_batch,
+                validate=basic_row
+            ),
+            'advanced': MicroBatcher(
+                functools.partial(predict_advanced_many, cache=cache), self.executor, max_wait_ms / 1000, max_batch,
+                validate=predict_advanced.encode_params
+            )
+        }
+
+    def _batchable(self, op, params):
+        # Only plain single-row estimates; anything with extra behaviour keeps the worker path
+        if op not in self.batchers or formula_only(params):
+            return False
+        return not any(params.get(flag) for flag in ('riskAnalysis', 'interactive', 'timings', 'profile'))
+
+    async def estimate(self, op, params):
+        """Result of one operation, coalesced with concurrent requests when possible"""
+        if self._batchable(op, params):
+            return await self.batchers[op].submit(params)
+
+        response = await asyncio.get_running_loop().run_in_executor(
+            self.executor, self.worker.handle, {'op': op, 'params': params}
+        )
+        if not response['ok']:
+            raise ValueError(response['error'])
+        return response['result']
+
+    def stats(self):
+        return {op: batcher.stats() for op, batcher in self.batchers.items()}
+
+    async def handle_connection(self, reader, writer):
+        """Serve HTTP/1.1 requests on one connection (keep-alive supported)"""
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line.strip():
+                    break
+                method, target, version = request_line.decode('latin-1').split(None, 2)
+
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b'\r\n', b'\n', b''):
+                        break
+                    name, _, value = line.decode('latin-1').partition(':')
+                    headers[name.strip().lower()] = value.strip()
+
+                length = int(headers.get('content-length', 0))
+                if length > MAX_BODY_SIZE:
+                    await self._respond(writer, 413, {'ok': False, 'error': 'Request body too large'}, False)
+                    break
+                body = await reader.readexactly(length) if length else b''
+
+                keep_alive = headers.get('connection', '').lower() != 'close' and version.strip() == 'HTTP/1.1'
+                status, payload = await self._dispatch(method, target.split('?', 1)[0], body)
+                await self._respond(writer, status, payload, keep_alive)
+                if not keep_alive:
+                    break
+        except (asyncio.IncompleteReadError, ConnectionError, ValueError):
+            pass
+        finally:
+            writer.close()
+
+    async def _dispatch(self, method, path, body):
+        if method == 'GET' and path == '/health':
+            return 200, {'ok': True, 'result': {'status': 'up'}}
+        if method == 'GET' and path == '/stats':
+            return 200, {'ok': True, 'result': self.stats()}
+        if method != 'POST':
+            return 405, {'ok': False, 'error': f"Method not allowed: {method}"}
+
+        op = path.strip('/')
+        if op not in self.worker.handlers:
+            return 404, {'ok': False, 'error': f"Unknown op: {op}"}
+
+        try:
+            params = json.loads(body) if body else {}
+        except ValueError as e:
+            return 400, {'ok': False, 'error': f"Invalid JSON: {str(e)}"}
+
+        try:
+            return 200, {'ok': True, 'result': await self.estimate(op, params)}
+        except Exception as e:
+            return 400, {'ok': False, 'error': str(e)}
+
+    async def _respond(self, writer, status, payload, keep_alive):
+        body = json.dumps(payload).encode('utf-8')
+        head = (
+            f"HTTP/1.1 {status} {REASONS.get(status, 'OK')}\r\n"
+            f"Content-Type: application/json\r\n"
+            f"Content-Length: {len(body)}\r\n"
+            f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n"
+        )
+        writer.write(head.encode('latin-1') + body)
+        await writer.drain()
+
+async def serve(service, host='127.0.0.1', port=8765, socket_path=None):
+    """Listen on a Unix socket if given, TCP otherwise, until cancelled"""
+    if socket_path:
+        if os.path.exists(socket_path):
+            os.unlink(socket_path)
+        server = await asyncio.start_unix_server(service.handle_connection, path=socket_path)
+    else:
+        server = await asyncio.start_server(service.handle_connection, host, port)
+    async with server:
+        await server.serve_forever()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="asyncio COCOMO estimation service with micro-batching")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--socket', help="Listen on this Unix socket instead of TCP")
+    parser.add_argument('--max-wait-ms', type=float, default=DEFAULT_MAX_WAIT_MS,
+                        help="Longest a request waits for others to join its batch")
+    parser.add_argument('--max-batch', type=int, default=DEFAULT_MAX_BATCH, help="Rows per batched predict")
+    parser.add_argument('--threads', type=int, help="Executor threads (default: Python's default)")
+    args = parser.parse_args()
+
+    try:
+        service = EstimationService(args.max_wait_ms, args.max_batch, args.threads)
+        asyncio.run(serve(service, args.host, args.port, args.socket))
+    except KeyboardInterrupt:
+        pass
+    except Exception as e:
+        print(f"Error in estimation service: {str(e)}", file=sys.stderr)
+        sys.exit(1)
+    finally:
+        # Monte Carlo runs with workers > 1 leave a process pool behind
+        import parallel_monte_carlo
+        parallel_monte_carlo.shutdown_pools()
@@ -0,0 +1,264 @@
+#!/usr/bin/env python3
+"""Flattened tree-ensemble inference.
+
+flatten_forest() copies every tree of a fitted RandomForestRegressor (or a
+single DecisionTreeRegressor) into contiguous NumPy arrays (feature,
+threshold, left, value) that all trees share. Nodes are renumbered so the
+two children of a node are adjacent: the right child is always left + 1,
+and one step down a tree is `left[node] + (x > threshold[node])`.
+Leaves point to themselves with an infinite threshold, so a row can take
+a fixed number of steps without masking.
+
+FlatForest.predict() walks the trees level by level with vectorized
+gathers. Small batches step all trees at once, which avoids sklearn's
+per-call validation and per-tree dispatch. Large batches go one tree at a
+time over blocks of rows, so the working set stays in cache.
+
+Usage: python forest_engine.py export <model.pkl>   # write <model>.forest/
+       python forest_engine.py verify <model.pkl>   # compare with sklearn and time both
+"""
+import sys
+import os
+import json
+import time
+import numpy as np
+
+# Rows evaluated together; bounds the index arrays of one step
+DEFAULT_BLOCK_SIZE = 8192
+
+# Up to this many rows, all trees are stepped together in one array
+ALL_TREES_MAX_ROWS = 256
+
+ARRAY_NAMES = ['feature', 'threshold', 'left', 'value', 'roots', 'depths']
+
+def forest_path(model_path):
+    """Directory holding the flattened arrays for a pickled model"""
+    return os.path.splitext(model_path)[0] + '.forest'
+
+def float32_thresholds(threshold):
+    """Largest float32 <= each threshold, so float32 inputs split exactly as in sklearn"""
+    rounded = threshold.astype(np.float32)
+    above = rounded.astype(np.float64) > threshold
+    rounded[above] = np.nextafter(rounded[above], np.float32(-np.inf))
+    return rounded
+
+class FlatForest:
+    """A tree ensemble stored as flat node arrays"""
+
+    def __init__(self, feature, threshold, left, value, roots, depths, n_features):
+        self.feature = feature
+        self.threshold = threshold
+        self.left = left
+        self.value = value
+        self.roots = roots
+        self.depths = depths
+        self.n_features_in_ = int(n_features)
+
+    @property
+    def n_trees(self):
+        return len(self.roots)
+
+    @property
+    def n_nodes(self):
+        return len(self.feature)
+
+    @property
+    def max_depth(self):
+        return int(self.depths.max()) if len(self.depths) else 0
+
+    def arrays(self):
+        """The node arrays by name"""
+        return {name: getattr(self, name) for name in ARRAY_NAMES}
+
+    def predict(self, X, block_size=DEFAULT_BLOCK_SIZE):
+        """Mean prediction of all trees for an (N x n_features) batch"""
+        # sklearn evaluates trees on float32 inputs; do the same so splits match exactly
+        X = np.asarray(X, dtype=np.float32)
+        if X.ndim != 2 or X.shape[1] != self.n_features_in_:
+            raise ValueError(f"Expected an (N x {self.n_features_in_}) array, got shape {X.shape}")
+
+        # Index arrays as intp once per call, so every gather below avoids a cast
+        left = np.asarray(self.left, dtype=np.intp)
+        feature = np.asarray(self.feature, dtype=np.intp)
+
+        out = np.empty(len(X))
+        for start in range(0, len(X), block_size):
+            block = X[start:start + block_size]
+            if len(block) <= ALL_TREES_MAX_ROWS:
+                out[start:start + len(block)] = self._predict_all_trees(block, feature, left)
+            else:
+                out[start:start + len(block)] = self._predict_per_tree(block, feature, left)
+        return out
+
+    def _predict_all_trees(self, X, feature, left):
+        n = len(X)
+        # Feature-major flat copy: the value of feature f for row i is at f * n + i
+        X_flat = np.ascontiguousarray(X.T).ravel()
+        feature_offsets = feature * n
+        columns = np.arange(n)
+
+        nodes = np.repeat(np.asarray(self.roots, dtype=np.intp)[:, None], n, axis=1)
+        for _ in range(self.max_depth):
+            values = np.take(X_flat, np.take(feature_offsets, nodes) + columns)
+            nodes = np.take(left, nodes) + (values > np.take(self.threshold, nodes))
+
+        return np.take(self.value, nodes).mean(axis=0)
+
+    def _predict_per_tree(self, X, feature, left):
+        n = len(X)
+        X_flat = np.ascontiguousarray(X.T).ravel()
+        feature_offsets = feature * n
+        columns = np.arange(n)
+
+        total = np.zeros(n)
+        for root, depth in zip(self.roots, self.depths):
+            nodes = np.full(n, root, dtype=np.intp)
+            for _ in range(depth):
+                values = np.take(X_flat, np.take(feature_offsets, nodes) + columns)
+                nodes = np.take(left, nodes) + (values > np.take(self.threshold, nodes))
+            total += np.take(self.value, nodes)
+
+        return total / self.n_trees
+
+    def save(self, path):
+        """Write the arrays as .npy files (memory-mappable) plus a small metadata file"""
+        os.makedirs(path, exist_ok=True)
+        for name, array in self.arrays().items():
+            np.save(os.path.join(path, f'{name}.npy'), array)
+        with open(os.path.join(path, 'meta.json'), 'w') as f:
+            json.dump({
+                'n_features': self.n_features_in_,
+                'n_trees': self.n_trees,
+                'n_nodes': self.n_nodes
+            }, f, indent=2)
+            f.write('\n')
+        return path
+
+    @classmethod
+    def load(cls, path, mmap_mode='r'):
+        """Load the arrays written by save(), memory-mapped by default"""
+        with open(os.path.join(path, 'meta.json')) as f:
+            meta = json.load(f)
+        arrays = {
+            name: np.load(os.path.join(path, f'{name}.npy'), mmap_mode=mmap_mode)
+            for name in ARRAY_NAMES
+        }
+        return cls(n_features=meta['n_features'], **arrays)
+
+def _renumber_tree(tree, max_depth=None):
+    """Breadth-first node order in which the two children of a node are adjacent
+
+    Nodes at max_depth become leaves; a regression tree stores the mean
+    target of every node, so a cut node predicts the mean of its subtree.
+    """
+    order = [0]
+    depth = [0]
+    new_ids = np.zeros(tree.node_count, dtype=np.intp)
+    left = np.arange(tree.node_count)
+    for new, old in enumerate(order):
+        if tree.children_left[old] == -1 or depth[new] == max_depth:
+            continue
+        left[new_ids[old]] = len(order)
+        new_ids[tree.children_left[old]] = len(order)
+        new_ids[tree.children_right[old]] = len(order) + 1
+        order.append(tree.children_left[old])
+        order.append(tree.children_right[old])
+        depth += [depth[new] + 1] * 2
+    left = left[:len(order)]
+    is_leaf = left == np.arange(len(order))
+    return np.array(order), left, is_leaf
+
+def flatten_forest(model, estimators=None, max_depth=None, value_dtype=np.float64):
+    """Convert a fitted sklearn forest or tree regressor to a FlatForest
+
+    estimators keeps a subset of the forest's trees, max_depth cuts every
+    tree at that depth and value_dtype stores the leaf values in a smaller
+    type (see compress_model.py).
+    """
+    if estimators is None:
+        estimators = getattr(model, 'estimators_', [model])
+
+    features, thresholds, lefts, values, roots, depths = [], [], [], [], [], []
+    offset = 0
+    for estimator in estimators:
+        tree = estimator.tree_
+        if tree.n_outputs != 1:
+            raise ValueError("Only single-output regressors can be flattened")
+
+        order, left, is_leaf = _renumber_tree(tree, max_depth)
+
+        # Leaves loop back to themselves: threshold +inf never takes the right child
+        features.append(np.where(is_leaf, 0, tree.feature[order]))
+        thresholds.append(np.where(is_leaf, np.inf, tree.threshold[order]))
+        lefts.append(left + offset)
+        values.append(tree.value[order, 0, 0])
+        roots.append(offset)
+        depths.append(tree.max_depth if max_depth is None else min(tree.max_depth, max_depth))
+
+        offset += len(order)
+
+    return FlatForest(
+        feature=np.concatenate(features).astype(np.int32),
+        threshold=float32_thresholds(np.concatenate(thresholds)),
+        left=np.concatenate(lefts).astype(np.int32),
+        value=np.concatenate(values).astype(value_dtype),
+        roots=np.array(roots, dtype=np.int32),
+        depths=np.array(depths, dtype=np.int32),
+        n_features=model.n_features_in_
+    )
+
+def export_forest(model_path):
+    """Flatten a pickled forest and write it next to the model file"""
+    import pickle
+    with open(model_path, 'rb') as f:
+        model = pickle.load(f)
+    return flatten_forest(model).save(forest_path(model_path))
+
+def _best_time(fn, repeat):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+def verify(model_path, batch_sizes=(1, 1000, 100000), seed=0):
+    """Compare FlatForest with sklearn on random inputs and time both"""
+    import pickle
+    with open(model_path, 'rb') as f:
+        model = pickle.load(f)
+    forest = flatten_forest(model)
+
+    # Random inputs spanning the training ranges: size plus 21 drivers rated 1..6
+    rng = np.random.default_rng(seed)
+    report = []
+    for n in batch_sizes:
+        X = np.column_stack((
+            rng.uniform(1000, 500000, n),
+            rng.integers(1, 7, (n, model.n_features_in_ - 1))
+        )).astype(float)
+        expected = model.predict(X)
+        actual = forest.predict(X)
+        repeat = 5 if n <= 1000 else 1
+        report.append({
+            'batchSize': n,
+            'maxAbsError': float(np.max(np.abs(expected - actual))),
+            'sklearnSeconds': _best_time(lambda: model.predict(X), repeat),
+            'flatSeconds': _best_time(lambda: forest.predict(X), repeat)
+        })
+    return report
+
+if __name__ == "__main__":
+    if len(sys.argv) < 3 or sys.argv[1] not in ('export', 'verify'):
+        print("Usage: python forest_engine.py export|verify <model.pkl>", file=sys.stderr)
+        sys.exit(1)
+
+    command, model_file = sys.argv[1], sys.argv[2]
+    try:
+        if command == 'export':
+            print(export_forest(model_file))
+        else:
+            print(json.dumps(verify(model_file), indent=2))
+    except Exception as e:
+        print(f"Error: {str(e)}", file=sys.stderr)
+        sys.exit(1)
@@ -0,0 +1,53 @@
+#!/usr/bin/env python3
+"""Effort regressor that learns one chunk at a time.
+
+COCOMO effort is multiplicative: log(effort) is close to linear in log(size)
+and the driver ratings. IncrementalEffortRegressor fits exactly that with a
+running StandardScaler and an SGDRegressor, both updated through
+partial_fit, so training memory depends on the chunk size only. It takes
+the same 22 features as the advanced forest and can be served in its place.
+"""
+import numpy as np
+from sklearn.linear_model import SGDRegressor
+from sklearn.preprocessing import StandardScaler
+
+# Hyperparameters of the underlying SGDRegressor
+DEFAULT_SGD_PARAMS = {
+    'alpha': 1e-4,
+    'eta0': 0.01,
+    'learning_rate': 'invscaling'
+}
+
+class IncrementalEffortRegressor:
+    """Log-linear effort model trained with partial_fit"""
+
+    def __init__(self, random_state=None, **sgd_params):
+        self.sgd_params = dict(DEFAULT_SGD_PARAMS, **sgd_params)
+        self.random_state = random_state
+        self.scaler = StandardScaler()
+        self.regressor = SGDRegressor(random_state=random_state, **self.sgd_params)
+        self.n_features_in_ = None
+
+    @staticmethod
+    def _transform(X):
+        X = np.asarray(X, dtype=float)
+        # Size enters COCOMO as a power law; work on its logarithm
+        X = X.copy()
+        X[:, 0] = np.log(np.maximum(X[:, 0], 1.0))
+        return X
+
+    def partial_fit(self, X, y):
+        """Update the scaler and the regressor with one chunk of rows"""
+        X = self._transform(X)
+        self.n_features_in_ = X.shape[1]
+        self.scaler.partial_fit(X)
+        self.regressor.partial_fit(self.scaler.transform(X), np.log(y))
+        return self
+
+    def predict(self, X):
+        """Predicted effort (person-months) for an (N x n_features) array"""
+        X = self.scaler.transform(self._transform(X))
+        return np.exp(self.regressor.predict(X))
+
+    def get_params(self):
+        return dict(self.sgd_params, random_state=self.random_state)
@@ -0,0 +1,178 @@
+#!/usr/bin/env python3
+"""Opt-in per-stage timing, peak memory and profiling for the estimators.
+
+Code marks its stages with `stage(name)` or the `timed(name)` decorator.
+Outside a `collect()` block these are no-ops that cost one context-variable
+lookup. Inside one, every stage adds its perf_counter_ns duration to the
+active Timings, which can also track peak traced memory (tracemalloc) and
+write cProfile stats for the request. measure() times repeated calls for
+the benchmark and model-compression reports.
+
+    with collect(memory=True) as timings:
+        result = estimate_advanced(params, model)
+    result['timings'] = timings.to_dict()
+
+Profiles go to COCOMO_PROFILE_DIR (default: the system temp directory).
+tracemalloc is process-wide, so concurrent requests in a threaded worker
+see a shared memory peak.
+"""
+import os
+import time
+import functools
+import contextlib
+import contextvars
+
+_current = contextvars.ContextVar('timings', default=None)
+
+def process_age_ms():
+    """Milliseconds since this process started (Linux only, None elsewhere)"""
+    try:
+        with open('/proc/self/stat') as f:
+            # Fields after the command name, which may itself contain spaces
+            fields = f.read().rsplit(')', 1)[1].split()
+        with open('/proc/uptime') as f:
+            uptime = float(f.read().split()[0])
+        started = int(fields[19]) / os.sysconf('SC_CLK_TCK')
+        return (uptime - started) * 1000
+    except (OSError, ValueError, IndexError):
+        return None
+
+class Timings:
+    """Accumulated stage durations of one request"""
+
+    def __init__(self):
+        self.stages = {}
+        self.peak_memory = None
+        self.profile_path = None
+        self.startup_ms = None
+        self._start = time.perf_counter_ns()
+        self._total = None
+
+    def add(self, name, duration_ns):
+        self.stages[name] = self.stages.get(name, 0) + duration_ns
+
+    @contextlib.contextmanager
+    def stage(self, name):
+        start = time.perf_counter_ns()
+        try:
+            yield
+        finally:
+            self.add(name, time.perf_counter_ns() - start)
+
+    def finish(self):
+        self._total = time.perf_counter_ns() - self._start
+
+    def to_dict(self):
+        """JSON-ready summary; durations in milliseconds"""
+        total = self._total if self._total is not None else time.perf_counter_ns() - self._start
+        timings = {
+            'stages': {name: duration / 1e6 for name, duration in self.stages.items()},
+            'totalMs': total / 1e6
+        }
+        if self.startup_ms is not None:
+            timings['startupMs'] = self.startup_ms
+        if self.peak_memory is not None:
+            timings['peakMemoryBytes'] = self.peak_memory
+        if self.profile_path is not None:
+            timings['profile'] = self.profile_path
+        return timings
+
+def stage(name):
+    """Time a block under the active Timings, if any"""
+    timings = _current.get()
+    return timings.stage(name) if timings is not None else contextlib.nullcontext()
+
+def timed(name=None):
+    """Decorator form of stage(); the stage name defaults to the function name"""
+    def decorator(fn):
+        label = name or fn.__name__
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            timings = _current.get()
+            if timings is None:
+                return fn(*args, **kwargs)
+            with timings.stage(label):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorator
+
+def profile_path(label):
+    """A fresh .prof file name in COCOMO_PROFILE_DIR"""
+    import tempfile
+    directory = os.environ.get('COCOMO_PROFILE_DIR') or tempfile.gettempdir()
+    os.makedirs(directory, exist_ok=True)
+    name = f"{label}-{time.strftime('%Y%m%d-%H%M%S')}-{os.getpid()}-{time.perf_counter_ns()}.prof"
+    return os.path.join(directory, name)
+
+@contextlib.contextmanager
+def collect(memory=True, profile=None, startup=False):
+    """Activate a Timings for the enclosed code
+
+    memory:  track peak traced memory with tracemalloc
+    profile: label of a cProfile dump written for this block, or None
+    startup: record process age on entry (interpreter start and imports, for CLI runs)
+    """
+    timings = Timings()
+    if startup:
+        timings.startup_ms = process_age_ms()
+
+    tracing = False
+    if memory:
+        import tracemalloc
+        # Leave an outer tracemalloc session running, only reset its peak
+        tracing = not tracemalloc.is_tracing()
+        if tracing:
+            tracemalloc.start()
+        tracemalloc.reset_peak()
+
+    profiler = None
+    if profile:
+        import cProfile
+        profiler = cProfile.Profile()
+        profiler.enable()
+
+    token = _current.set(timings)
+    try:
+        yield timings
+    finally:
+        _current.reset(token)
+        timings.finish()
+        if profiler is not None:
+            profiler.disable()
+            timings.profile_path = profile_path(profile)
+            profiler.dump_stats(timings.profile_path)
+        if memory:
+            import tracemalloc
+            timings.peak_memory = tracemalloc.get_traced_memory()[1]
+            if tracing:
+                tracemalloc.stop()
+
+def request_timings(params, label, startup=False):
+    """collect() when a request asks for 'timings' or 'profile', else a context yielding None
+
+    tracemalloc slows allocation-heavy stages such as unpickling a forest;
+    a request can pass 'memory': false to get undistorted stage times.
+    """
+    if not (params.get('timings') or params.get('profile')):
+        return contextlib.nullcontext()
+    return collect(
+        memory=params.get('memory', True) is not False,
+        profile=label if params.get('profile') else None,
+        startup=startup
+    )
+
+def measure(fn, repeat):
+    """Wall-clock seconds of each of repeat calls of fn: min, median and mean"""
+    import statistics
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - start)
+    return {
+        'repeat': repeat,
+        'min': min(times),
+        'median': statistics.median(times),
+        'mean': statistics.fmean(times)
+    }
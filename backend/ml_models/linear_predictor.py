@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+"""Closed-form predictor for fitted linear models.
+
+A linear model is exported to a small JSON coefficient file
+(`<name>.coef.json`) and evaluated as a dot product: pure Python for a
+single row, NumPy for batches. Neither path imports sklearn.
+
+Usage: python linear_predictor.py <model.pkl> [feature names...]   # export coefficients
+"""
+import sys
+import os
+import json
+
+def coefficients_path(model_path):
+    """Path of the coefficient file exported for a pickled model"""
+    return os.path.splitext(model_path)[0] + '.coef.json'
+
+def export_linear_model(model, path, feature_names=None):
+    """Write the coefficients of a fitted linear model to a JSON file"""
+    coef = [float(c) for c in model.coef_]
+    if feature_names is None:
+        feature_names = [f'x{i}' for i in range(len(coef))]
+    if len(feature_names) != len(coef):
+        raise ValueError(f"Expected {len(coef)} feature names, got {len(feature_names)}")
+
+    with open(path, 'w') as f:
+        json.dump({
+            'type': 'linear',
+            'features': list(feature_names),
+            'coef': coef,
+            'intercept': float(model.intercept_)
+        }, f, indent=2)
+        f.write('\n')
+    return path
+
+class LinearPredictor:
+    """Evaluates intercept + coef . x without sklearn"""
+
+    def __init__(self, coef, intercept, features=None):
+        self.coef = [float(c) for c in coef]
+        self.intercept = float(intercept)
+        self.features = features
+        self.n_features_in_ = len(self.coef)
+
+    @classmethod
+    def from_file(cls, path):
+        with open(path) as f:
+            data = json.load(f)
+        if data.get('type') != 'linear':
+            raise ValueError(f"Not a linear coefficient file: {path}")
+        return cls(data['coef'], data['intercept'], data.get('features'))
+
+    def predict_one(self, row):
+        """Predict a single row in pure Python"""
+        if len(row) != len(self.coef):
+            raise ValueError(f"Expected {len(self.coef)} features, got {len(row)}")
+        return self.intercept + sum(c * float(x) for c, x in zip(self.coef, row))
+
+    def predict(self, X):
+        """Predict a 2-D batch with NumPy, same call shape as sklearn"""
+        import numpy as np
+        X = np.asarray(X, dtype=float)
+        if X.ndim != 2 or X.shape[1] != len(self.coef):
+            raise ValueError(f"Expected an (N x {len(self.coef)}) array, got shape {X.shape}")
+        return X @ np.asarray(self.coef) + self.intercept
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2:
+        print("Usage: python linear_predictor.py <model.pkl> [feature names...]", file=sys.stderr)
+        sys.exit(1)
+
+    import model_store
+    model_file = sys.argv[1]
+    # model_store also reads joblib dumps such as model/linear_model_best.pkl
+    fitted = model_store.get_model(model_file)
+    names = sys.argv[2:] or None
+    if names is None and hasattr(fitted, 'feature_names_in_'):
+        names = [str(name) for name in fitted.feature_names_in_]
+    print(export_linear_model(fitted, coefficients_path(model_file), names))
@@ -0,0 +1,292 @@
+#!/usr/bin/env python3
+"""Registry of every pickled model under backend/model/ and backend/ml_models/.
+
+Each `<name>.pkl` has a feature schema next to it (`<name>.schema.json`):
+
+    {
+      "name": "linear_model_best",       optional, defaults to the file name
+      "version": "2024-06",              optional, defaults to a content hash
+      "features": [
+        {"name": "SLOC"},
+        {"name": "mode", "map": {"organic": 1, "embedded": 3}, "unknown": 3, "default": 3},
+        {"name": "complexity", "path": ["costDrivers", "complexity"], "map": {...}},
+        {"name": "Nominal_Feature_WebApp", "path": ["Nominal_Feature"], "equals": "WebApp"}
+      ]
+    }
+
+A feature reads the input value at `path` (default [name]). Then it either
+translates it through `map` (`unknown` for labels not in the map), or
+one-hot encodes it with `equals`. It falls back to `default` when the value
+is missing; a feature without one is required. A one-hot column given
+directly under its own name is used as is. Input keys that no feature
+reads are rejected, so a misspelled name is an error, not a silent default.
+
+compile_schema() turns the list into one getter per column, so encoding a
+request is a list comprehension, not a pandas DataFrame.
+
+Models without a schema file get one from sklearn's feature_names_in_
+(all numeric and required); `python model_registry.py schema <model.pkl>`
+writes it out for editing. The served file follows the same rules as the
+estimators: an exported `.coef.json` or `.forest/` when it is at least as
+new as the pickle (the shared-memory forest for the advanced model when
+hosted), and the `.joblib` export via model_store.
+
+Usage: python model_registry.py list
+       python model_registry.py predict <name> '<json features>' [--version V]
+       python model_registry.py schema <model.pkl>
+"""
+import sys
+import os
+import json
+import glob
+import argparse
+
+import model_store
+
+DIRECTORY = os.path.dirname(os.path.abspath(__file__))
+
+# Directories scanned for *.pkl models
+SEARCH_DIRECTORIES = [
+    os.path.join(os.path.dirname(DIRECTORY), 'model'),
+    DIRECTORY
+]
+
+MISSING = object()
+
+def schema_path(model_path):
+    """Schema file stored next to a pickled model"""
+    return os.path.splitext(model_path)[0] + '.schema.json'
+
+def served_path(model_path):
+    """The export actually loaded for a pickled model, if one is up to date"""
+    import predict_advanced
+    if os.path.abspath(model_path) == predict_advanced.MODEL_PATH:
+        # Same file as the advanced estimator, so a hosted shared-memory forest is honoured
+        return predict_advanced.advanced_model_path()
+    from linear_predictor import coefficients_path
+    from forest_engine import forest_path
+    model_mtime = os.stat(model_path).st_mtime_ns
+    coef_path = coefficients_path(model_path)
+    if os.path.exists(coef_path) and os.stat(coef_path).st_mtime_ns >= model_mtime:
+        return coef_path
+    meta_path = os.path.join(forest_path(model_path), 'meta.json')
+    if os.path.exists(meta_path) and os.stat(meta_path).st_mtime_ns >= model_mtime:
+        return forest_path(model_path)
+    return model_path
+
+def infer_schema(model, name):
+    """Numeric schema from a fitted model's feature_names_in_"""
+    names = getattr(model, 'feature_names_in_', None)
+    if names is None:
+        raise ValueError(f"Model {name} has no schema file and no feature_names_in_")
+    return {'name': name, 'features': [{'name': str(feature)} for feature in names]}
+
+def _getter(spec):
+    """Value of one feature column from a request dict"""
+    name = spec['name']
+    path = spec.get('path', [name])
+    default = spec.get('default', MISSING)
+    mapping = spec.get('map')
+    unknown = spec.get('unknown', default)
+    equals = spec.get('equals', MISSING)
+
+    def lookup(record):
+        # Requests built for the old DataFrame path carry one-hot columns directly
+        if equals is not MISSING and name in record:
+            return float(record[name])
+        value = record
+        for key in path:
+            if not isinstance(value, dict) or value.get(key) is None:
+                if default is MISSING:
+                    raise ValueError(f"Missing feature: {'.'.join(path)}")
+                return float(default)
+            value = value[key]
+        if equals is not MISSING:
+            return 1.0 if value == equals else 0.0
+        if mapping is not None:
+            if value in mapping:
+                return float(mapping[value])
+            if unknown is MISSING:
+                raise ValueError(f"Unknown value for {'.'.join(path)}: {value}")
+            return float(unknown)
+        return float(value)
+    return lookup
+
+class SchemaEncoder:
+    """Compiled dict-to-row encoder of one feature schema"""
+
+    def __init__(self, schema):
+        self.features = [spec['name'] for spec in schema['features']]
+        self._getters = [_getter(spec) for spec in schema['features']]
+        # Top-level input keys some feature reads, plus one-hot columns given directly
+        self.inputs = set()
+        for spec in schema['features']:
+            self.inputs.add(spec.get('path', [spec['name']])[0])
+            if 'equals' in spec:
+                self.inputs.add(spec['name'])
+
+    def check(self, record):
+        """Raise ValueError on input keys no feature reads"""
+        if not isinstance(record, dict):
+            raise ValueError(f"Features must be an object, got {type(record).__name__}")
+        unknown = [key for key in record if key not in self.inputs]
+        if unknown:
+            raise ValueError(f"Unknown feature(s): {', '.join(sorted(map(str, unknown)))}")
+
+    def encode(self, record):
+        """One model input row"""
+        self.check(record)
+        return [getter(record) for getter in self._getters]
+
+    def encode_batch(self, records):
+        """(N x features) array for many requests"""
+        import numpy as np
+        for record in records:
+            self.check(record)
+        return np.array([[getter(record) for getter in self._getters] for record in records], dtype=float)
+
+def compile_schema(schema):
+    return SchemaEncoder(schema)
+
+class RegisteredModel:
+    """A discovered model file, its schema and compiled encoder"""
+
+    def __init__(self, model_path, schema):
+        self.model_path = model_path
+        self.source = served_path(model_path)
+        self.schema = schema
+        self.name = schema.get('name') or os.path.splitext(os.path.basename(model_path))[0]
+        self.encoder = compile_schema(schema)
+        self._version = schema.get('version')
+
+    @property
+    def model(self):
+        return model_store.get_model(self.source)
+
+    @property
+    def version(self):
+        if self._version is None:
+            self._version = model_store.model_version(self.source)[:12]
+        return self._version
+
+    def predict(self, records):
+        """Predictions for a list of request dicts, one model.predict call"""
+        model = self.model
+        if hasattr(model, 'predict_one') and len(records) == 1:
+            # Closed-form models answer a single row without numpy
+            return [float(model.predict_one(self.encoder.encode(records[0])))]
+        return [float(value) for value in model.predict(self.encoder.encode_batch(records))]
+
+    def describe(self):
+        return {
+            'name': self.name,
+            'version': self.version,
+            'path': self.model_path,
+            'source': self.source,
+            'features': self.encoder.features
+        }
+
+class ModelRegistry:
+    """Every model found in the search directories, routed by name and version"""
+
+    def __init__(self, directories=None):
+        self.directories = directories or SEARCH_DIRECTORIES
+        self.models = {}
+        self.skipped = {}
+        self.discover()
+
+    def discover(self):
+        """Scan the directories for *.pkl files and read their schemas"""
+        models, skipped = {}, {}
+        for directory in self.directories:
+            for model_path in sorted(glob.glob(os.path.join(directory, '*.pkl'))):
+                try:
+                    path = schema_path(model_path)
+                    if os.path.exists(path):
+                        with open(path) as f:
+                            schema = json.load(f)
+                    else:
+                        stem = os.path.splitext(os.path.basename(model_path))[0]
+                        schema = infer_schema(model_store.get_model(model_path), stem)
+                    entry = RegisteredModel(model_path, schema)
+                except Exception as e:
+                    skipped[model_path] = str(e)
+                    continue
+                models.setdefault(entry.name, []).append(entry)
+        # Newest file first, so it is the default version of its name
+        for entries in models.values():
+            entries.sort(key=lambda entry: os.stat(entry.model_path).st_mtime_ns, reverse=True)
+        self.models, self.skipped = models, skipped
+        return self
+
+    def preload(self):
+        """Load every model now rather than on its first request"""
+        for entries in self.models.values():
+            for entry in entries:
+                entry.model
+        return self
+
+    def get(self, name, version=None):
+        entries = self.models.get(name)
+        if not entries:
+            raise ValueError(f"Unknown model: {name} (available: {', '.join(sorted(self.models))})")
+        if version is None:
+            return entries[0]
+        for entry in entries:
+            # A content-hash version may be given by prefix
+            if entry.version == version or (entry.schema.get('version') is None
+                                            and entry.version.startswith(str(version))):
+                return entry
+        raise ValueError(f"Unknown version {version} of model {name}")
+
+    def predict(self, params):
+        """Route {'model', 'version', 'features' | 'rows'} to a model"""
+        entry = self.get(params['model'], params.get('version'))
+        if 'rows' in params:
+            return {'model': entry.name, 'version': entry.version, 'predictions': entry.predict(params['rows'])}
+        return {'model': entry.name, 'version': entry.version, 'prediction': entry.predict([params.get('features', {})])[0]}
+
+    def describe(self):
+        return {
+            'models': [entry.describe() for entries in self.models.values() for entry in entries],
+            'skipped': self.skipped
+        }
+
+_default = None
+
+def default_registry():
+    """Process-wide registry, discovered on first use"""
+    global _default
+    if _default is None:
+        _default = ModelRegistry()
+    return _default
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Model registry with compiled feature schemas")
+    commands = parser.add_subparsers(dest='command', required=True)
+    commands.add_parser('list', help="Discovered models, versions and features")
+    predict_parser = commands.add_parser('predict', help="Predict one request with a named model")
+    predict_parser.add_argument('name')
+    predict_parser.add_argument('features', help="JSON object of input values")
+    predict_parser.add_argument('--version')
+    schema_parser = commands.add_parser('schema', help="Write a schema file inferred from feature_names_in_")
+    schema_parser.add_argument('model')
+    args = parser.parse_args()
+
+    try:
+        if args.command == 'list':
+            print(json.dumps(ModelRegistry().describe(), indent=2))
+        elif args.command == 'predict':
+            print(json.dumps(ModelRegistry().predict({
+                'model': args.name, 'version': args.version, 'features': json.loads(args.features)
+            })))
+        else:
+            stem = os.path.splitext(os.path.basename(args.model))[0]
+            schema = infer_schema(model_store.get_model(args.model), stem)
+            with open(schema_path(args.model), 'w') as f:
+                json.dump(schema, f, indent=2)
+                f.write('\n')
+            print(schema_path(args.model))
+    except Exception as e:
+        print(f"Error: {str(e)}", file=sys.stderr)
+        sys.exit(1)
@@ -0,0 +1,166 @@
+#!/usr/bin/env python3
+"""Per-process model cache with hot reload and memory-mappable storage.
+
+get_model(path) loads a model once per process and keeps it until the file
+on disk changes (mtime, size or inode), at which point the next call
+reloads it. If a `<name>.joblib` export sits next to `<name>.pkl` and is at
+least as new, it is loaded with mmap_mode='r' so its numpy arrays are
+backed by the page cache and shared between processes.
+
+Usage: python model_store.py export <model.pkl>   # write <model>.joblib
+       python model_store.py info <model.pkl>     # print version and format
+"""
+import sys
+import os
+import json
+import pickle
+import threading
+
+_cache = {}
+_lock = threading.Lock()
+
+def _load_pickle(path):
+    with open(path, 'rb') as f:
+        model = pickle.load(f)
+    # A joblib.dump file stores its arrays outside the pickle stream; plain
+    # pickle.load returns a bare array instead of the model
+    if not hasattr(model, 'predict'):
+        import joblib
+        model = joblib.load(path)
+    return model
+
+def _load_joblib(path):
+    import joblib
+    return joblib.load(path, mmap_mode='r')
+
+def _load_linear(path):
+    from linear_predictor import LinearPredictor
+    return LinearPredictor.from_file(path)
+
+def _load_forest(path):
+    from forest_engine import FlatForest
+    return FlatForest.load(path, mmap_mode='r')
+
+def _load_shared_forest(path):
+    from shared_forest import load_descriptor
+    return load_descriptor(path)
+
+def _load_surrogate(path):
+    from compress_model import load_surrogate
+    return load_surrogate(path)
+
+def _load_grid(path):
+    from effort_grid import EffortGrid
+    return EffortGrid.load(path, mmap_mode='r')
+
+# Loader for each on-disk format, keyed by file extension
+LOADERS = {
+    '.pkl': _load_pickle,
+    '.joblib': _load_joblib,
+    '.json': _load_linear,
+    '.forest': _load_forest,
+    '.grid': _load_grid,
+    '.shm': _load_shared_forest,
+    '.surrogate': _load_surrogate
+}
+
+def mmap_path(path):
+    """Path of the memory-mappable export for a model file"""
+    return os.path.splitext(path)[0] + '.joblib'
+
+def resolve_model_file(path):
+    """The file that should actually be loaded for a model path"""
+    exported = mmap_path(path)
+    if exported != path and os.path.exists(exported):
+        if os.stat(exported).st_mtime_ns >= os.stat(path).st_mtime_ns:
+            return exported
+    return path
+
+def _signature(path):
+    # Directory formats rewrite meta.json last; overwriting their arrays leaves the directory mtime alone
+    if os.path.isdir(path):
+        path = os.path.join(path, 'meta.json')
+    stat = os.stat(path)
+    return (stat.st_mtime_ns, stat.st_size, stat.st_ino)
+
+def _file_hash(path):
+    import hashlib
+    digest = hashlib.sha256()
+    # A directory format (e.g. flattened forest arrays) hashes its files in name order
+    if os.path.isdir(path):
+        files = [os.path.join(path, name) for name in sorted(os.listdir(path))]
+    else:
+        files = [path]
+    for file_path in files:
+        with open(file_path, 'rb') as f:
+            for block in iter(lambda: f.read(1 << 20), b''):
+                digest.update(block)
+    return digest.hexdigest()
+
+def _entry(path):
+    """Cached entry for a model path, reloading it if the file changed"""
+    path = os.path.abspath(path)
+    source = resolve_model_file(path)
+    signature = (source, _signature(source))
+
+    entry = _cache.get(path)
+    if entry is not None and entry['signature'] == signature:
+        return entry
+
+    with _lock:
+        entry = _cache.get(path)
+        if entry is None or entry['signature'] != signature:
+            loader = LOADERS.get(os.path.splitext(source)[1], _load_pickle)
+            entry = {
+                'signature': signature,
+                'source': source,
+                'model': loader(source),
+                'version': None
+            }
+            _cache[path] = entry
+        return entry
+
+def get_model(path):
+    """Load a model, reusing the cached copy while the file is unchanged"""
+    return _entry(path)['model']
+
+def model_version(path):
+    """Content hash of the model file currently served for a path"""
+    entry = _entry(path)
+    if entry['version'] is None:
+        entry['version'] = _file_hash(entry['source'])
+    return entry['version']
+
+def clear_cache():
+    """Forget every loaded model"""
+    with _lock:
+        _cache.clear()
+
+def export_mmap(path):
+    """Write the memory-mappable joblib export next to a pickled model"""
+    import joblib
+    model = _load_pickle(path)
+    target = mmap_path(path)
+    # Uncompressed, so numpy arrays can be memory-mapped on load
+    joblib.dump(model, target)
+    return target
+
+if __name__ == "__main__":
+    if len(sys.argv) < 3 or sys.argv[1] not in ('export', 'info'):
+        print("Usage: python model_store.py export|info <model.pkl>", file=sys.stderr)
+        sys.exit(1)
+
+    command, model_file = sys.argv[1], sys.argv[2]
+    try:
+        if command == 'export':
+            print(export_mmap(model_file))
+        else:
+            get_model(model_file)
+            print(json.dumps({
+                'path': os.path.abspath(model_file),
+                'source': resolve_model_file(os.path.abspath(model_file)),
+                'version': model_version(model_file)
+            }))
+    except Exception as e:
+        print(f"Error: {str(e)}", file=sys.stderr)
+        sys.exit(1)
@@ -1,135 +1,205 @@
 #!/usr/bin/env python3
 import sys
 import json
-import pickle
-import numpy as np
 import os
 
+import model_store
+from predict_basic import basic_model_path
+from streaming_simulation import run_streaming, DEFAULT_BATCH_SIZE, DEFAULT_TOLERANCE
+from instrumentation import stage, timed, request_timings
+from cocomo_formulas import formula_only, simulate_formula_monte_carlo
+from sample_output import samples_options, export_samples
+from samplers import make_sampler, uniform_range, DEFAULT_SAMPLER
+
 def load_model(model_path):
-    """Load a trained model from a .pkl file"""
+    """Load a trained model from the per-process model store"""
     try:
-        with open(model_path, 'rb') as f:
-            model = pickle.load(f)
-        return model
+        return model_store.get_model(model_path)
     except Exception as e:
         print(f"Error loading model: {str(e)}", file=sys.stderr)
         sys.exit(1)
 
+# Percentiles reported for each output distribution
+EFFORT_PERCENTILES = (10, 25, 50, 75, 90)
+SUMMARY_PERCENTILES = (10, 50, 90)
+OUTPUT_PERCENTILES = {
+    'effort': EFFORT_PERCENTILES,
+    'schedule': SUMMARY_PERCENTILES,
+    'teamSize': SUMMARY_PERCENTILES,
+    'cost': SUMMARY_PERCENTILES
+}
+
+def get_coefficients(mode):
+    """COCOMO coefficients (a, b) based on mode"""
+    if mode.lower() == 'organic':
+        return 2.4, 1.05
+    elif mode.lower() == 'semi-detached':
+        return 3.0, 1.12
+    else:  # embedded
+        return 3.6, 1.20
+
+@timed('simulate')
+def simulate_basic(size, mode, iterations, model, rng, sampler=None):
+    """Draw all iterations at once and return the sample arrays for each output
+
+    sampler (see samplers.make_sampler) replaces the pseudo-random draws with
+    4-dimensional unit points mapped onto the same ranges.
+    """
+    # Mode conversion
+    mode_map = {'organic': 1, 'semi-detached': 2, 'embedded': 3}
+    mode_num = mode_map.get(mode.lower(), 3)
+    
+    a, b = get_coefficients(mode)
+    
+    if sampler is not None:
+        u = sampler.draw(iterations)
+        random_size = size * (1 + uniform_range(u[:, 0], -0.2, 0.2))
+        random_a = a * (1 + uniform_range(u[:, 1], -0.15, 0.15))
+        random_reliability = uniform_range(u[:, 2], 0.7, 1.65)
+        random_complexity = uniform_range(u[:, 3], 0.7, 1.65)
+    else:
+        # Size variation (±20%)
+        random_size = size * (1 + rng.uniform(-0.2, 0.2, iterations))
+        
+        # Coefficient variation (±15%)
+        random_a = a * (1 + rng.uniform(-0.15, 0.15, iterations))
+        
+        # Random reliability and complexity factors (0.7 to 1.65)
+        random_reliability = rng.uniform(0.7, 1.65, iterations)
+        random_complexity = rng.uniform(0.7, 1.65, iterations)
+    
+    if model is not None:
+        import numpy as np
+        # Use machine learning model for prediction, one batched call
+        features = np.column_stack((
+            random_size,
+            np.full(iterations, mode_num, dtype=float),
+            random_reliability,
+            random_complexity
+        ))
+        efforts = np.asarray(model.predict(features), dtype=float)
+    else:
+        # Use basic COCOMO formula
+        efforts = random_a * (random_size / 1000) ** b * random_reliability * random_complexity
+    
+    # Calculate schedule
+    schedules = 2.5 * (efforts ** (0.32 + 0.2 * (b - 0.91)))
+    
+    return {
+        'effort': efforts,
+        'schedule': schedules,
+        # Calculate team size
+        'teamSize': efforts / schedules,
+        # Calculate cost (assuming $10k per person-month)
+        'cost': efforts * 10000
+    }
+
+@timed('summarize')
+def summarize_samples(data, percentiles=SUMMARY_PERCENTILES):
+    """Min, max and percentiles of a sample array without a full sort"""
+    import numpy as np
+    n = len(data)
+    # Same index rule as before: the value at int(n * p / 100) of the sorted data
+    indices = [min(int(n * p / 100), n - 1) for p in percentiles]
+    partitioned = np.partition(data, sorted(set([0, n - 1] + indices)))
+    
+    summary = {'min': float(partitioned[0])}
+    for p, index in zip(percentiles, indices):
+        summary[f'p{p}'] = float(partitioned[index])
+    summary['max'] = float(partitioned[n - 1])
+    return summary
+
+def run_monte_carlo(params, model, on_progress=None):
+    """Run the Monte Carlo simulation; a model of None falls back to the COCOMO formulas"""
+    # Parse parameters
+    size = params['size']
+    mode = params.get('mode', 'embedded')
+    iterations = int(params.get('iterations', 1000))
+    seed = params.get('seed')
+    sampler_kind = params.get('sampler', DEFAULT_SAMPLER)
+    
+    # Raw samples / histograms need the whole sample arrays in this process
+    export = samples_options(params)
+    if export is not None and (params.get('streaming') or int(params.get('workers', 1)) > 1):
+        raise ValueError("samplesOut and histogramBins need a non-streaming run with one worker")
+    
+    workers = int(params.get('workers', 1))
+    if formula_only(params):
+        if workers <= 1 and export is None and not params.get('streaming') and sampler_kind == DEFAULT_SAMPLER:
+            # Pure-Python simulation with the COCOMO formula; numpy is never imported
+            return simulate_formula_monte_carlo(size, mode, iterations, OUTPUT_PERCENTILES, seed)
+        # The numpy simulation (and every pool worker) falls back to the formula without a model
+        model = None
+    
+    if workers > 1:
+        # Split the iterations over a process pool, one SeedSequence child per worker
+        from parallel_monte_carlo import run_parallel
+        return run_parallel(
+            size, mode, iterations, OUTPUT_PERCENTILES,
+            model_path=basic_model_path() if model is not None else None,
+            workers=workers,
+            seed=seed,
+            sampler=sampler_kind
+        )
+    
+    import numpy as np
+    
+    # One generator for the whole run so a given seed always gives the same result
+    rng = np.random.default_rng(seed)
+    sampler = make_sampler(sampler_kind, 4, rng)
+    
+    if params.get('streaming'):
+        # Run in batches with running quantiles until p10/p50/p90 are stable
+        return run_streaming(
+            lambda n: simulate_basic(size, mode, n, model, rng, sampler),
+            OUTPUT_PERCENTILES,
+            max_iterations=int(params.get('maxIterations', iterations)),
+            batch_size=int(params.get('batchSize', DEFAULT_BATCH_SIZE)),
+            tolerance=float(params.get('tolerance', DEFAULT_TOLERANCE)),
+            on_progress=on_progress
+        )
+    
+    samples = simulate_basic(size, mode, iterations, model, rng, sampler)
+    
+    result = {
+        'effort': summarize_samples(samples['effort'], EFFORT_PERCENTILES),
+        'schedule': summarize_samples(samples['schedule']),
+        'teamSize': summarize_samples(samples['teamSize']),
+        'cost': summarize_samples(samples['cost'])
+    }
+    
+    if export is not None:
+        with stage('export_samples'):
+            result.update(export_samples(samples, export))
+    
+    return result
+
 def monte_carlo_analysis(params):
     """Perform Monte Carlo analysis for COCOMO II"""
     try:
-        # Parse parameters
-        size = params['size']
-        mode = params.get('mode', 'embedded')
-        iterations = params.get('iterations', 1000)
-        
-        # Path to the model
-        model_path = os.path.join(os.path.dirname(__file__), 'cocomo_basic_model.pkl')
-        
-        # Load the trained model if available, otherwise use basic formulas
-        try:
-            model = load_model(model_path)
-            use_model = True
-        except:
-            use_model = False
-        
-        # Mode conversion
-        mode_map = {'organic': 1, 'semi-detached': 2, 'embedded': 3}
-        mode_num = mode_map.get(mode.lower(), 3)
-        
-        # Initialize arrays for results
-        efforts = []
-        schedules = []
-        costs = []
-        team_sizes = []
-        
-        # COCOMO coefficients based on mode
-        if mode.lower() == 'organic':
-            a, b = 2.4, 1.05
-        elif mode.lower() == 'semi-detached':
-            a, b = 3.0, 1.12
-        else:  # embedded
-            a, b = 3.6, 1.20
-        
-        # Run iterations
-        for _ in range(iterations):
-            # Size variation (±20%)
-            random_size = size * (1 + np.random.uniform(-0.2, 0.2))
-            
-            # Coefficient variation (±15%)
-            random_a = a * (1 + np.random.uniform(-0.15, 0.15))
-            
-            # Random reliability and complexity factors (0.7 to 1.65)
-            random_reliability = np.random.uniform(0.7, 1.65)
-            random_complexity = np.random.uniform(0.7, 1.65)
-            
-            if use_model:
-                # Use machine learning model for prediction
-                features = np.array([[random_size, mode_num, random_reliability, random_complexity]])
-                effort = float(model.predict(features)[0])
-            else:
-                # Use basic COCOMO formula
-                effort = random_a * (random_size / 1000) ** b * random_reliability * random_complexity
+        with request_timings(params, 'monte-carlo', startup=True) as timings:
+            # Load the trained model if available, otherwise use basic formulas
+            model = None
+            if not formula_only(params):
+                try:
+                    with stage('load_model'):
+                        model = load_model(basic_model_path())
+                except:
+                    model = None
             
-            efforts.append(effort)
+            # Progress snapshots go out as JSON lines before the final result
+            on_progress = None
+            if params.get('progress'):
+                on_progress = lambda snapshot: print(json.dumps(snapshot), flush=True)
             
-            # Calculate schedule
-            schedule = 2.5 * (effort ** (0.32 + 0.2 * (b - 0.91)))
-            schedules.append(schedule)
-            
-            # Calculate team size
-            team_size = effort / schedule
-            team_sizes.append(team_size)
-            
-            # Calculate cost (assuming $10k per person-month)
-            cost = effort * 10000
-            costs.append(cost)
-        
-        # Sort results for percentile calculations
-        efforts.sort()
-        schedules.sort()
-        team_sizes.sort()
-        costs.sort()
-        
-        # Calculate percentiles
-        def get_percentile(data, percentile):
-            index = int(len(data) * percentile / 100)
-            return data[index]
+            result = run_monte_carlo(params, model, on_progress)
         
-        result = {
-            'effort': {
-                'min': efforts[0],
-                'p10': get_percentile(efforts, 10),
-                'p25': get_percentile(efforts, 25),
-                'p50': get_percentile(efforts, 50),
-                'p75': get_percentile(efforts, 75),
-                'p90': get_percentile(efforts, 90),
-                'max': efforts[-1]
-            },
-            'schedule': {
-                'min': schedules[0],
-                'p10': get_percentile(schedules, 10),
-                'p50': get_percentile(schedules, 50),
-                'p90': get_percentile(schedules, 90),
-                'max': schedules[-1]
-            },
-            'teamSize': {
-                'min': team_sizes[0],
-                'p10': get_percentile(team_sizes, 10),
-                'p50': get_percentile(team_sizes, 50),
-                'p90': get_percentile(team_sizes, 90),
-                'max': team_sizes[-1]
-            },
-            'cost': {
-                'min': costs[0],
-                'p10': get_percentile(costs, 10),
-                'p50': get_percentile(costs, 50),
-                'p90': get_percentile(costs, 90),
-                'max': costs[-1]
-            }
-        }
+        if timings is not None:
+            result['timings'] = timings.to_dict()
         
-        print(json.dumps(result))
+        # With the samples on stdout the summary goes to stderr
+        summary_stream = sys.stderr if params.get('samplesOut') == '-' else sys.stdout
+        print(json.dumps(result), file=summary_stream)
         return 0
     
     except Exception as e:
@@ -0,0 +1,212 @@
+#!/usr/bin/env python3
+"""Driver configuration search: fewest rating changes that meet a target.
+
+Starting from a project's encoded drivers, a beam search changes one more
+driver per step. Each step expands every kept vector by moving every
+still-unchanged, unlocked driver to every other rating 1..6, and scores
+all candidates with a single model.predict call. Candidates are pruned
+when they are dominated:
+  - the move does not lower the effort/schedule of its parent vector
+    (the parent already does as well with fewer changes)
+  - the same vector was reached through another path
+Of the rest, the beamWidth with the lowest effort/schedule are kept. The
+search stops at the first depth where some candidate meets the target, so
+the solutions found use the fewest changes the beam could find.
+
+Parameters are those of predict_advanced plus:
+    target       {"effort": person-months} or {"schedule": months}
+    maxChanges   deepest search (default 6)
+    beamWidth    vectors kept per step (default 64)
+    locked       driver names that must keep their rating
+    solutions    number of solutions reported (default 5)
+
+Usage: python optimizer.py <json_params>
+"""
+import sys
+import json
+from datetime import datetime
+
+from predict_advanced import load_model, advanced_model_path, prepare_batch, derive_outputs, SCALE_DRIVERS
+from sensitivity import DRIVERS, LEVELS, rating_label
+from instrumentation import stage, request_timings
+from cocomo_formulas import formula_only, AdvancedFormulaModel
+
+DEFAULT_MAX_CHANGES = 6
+DEFAULT_BEAM_WIDTH = 64
+DEFAULT_SOLUTIONS = 5
+
+TARGET_METRICS = ('effort', 'schedule')
+
+def parse_target(target):
+    """(metric, limit) of a target such as {'schedule': 12}"""
+    if not isinstance(target, dict) or len(target) != 1:
+        raise ValueError("target must have exactly one of: effort, schedule")
+    metric, limit = next(iter(target.items()))
+    if metric not in TARGET_METRICS:
+        raise ValueError(f"Unknown target: {metric} (expected one of {', '.join(TARGET_METRICS)})")
+    return metric, float(limit)
+
+def evaluate(features, model, sced, metric):
+    """Effort and schedule of every row, plus the metric being minimized"""
+    import numpy as np
+    effort = np.asarray(model.predict(features), dtype=float) * (1 + sced / 100)
+    scale_factor = features[:, 1:1 + len(SCALE_DRIVERS)].sum(axis=1)
+    outputs = derive_outputs(effort, scale_factor)
+    return outputs['effort'], outputs['schedule'], outputs[metric]
+
+def expand(beam, base, movable):
+    """Every vector one more driver change away from a beam vector
+
+    Returns the candidate matrix, the index of each candidate's parent and
+    the column it changed.
+    """
+    import numpy as np
+    parents, columns, values = [], [], []
+    for parent, row in enumerate(beam):
+        for column in movable:
+            if row[column] != base[column]:
+                continue
+            for level in LEVELS:
+                if level != base[column]:
+                    parents.append(parent)
+                    columns.append(column)
+                    values.append(level)
+
+    parents = np.array(parents, dtype=np.intp)
+    columns = np.array(columns, dtype=np.intp)
+    candidates = beam[parents]
+    candidates[np.arange(len(candidates)), columns] = values
+    return candidates, parents, columns
+
+def describe(row, base, effort, schedule):
+    """The driver changes of one vector and its outputs"""
+    changes = []
+    for column, name, kind in DRIVERS:
+        if row[column] != base[column]:
+            changes.append({
+                'driver': name,
+                'type': kind,
+                'from': float(base[column]),
+                'fromRating': rating_label(kind, base[column]),
+                'to': float(row[column]),
+                'toRating': rating_label(kind, row[column])
+            })
+    return {'changes': changes, 'numChanges': len(changes), 'effort': float(effort), 'schedule': float(schedule)}
+
+def frontier_rows(params):
+    """Most rows one search step can predict"""
+    beam_width = max(1, int(params.get('beamWidth', DEFAULT_BEAM_WIDTH)))
+    return beam_width * len(DRIVERS) * (len(LEVELS) - 1)
+
+def optimize_drivers(params, model):
+    """Beam search for the fewest driver changes that bring effort or schedule under the target"""
+    import numpy as np
+    metric, limit = parse_target(params.get('target'))
+    max_changes = int(params.get('maxChanges', DEFAULT_MAX_CHANGES))
+    beam_width = max(1, int(params.get('beamWidth', DEFAULT_BEAM_WIDTH)))
+    num_solutions = max(1, int(params.get('solutions', DEFAULT_SOLUTIONS)))
+    locked = set(params.get('locked', []))
+    unknown = locked - {name for _, name, _ in DRIVERS}
+    if unknown:
+        raise ValueError(f"Unknown locked drivers: {', '.join(sorted(unknown))}")
+
+    with stage('encode'):
+        base_features, sced = prepare_batch([params])
+        base = base_features[0]
+        movable = [column for column, name, _ in DRIVERS if name not in locked]
+
+    with stage('predict'):
+        base_effort, base_schedule, base_metric = evaluate(base_features, model, sced[0], metric)
+
+    result = {
+        'target': {metric: limit},
+        'baseline': {'effort': float(base_effort[0]), 'schedule': float(base_schedule[0])},
+        'evaluations': 1
+    }
+
+    beam = base_features
+    beam_metric = base_metric
+    best = None
+    solutions = []
+    depth = 0
+    if beam_metric[0] <= limit:
+        solutions = [describe(base, base, base_effort[0], base_schedule[0])]
+
+    while not solutions and depth < max_changes:
+        depth += 1
+        with stage('expand'):
+            candidates, parents, _ = expand(beam, base, movable)
+        if not len(candidates):
+            break
+
+        # The whole frontier in one call
+        with stage('predict'):
+            effort, schedule, value = evaluate(candidates, model, sced[0], metric)
+        result['evaluations'] += len(candidates)
+
+        with stage('prune'):
+            # A move that does not improve on its parent is dominated by the parent
+            keep = value < beam_metric[parents]
+            # The same vector reached through different paths counts once
+            row_type = np.dtype((np.void, candidates.dtype.itemsize * candidates.shape[1]))
+            _, first = np.unique(np.ascontiguousarray(candidates).view(row_type).ravel(), return_index=True)
+            unique = np.zeros(len(candidates), dtype=bool)
+            unique[first] = True
+            keep &= unique
+
+            index = np.flatnonzero(keep)
+            if not len(index):
+                break
+            order = index[np.argsort(value[index], kind='stable')]
+
+            met = order[value[order] <= limit]
+            if len(met):
+                # Fewest changes first, then the smallest total rating shift, then the best value
+                shift = np.abs(candidates[met, 1:] - base[1:]).sum(axis=1)
+                ranked = met[np.lexsort((value[met], shift))][:num_solutions]
+                solutions = [describe(candidates[i], base, effort[i], schedule[i]) for i in ranked]
+                break
+
+            kept = order[:beam_width]
+            beam, beam_metric = candidates[kept], value[kept]
+            best = describe(candidates[kept[0]], base, effort[kept[0]], schedule[kept[0]])
+
+    result['depth'] = depth
+    result['found'] = bool(solutions)
+    result['solutions'] = solutions
+    if not solutions and best is not None:
+        # Closest vector reached, so callers can see how far off the target is
+        result['best'] = best
+
+    result['currentUser'] = 'Huy-VNNIC'
+    result['timestamp'] = datetime.utcnow().strftime('%Y-%m-%d %H:%M:%S')
+    return result
+
+def run_optimizer(params):
+    """Run the driver search and print the result as JSON"""
+    try:
+        with request_timings(params, 'optimize', startup=True) as timings:
+            if formula_only(params):
+                model = AdvancedFormulaModel()
+            else:
+                with stage('load_model'):
+                    model = load_model(advanced_model_path(frontier_rows(params)))
+            result = optimize_drivers(params, model)
+
+        if timings is not None:
+            result['timings'] = timings.to_dict()
+
+        print(json.dumps(result))
+        return 0
+
+    except Exception as e:
+        print(f"Error in driver optimization: {str(e)}", file=sys.stderr)
+        sys.exit(1)
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2:
+        print("Usage: python optimizer.py <json_params>", file=sys.stderr)
+        sys.exit(1)
+
+    params = json.loads(sys.argv[1])
+    sys.exit(run_optimizer(params))
@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+"""Multi-process Monte Carlo for monte_carlo.py.
+
+Iterations are split evenly across a process pool. Every worker gets its own
+random stream from numpy.random.SeedSequence(seed).spawn(workers) and folds
+its samples into QuantileSketches, which the parent merges. Sketch buckets are
+integer counts, so for a given seed and worker count the result is
+bit-for-bit reproducible no matter which process finishes first.
+
+The worker count is capped at os.cpu_count(). One pool of that size is kept
+per process and its processes load the model once in the pool initializer;
+later tasks reuse the cached model. A run with another model path replaces
+the pool. Long-lived callers stop it with shutdown_pools() on exit.
+"""
+import os
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+import model_store
+from quantile_sketch import QuantileSketch, DEFAULT_RELATIVE_ACCURACY
+from samplers import make_sampler, DEFAULT_SAMPLER
+
+# Samples drawn per model.predict call inside a worker
+DEFAULT_BATCH_SIZE = 100000
+
+# The pool and the model path its processes were started with
+_pool = None
+_pool_model_path = None
+_pool_lock = threading.Lock()
+
+def max_workers():
+    """Upper bound on the worker count of a run"""
+    return os.cpu_count() or 1
+
+def _init_worker(model_path):
+    # Load the model once per process; tasks then hit the per-process store cache
+    if model_path is not None:
+        model_store.get_model(model_path)
+
+def _run_task(task):
+    from monte_carlo import simulate_basic
+
+    model = model_store.get_model(task['modelPath']) if task['modelPath'] is not None else None
+    rng = np.random.default_rng(task['seed'])
+    # Each worker runs its own scrambled sequence, an independent replicate
+    sampler = make_sampler(task['sampler'], 4, rng)
+    sketches = {name: QuantileSketch(task['relativeAccuracy']) for name in task['outputs']}
+
+    remaining = task['iterations']
+    while remaining > 0:
+        n = min(task['batchSize'], remaining)
+        samples = simulate_basic(task['size'], task['mode'], n, model, rng, sampler)
+        for name, sketch in sketches.items():
+            sketch.add(samples[name])
+        remaining -= n
+
+    return sketches
+
+def get_pool(model_path):
+    """The process pool for a model, created on first use"""
+    global _pool, _pool_model_path
+    # Socket and HTTP servers run requests on several threads
+    with _pool_lock:
+        if _pool is None or _pool_model_path != model_path:
+            if _pool is not None:
+                _pool.shutdown()
+            _pool = ProcessPoolExecutor(
+                # Processes start on demand, up to one per core
+                max_workers=max_workers(),
+                # Spawned workers do not inherit threads or locks from a long-lived parent
+                mp_context=multiprocessing.get_context('spawn'),
+                initializer=_init_worker,
+                initargs=(model_path,)
+            )
+            _pool_model_path = model_path
+        return _pool
+
+def shutdown_pools():
+    """Stop the pool started by this process"""
+    global _pool, _pool_model_path
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown()
+        _pool = _pool_model_path = None
+
+def run_parallel(size, mode, iterations, percentiles, model_path, workers, seed=None,
+                 batch_size=DEFAULT_BATCH_SIZE, relative_accuracy=DEFAULT_RELATIVE_ACCURACY, sampler=DEFAULT_SAMPLER):
+    """Split a basic Monte Carlo run across worker processes and merge their sketches"""
+    workers = min(max(1, int(workers)), max_workers())
+    seeds = np.random.SeedSequence(seed).spawn(workers)
+
+    # The first iterations % workers workers take one extra iteration
+    share, extra = divmod(iterations, workers)
+    tasks = [{
+        'size': size,
+        'mode': mode,
+        'iterations': share + (1 if i < extra else 0),
+        'seed': seeds[i],
+        'modelPath': model_path,
+        'outputs': list(percentiles),
+        'batchSize': int(batch_size),
+        'relativeAccuracy': relative_accuracy,
+        'sampler': sampler
+    } for i in range(workers)]
+
+    merged = {name: QuantileSketch(relative_accuracy) for name in percentiles}
+    # map() yields in task order, so the merge order never depends on scheduling
+    for sketches in get_pool(model_path).map(_run_task, tasks):
+        for name, sketch in sketches.items():
+            merged[name].merge(sketch)
+
+    result = {name: sketch.summary(percentiles[name]) for name, sketch in merged.items()}
+    result['iterations'] = iterations
+    result['workers'] = workers
+    return result
@@ -0,0 +1,187 @@
+#!/usr/bin/env python3
+"""Portfolio Monte Carlo: the joint distribution of many projects.
+
+Every iteration draws a size shock and driver jitter for each project (the
+same ranges as the advanced risk analysis: size +-15%, drivers +-1 rating)
+and sums the projects. The (iterations x projects) matrix is simulated in
+chunks of at most chunkSize rows, each predicted with one model.predict
+call, and the per-iteration totals feed QuantileSketches, so memory is
+bounded by the chunk size, not by iterations x projects.
+
+Shocks can be correlated between projects through a Gaussian copula: a
+portfolio-wide factor shared by all projects plus an independent part per
+project, mixed so that the latent correlation between two projects is the
+given value. Sizes and each driver have their own factor (a common
+estimating bias, a tooling problem affecting every team, ...).
+
+Parameters:
+    projects      list of predict_advanced parameter sets; optional 'id' and
+                  'start' (month the project starts, default 0)
+    iterations    number of portfolio draws (default 10000)
+    correlation   a number for sizes and drivers, or {"size": r, "drivers": r} (default 0)
+    chunkSize     rows (iterations x projects) per model.predict call
+    costPerPM     cost of one person-month (default 10000)
+    seed          random seed
+
+Peak team size is the largest summed team size of the projects running at
+the same time, with each project running from its start for its schedule.
+
+Usage: python portfolio.py <json_params>     ('-' reads the parameters from stdin)
+"""
+import sys
+import json
+
+from predict_advanced import load_model, advanced_model_path, prepare_batch, SCALE_DRIVERS, DEFAULT_CHUNK_SIZE
+from monte_carlo import EFFORT_PERCENTILES
+from samplers import uniform_range, driver_steps
+from instrumentation import stage, timed, request_timings
+from cocomo_formulas import formula_only, AdvancedFormulaModel
+
+DEFAULT_ITERATIONS = 10000
+DEFAULT_COST_PER_PM = 10000
+
+# Same jitter as predict_advanced.simulate_risk_batch
+SIZE_VARIATION = 0.15
+DRIVER_VARIATION = 1
+
+def parse_correlation(correlation):
+    """(size, drivers) latent correlations from a number or a dict"""
+    if isinstance(correlation, dict):
+        size, drivers = correlation.get('size', 0), correlation.get('drivers', 0)
+    else:
+        size = drivers = correlation or 0
+    size, drivers = float(size), float(drivers)
+    if not (0 <= size <= 1 and 0 <= drivers <= 1):
+        raise ValueError("correlation must be between 0 and 1")
+    return size, drivers
+
+def correlated_uniforms(rng, shape, rho):
+    """Uniform draws of shape (iterations, projects, ...) whose latent normals correlate by rho across projects"""
+    if rho == 0:
+        return rng.random(shape)
+    try:
+        from scipy.special import ndtr
+    except ImportError:
+        raise RuntimeError("Correlated shocks need scipy (pip install scipy)")
+    import numpy as np
+    common = rng.standard_normal((shape[0], 1) + tuple(shape[2:]))
+    own = rng.standard_normal(shape)
+    return ndtr(np.sqrt(rho) * common + np.sqrt(1 - rho) * own)
+
+def peak_team_size(team_size, schedule, starts):
+    """Largest concurrent team size per iteration; team_size and schedule are (iterations x projects)"""
+    import numpy as np
+    if not starts.any():
+        # Everything starts together
+        return team_size.sum(axis=1)
+    # Headcount only rises when a project starts, so the peak is at one of the start times
+    peak = np.zeros(len(team_size))
+    for start in np.unique(starts):
+        active = (starts <= start) & (starts + schedule > start)
+        np.maximum(peak, np.where(active, team_size, 0).sum(axis=1), out=peak)
+    return peak
+
+@timed('simulate_chunk')
+def simulate_chunk(features, sced, starts, model, n, rng, correlation):
+    """Totals of n portfolio iterations"""
+    import numpy as np
+    num_projects, num_features = features.shape
+    num_scale = len(SCALE_DRIVERS)
+    size_rho, driver_rho = correlation
+
+    rows = np.repeat(features[np.newaxis, :, :], n, axis=0)
+    u_size = correlated_uniforms(rng, (n, num_projects), size_rho)
+    rows[:, :, 0] *= 1 + uniform_range(u_size, -SIZE_VARIATION, SIZE_VARIATION)
+    u_drivers = correlated_uniforms(rng, (n, num_projects, num_features - 1), driver_rho)
+    np.clip(rows[:, :, 1:] + driver_steps(u_drivers, DRIVER_VARIATION), 1, 6, out=rows[:, :, 1:])
+
+    with stage('portfolio.predict'):
+        effort = np.asarray(model.predict(rows.reshape(-1, num_features)), dtype=float).reshape(n, num_projects)
+    effort *= 1 + sced / 100
+
+    exponent = 0.91 + 0.01 * rows[:, :, 1:1 + num_scale].sum(axis=2)
+    schedule = 3.67 * (effort ** (0.28 + 0.2 * (exponent - 0.91)))
+    team_size = effort / schedule
+
+    return effort, peak_team_size(team_size, schedule, starts)
+
+def chunk_rows(params):
+    """Rows of the largest predict call of a simulation"""
+    iterations = int(params.get('iterations', DEFAULT_ITERATIONS))
+    rows = iterations * max(1, len(params.get('projects') or []))
+    return min(rows, max(1, int(params.get('chunkSize') or DEFAULT_CHUNK_SIZE)))
+
+def simulate_portfolio(params, model):
+    """Distribution of total effort, cost and peak team size of a list of projects"""
+    import numpy as np
+    from quantile_sketch import QuantileSketch
+
+    projects = params.get('projects') or []
+    if not isinstance(projects, list) or not projects:
+        raise ValueError("projects must be a non-empty list")
+    iterations = int(params.get('iterations', DEFAULT_ITERATIONS))
+    # No draws would leave the means undefined and the sketches empty (min=inf, not valid JSON)
+    if iterations < 1:
+        raise ValueError(f"iterations must be at least 1, got {iterations}")
+    chunk_rows = max(1, int(params.get('chunkSize') or DEFAULT_CHUNK_SIZE))
+    cost_per_pm = float(params.get('costPerPM', DEFAULT_COST_PER_PM))
+    correlation = parse_correlation(params.get('correlation', 0))
+    rng = np.random.default_rng(params.get('seed'))
+
+    with stage('encode'):
+        features, sced = prepare_batch(projects)
+        starts = np.array([float(project.get('start', 0) or 0) for project in projects])
+
+    sketches = {name: QuantileSketch() for name in ('totalEffort', 'totalCost', 'peakTeamSize')}
+    effort_sum = np.zeros(len(projects))
+    # Whole iterations per chunk, so totals never straddle two predict calls
+    per_chunk = max(1, chunk_rows // len(projects))
+
+    done = 0
+    while done < iterations:
+        n = min(per_chunk, iterations - done)
+        effort, peak = simulate_chunk(features, sced, starts, model, n, rng, correlation)
+        total = effort.sum(axis=1)
+        sketches['totalEffort'].add(total)
+        sketches['totalCost'].add(total * cost_per_pm)
+        sketches['peakTeamSize'].add(peak)
+        effort_sum += effort.sum(axis=0)
+        done += n
+
+    result = {name: sketch.summary(EFFORT_PERCENTILES) for name, sketch in sketches.items()}
+    result['projects'] = [{
+        'id': project.get('id', index),
+        'meanEffort': float(effort_sum[index] / iterations)
+    } for index, project in enumerate(projects)]
+    result['iterations'] = iterations
+    result['correlation'] = {'size': correlation[0], 'drivers': correlation[1]}
+    return result
+
+def run_portfolio(params):
+    """Run the portfolio simulation and print the result as JSON"""
+    try:
+        with request_timings(params, 'portfolio', startup=True) as timings:
+            if formula_only(params):
+                model = AdvancedFormulaModel()
+            else:
+                with stage('load_model'):
+                    model = load_model(advanced_model_path(chunk_rows(params)))
+            result = simulate_portfolio(params, model)
+
+        if timings is not None:
+            result['timings'] = timings.to_dict()
+
+        print(json.dumps(result))
+        return 0
+
+    except Exception as e:
+        print(f"Error in portfolio simulation: {str(e)}", file=sys.stderr)
+        sys.exit(1)
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2:
+        print("Usage: python portfolio.py <json_params>", file=sys.stderr)
+        sys.exit(1)
+
+    params = json.load(sys.stdin) if sys.argv[1] == '-' else json.loads(sys.argv[1])
+    sys.exit(run_portfolio(params))
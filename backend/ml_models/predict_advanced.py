@@ -1,198 +1,416 @@
 #!/usr/bin/env python3
 import sys
 import json
-import pickle
-import numpy as np
 import os
+import contextlib
 from datetime import datetime
 
+import model_store
+from monte_carlo import summarize_samples, SUMMARY_PERCENTILES
+from streaming_simulation import run_streaming, DEFAULT_TOLERANCE
+from result_cache import make_key, default_cache
+from instrumentation import stage, timed, request_timings
+from cocomo_formulas import formula_only, AdvancedFormulaModel
+from sample_output import samples_options, export_samples
+from samplers import make_sampler, uniform_range, driver_steps, DEFAULT_SAMPLER
+
+# numpy is imported inside the functions that need it, so a formula-only
+# estimate (see cocomo_formulas) starts without loading it
+
+MODEL_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'cocomo_advanced_model.pkl')
+
 def load_model(model_path):
-    """Load a trained model from a .pkl file"""
+    """Load a trained model from the per-process model store"""
     try:
-        with open(model_path, 'rb') as f:
-            model = pickle.load(f)
-        return model
+        return model_store.get_model(model_path)
     except Exception as e:
         print(f"Error loading model: {str(e)}", file=sys.stderr)
         sys.exit(1)
 
+# Scale drivers in the order expected by the model, with their nominal values used when not provided
+SCALE_DRIVERS = [
+    ('precedentedness', 3.72),
+    ('developmentFlexibility', 3.04),
+    ('architectureResolution', 4.24),
+    ('teamCohesion', 3.29),
+    ('processMaturiy', 4.68)
+]
+
+# Scale driver value mappings (an unknown rating counts as Nominal)
+SCALE_VALUE_MAP = {
+    'Very Low': 6,
+    'Low': 5,
+    'Nominal': 4,
+    'High': 3,
+    'Very High': 2,
+    'Extra High': 1
+}
+SCALE_UNKNOWN_VALUE = 4
+
+# List of all possible cost drivers in order expected by model
+COST_DRIVERS = [
+    'reliability', 'databaseSize', 'complexity', 'reusability', 'documentation',
+    'executionTimeConstraint', 'storageConstraint', 'platformVolatility',
+    'analystCapability', 'programmerCapability', 'applicationExperience',
+    'platformExperience', 'languageExperience', 'toolUse', 
+    'multisiteDevelopment', 'schedule'
+]
+
+# Cost driver value mappings (1=Very Low, 2=Low, 3=Nominal, 4=High, 5=Very High, 6=Extra High)
+COST_VALUE_MAP = {
+    'Very Low': 1,
+    'Low': 2,
+    'Nominal': 3,
+    'High': 4,
+    'Very High': 5,
+    'Extra High': 6
+}
+COST_DEFAULT_VALUE = 3
+
+# Full feature order: [size, scale_drivers..., cost_drivers...]
+FEATURE_NAMES = ['size'] + [name for name, _ in SCALE_DRIVERS] + COST_DRIVERS
+
+# Upper effort bounds (person-months) for each project category
+PROJECT_CATEGORY_BOUNDS = [2, 8, 24, 300]
+PROJECT_CATEGORIES = ['Very Small', 'Small', 'Medium', 'Large', 'Very Large']
+
+# Above this many rows per predict call sklearn's forest beats the flat one
+# (FlatForest switches to its per-tree walk, see forest_engine.ALL_TREES_MAX_ROWS)
+FLAT_FOREST_MAX_ROWS = 256
+
+def advanced_model_path(rows=1):
+    """Model file to serve predict calls of up to `rows` rows
+
+    Shared-memory forest when hosted; the flattened forest arrays when
+    exported and the batches are small; the pickled model otherwise.
+    """
+    # Set by shared_forest.py host for the workers it starts; loading the
+    # pickle as well would undo the memory the shared segment saves
+    shared = os.environ.get('COCOMO_SHARED_FOREST')
+    if shared:
+        return shared
+    from forest_engine import forest_path
+    flat_path = forest_path(MODEL_PATH)
+    meta_path = os.path.join(flat_path, 'meta.json')
+    if not os.path.exists(meta_path):
+        return MODEL_PATH
+    if not os.path.exists(MODEL_PATH):
+        return flat_path
+    # A forest exported before the model was retrained is stale
+    if rows <= FLAT_FOREST_MAX_ROWS and os.stat(meta_path).st_mtime_ns >= os.stat(MODEL_PATH).st_mtime_ns:
+        return flat_path
+    return MODEL_PATH
+
+def request_rows(params):
+    """Largest predict call of an advanced request: the risk simulation chunks, or one row"""
+    if not params.get('riskAnalysis'):
+        return 1
+    iterations = int(params.get('iterations', 1000))
+    return min(iterations, int(params.get('chunkSize') or DEFAULT_CHUNK_SIZE))
+
 def encode_scale_drivers(scale_drivers):
     """Convert scale drivers to numerical values for model input"""
-    # Default values if not provided
-    prec = 3.72  # Nominal
-    flex = 3.04  # Nominal
-    resl = 4.24  # Nominal
-    team = 3.29  # Nominal
-    pmat = 4.68  # Nominal
-    
-    # Value mappings
-    value_map = {
-        'Very Low': 6,
-        'Low': 5,
-        'Nominal': 4,
-        'High': 3,
-        'Very High': 2,
-        'Extra High': 1
-    }
+    values = []
+    for name, nominal in SCALE_DRIVERS:
+        # Update values if provided, default values otherwise
+        if name in scale_drivers:
+            values.append(SCALE_VALUE_MAP.get(scale_drivers[name], SCALE_UNKNOWN_VALUE))
+        else:
+            values.append(nominal)
     
-    # Update values if provided
-    if 'precedentedness' in scale_drivers:
-        prec_key = scale_drivers['precedentedness']
-        prec = value_map.get(prec_key, 4)
+    return values
+
+def encode_cost_drivers(cost_drivers):
+    """Convert cost drivers to numerical values for model input"""
+    driver_values = []
+    
+    # Encode each driver, defaulting to 'Nominal'
+    for driver in COST_DRIVERS:
+        if driver in cost_drivers:
+            driver_value = COST_VALUE_MAP.get(cost_drivers[driver], COST_DEFAULT_VALUE)
+        else:
+            driver_value = COST_DEFAULT_VALUE
+        
+        driver_values.append(driver_value)
+    
+    return driver_values
+
+def _encode_column(labels, value_map, unknown_value, missing_value):
+    """Encode one driver column: map each distinct label once, then gather"""
+    import numpy as np
+    # None marks a driver that was not provided at all
+    present = np.array([label is not None for label in labels], dtype=bool)
+    column = np.full(len(labels), missing_value, dtype=float)
+    if present.any():
+        uniques, inverse = np.unique(
+            np.array([str(label) for label in labels if label is not None]),
+            return_inverse=True
+        )
+        codes = np.array([value_map.get(label, unknown_value) for label in uniques], dtype=float)
+        column[present] = codes[inverse]
+    return column
+
+def encode_scale_drivers_batch(scale_drivers_list):
+    """Vectorized encode_scale_drivers over many projects, returns an (N x 5) array"""
+    import numpy as np
+    columns = [
+        _encode_column([drivers.get(name) for drivers in scale_drivers_list],
+                       SCALE_VALUE_MAP, SCALE_UNKNOWN_VALUE, nominal)
+        for name, nominal in SCALE_DRIVERS
+    ]
+    return np.column_stack(columns)
+
+def encode_cost_drivers_batch(cost_drivers_list):
+    """Vectorized encode_cost_drivers over many projects, returns an (N x 16) array"""
+    import numpy as np
+    columns = [
+        _encode_column([drivers.get(name) for drivers in cost_drivers_list],
+                       COST_VALUE_MAP, COST_DEFAULT_VALUE, COST_DEFAULT_VALUE)
+        for name in COST_DRIVERS
+    ]
+    return np.column_stack(columns)
+
+def size_error(params):
+    """Why a parameter set has no usable size, None when it has one"""
+    field = 'unadjustedFP' if params.get('sizingMethod', 'SLOC') == 'Function Points' else 'size'
+    value = params.get(field)
+    if value is None or value == '':
+        return f"missing {field}"
+    try:
+        value = float(value)
+    except (TypeError, ValueError):
+        return f"{field} must be a number, got {value!r}"
+    # Also rejects NaN
+    if not value > 0:
+        return f"{field} must be positive, got {value}"
+    return None
+
+def prepare_batch(params_list):
+    """Build the (N x 22) feature matrix and per-project adjustments for many parameter sets
+
+    Raises ValueError naming the first project without a usable size.
+    """
+    import numpy as np
+    for index, params in enumerate(params_list):
+        error = size_error(params)
+        if error is not None:
+            raise ValueError(f"Project {index}: {error}")
+    sizes = np.array([float(params.get('size') or 0) for params in params_list])
     
-    if 'developmentFlexibility' in scale_drivers:
-        flex_key = scale_drivers['developmentFlexibility']
-        flex = value_map.get(flex_key, 4)
+    # Adjust size if using Function Points
+    fp_rows = np.array([params.get('sizingMethod', 'SLOC') == 'Function Points' for params in params_list],
+                       dtype=bool)
+    fp_to_sloc = 50
+    unadjusted_fp = np.array([float(params.get('unadjustedFP', 0) or 0) for params in params_list])
+    sizes = np.where(fp_rows, unadjusted_fp * fp_to_sloc, sizes)
     
-    if 'architectureResolution' in scale_drivers:
-        resl_key = scale_drivers['architectureResolution']
-        resl = value_map.get(resl_key, 4)
+    # Apply RCPX adjustment
+    rcpx = np.array([float(params.get('rcpx', 0) or 0) for params in params_list])
+    sizes = sizes * (1 + rcpx / 100)
     
-    if 'teamCohesion' in scale_drivers:
-        team_key = scale_drivers['teamCohesion']
-        team = value_map.get(team_key, 4)
+    sced = np.array([float(params.get('sced', 0) or 0) for params in params_list])
     
-    if 'processMaturiy' in scale_drivers:
-        pmat_key = scale_drivers['processMaturiy']
-        pmat = value_map.get(pmat_key, 4)
+    scale = encode_scale_drivers_batch([params.get('scaleDrivers') or {} for params in params_list])
+    cost = encode_cost_drivers_batch([params.get('costDrivers') or {} for params in params_list])
     
-    return [prec, flex, resl, team, pmat]
+    features = np.column_stack((sizes, scale, cost))
+    return features, sced
 
-def encode_cost_drivers(cost_drivers):
-    """Convert cost drivers to numerical values for model input"""
-    # Default all to 'Nominal' (encoded as 3)
-    default_value = 3
-    driver_values = []
+def derive_outputs(effort, scale_factor):
+    """Vectorized schedule, team size, weeks and category from effort and the scale driver sum"""
+    import numpy as np
+    # Calculate exponent for schedule calculation
+    exponent = 0.91 + 0.01 * scale_factor
+    
+    schedule = 3.67 * (effort ** (0.28 + 0.2 * (exponent - 0.91)))
+    team_size = effort / schedule
+    weeks = schedule * 4.33  # Approximately 4.33 weeks per month
     
-    # List of all possible cost drivers in order expected by model
-    all_drivers = [
-        'reliability', 'databaseSize', 'complexity', 'reusability', 'documentation',
-        'executionTimeConstraint', 'storageConstraint', 'platformVolatility',
-        'analystCapability', 'programmerCapability', 'applicationExperience',
-        'platformExperience', 'languageExperience', 'toolUse', 
-        'multisiteDevelopment', 'schedule'
+    categories = np.array(PROJECT_CATEGORIES)[
+        np.searchsorted(PROJECT_CATEGORY_BOUNDS, effort, side='right')
     ]
     
-    # Value mappings (1=Very Low, 2=Low, 3=Nominal, 4=High, 5=Very High, 6=Extra High)
-    value_map = {
-        'Very Low': 1,
-        'Low': 2,
-        'Nominal': 3,
-        'High': 4,
-        'Very High': 5,
-        'Extra High': 6
+    return {
+        'effort': effort,
+        'schedule': schedule,
+        'teamSize': team_size,
+        'weeks': weeks,
+        'projectCategory': categories
     }
+
+def encode_params(params):
+    """(size, scale driver values, cost driver values) of one parameter set, as fed to the model"""
+    error = size_error(params)
+    if error is not None:
+        raise ValueError(error)
+    size = float(params['size']) if params.get('size') is not None else 0
     
-    # Encode each driver
-    for driver in all_drivers:
-        if driver in cost_drivers:
-            driver_value = value_map.get(cost_drivers[driver], default_value)
-        else:
-            driver_value = default_value
-        
-        driver_values.append(driver_value)
+    # Adjust size if using Function Points
+    if params.get('sizingMethod', 'SLOC') == 'Function Points':
+        # Convert FP to SLOC (this multiplier depends on language)
+        fp_to_sloc = 50
+        size = float(params['unadjustedFP']) * fp_to_sloc
     
-    return driver_values
+    # Apply RCPX adjustment
+    rcpx = float(params.get('rcpx', 0) or 0)
+    if rcpx:
+        size = size * (1 + (rcpx / 100))
+    
+    # Encode scale drivers and cost drivers
+    return size, encode_scale_drivers(params.get('scaleDrivers', {})), encode_cost_drivers(params.get('costDrivers', {}))
+
+def estimate_cache_key(size, encoded_scale_drivers, encoded_cost_drivers, sced, model_version, risk=None):
+    """Result cache key of an advanced estimate; risk lists the simulation settings of a risk analysis"""
+    normalized = {
+        'features': [float(size)] + encoded_scale_drivers + encoded_cost_drivers,
+        'sced': sced,
+        'risk': risk
+    }
+    return make_key('advanced', model_version, normalized)
+
+def estimate_advanced(params, model, cache=None, model_version=None):
+    """Compute an advanced COCOMO II estimate with an already loaded model
+
+    With a cache, results are memoized by the normalized inputs and the model version.
+    Unseeded risk analyses are random and never cached.
+    """
+    # Parse parameters
+    sced = float(params.get('sced', 0) or 0)
+    risk_analysis = params.get('riskAnalysis', False)
+    
+    # Risk simulation settings
+    iterations = int(params.get('iterations', 1000))
+    chunk_size = params.get('chunkSize', DEFAULT_CHUNK_SIZE)
+    n_jobs = params.get('nJobs')
+    seed = params.get('seed')
+    streaming = bool(params.get('streaming', False))
+    tolerance = float(params.get('tolerance', DEFAULT_TOLERANCE))
+    export = samples_options(params) if risk_analysis else None
+    sampler = params.get('sampler', DEFAULT_SAMPLER)
+    
+    with stage('encode'):
+        size, encoded_scale_drivers, encoded_cost_drivers = encode_params(params)
+    
+    key = None
+    # Written sample files are a side effect, so those requests always run
+    if cache is not None and (not risk_analysis or seed is not None) and export is None:
+        with stage('cache'):
+            key = estimate_cache_key(
+                size, encoded_scale_drivers, encoded_cost_drivers, sced, model_version,
+                [iterations, chunk_size, seed, streaming, tolerance, sampler] if risk_analysis else None
+            )
+            cached = cache.get(key)
+        if cached is not None:
+            cached['timestamp'] = datetime.utcnow().strftime('%Y-%m-%d %H:%M:%S')
+            return cached
+    
+    # Create feature array for prediction
+    # Format: [size, scale_drivers..., cost_drivers...]
+    features = [[size] + encoded_scale_drivers + encoded_cost_drivers]
+    
+    # Make prediction using model
+    with stage('predict'):
+        effort = float(model.predict(features)[0])
+    
+    # Apply SCED adjustment if needed
+    if sced:
+        effort = effort * (1 + (sced / 100))
+    
+    # Calculate scale factor (sum of scale drivers)
+    scale_factor = sum(encoded_scale_drivers)
+    
+    # Calculate exponent for schedule calculation
+    exponent = 0.91 + 0.01 * scale_factor
+    
+    # Calculate schedule
+    schedule = 3.67 * (effort ** (0.28 + 0.2 * (exponent - 0.91)))
+    
+    # Calculate team size
+    team_size = effort / schedule
+    
+    # Calculate weeks
+    weeks = schedule * 4.33  # Approximately 4.33 weeks per month
+    
+    # Determine project category
+    if effort < 2:
+        project_category = "Very Small"
+    elif effort < 8:
+        project_category = "Small"
+    elif effort < 24:
+        project_category = "Medium"
+    elif effort < 300:
+        project_category = "Large"
+    else:
+        project_category = "Very Large"
+    
+    # Prepare result
+    result = {
+        'effort': effort,
+        'schedule': schedule,
+        'teamSize': team_size,
+        'weeks': weeks,
+        'projectCategory': project_category,
+        'currentUser': 'Huy-VNNIC',
+        'timestamp': datetime.utcnow().strftime('%Y-%m-%d %H:%M:%S')
+    }
+    
+    # Add Monte Carlo risk analysis if requested
+    if risk_analysis:
+        monte_carlo_results = perform_monte_carlo(
+            size, encoded_scale_drivers, encoded_cost_drivers, model,
+            iterations=iterations, chunk_size=chunk_size, n_jobs=n_jobs, seed=seed,
+            streaming=streaming, tolerance=tolerance, export=export, sampler=sampler
+        )
+        result['riskAnalysis'] = monte_carlo_results
+    
+    if key is not None:
+        with stage('cache'):
+            cache.set(key, result)
+    
+    return result
 
 def predict_advanced(params):
     """Predict effort using advanced COCOMO II model"""
     try:
-        # Parse parameters
-        size = params['size']
-        sizing_method = params.get('sizingMethod', 'SLOC')
-        scale_drivers = params.get('scaleDrivers', {})
-        cost_drivers = params.get('costDrivers', {})
-        unadjusted_fp = params.get('unadjustedFP', 0)
-        sced = params.get('sced', 0)
-        rcpx = params.get('rcpx', 0)
-        risk_analysis = params.get('riskAnalysis', False)
-        
-        # Path to the model
-        model_path = os.path.join(os.path.dirname(__file__), 'cocomo_advanced_model.pkl')
-        
-        # Load the trained model
-        model = load_model(model_path)
-        
-        # Adjust size if using Function Points
-        if sizing_method == 'Function Points':
-            # Convert FP to SLOC (this multiplier depends on language)
-            fp_to_sloc = 50
-            size = unadjusted_fp * fp_to_sloc
-        
-        # Apply RCPX adjustment
-        if rcpx:
-            size = size * (1 + (rcpx / 100))
-        
-        # Encode scale drivers and cost drivers
-        encoded_scale_drivers = encode_scale_drivers(scale_drivers)
-        encoded_cost_drivers = encode_cost_drivers(cost_drivers)
-        
-        # Create feature array for prediction
-        # Format: [size, scale_drivers..., cost_drivers...]
-        features = np.array([[size] + encoded_scale_drivers + encoded_cost_drivers])
-        
-        # Make prediction using model
-        effort = float(model.predict(features)[0])
-        
-        # Apply SCED adjustment if needed
-        if sced:
-            effort = effort * (1 + (sced / 100))
-        
-        # Calculate scale factor (sum of scale drivers)
-        scale_factor = sum(encoded_scale_drivers)
-        
-        # Calculate exponent for schedule calculation
-        exponent = 0.91 + 0.01 * scale_factor
-        
-        # Calculate schedule
-        schedule = 3.67 * (effort ** (0.28 + 0.2 * (exponent - 0.91)))
-        
-        # Calculate team size
-        team_size = effort / schedule
-        
-        # Calculate weeks
-        weeks = schedule * 4.33  # Approximately 4.33 weeks per month
-        
-        # Determine project category
-        if effort < 2:
-            project_category = "Very Small"
-        elif effort < 8:
-            project_category = "Small"
-        elif effort < 24:
-            project_category = "Medium"
-        elif effort < 300:
-            project_category = "Large"
-        else:
-            project_category = "Very Large"
-        
-        # Prepare result
-        result = {
-            'effort': effort,
-            'schedule': schedule,
-            'teamSize': team_size,
-            'weeks': weeks,
-            'projectCategory': project_category,
-            'currentUser': 'Huy-VNNIC',
-            'timestamp': datetime.utcnow().strftime('%Y-%m-%d %H:%M:%S')
-        }
+        with request_timings(params, 'advanced', startup=True) as timings:
+            # Results survive across runs only with an on-disk cache
+            cache = default_cache(persistent_only=True)
+            
+            if formula_only(params):
+                # COCOMO II equation in pure Python: no model file, numpy or sklearn
+                model = AdvancedFormulaModel()
+                model_version = 'formula'
+            else:
+                # Load the trained model
+                model_path = advanced_model_path(request_rows(params))
+                with stage('load_model'):
+                    model = load_model(model_path)
+                model_version = model_store.model_version(model_path) if cache is not None else None
+            
+            result = estimate_advanced(params, model, cache, model_version)
         
-        # Add Monte Carlo risk analysis if requested
-        if risk_analysis:
-            monte_carlo_results = perform_monte_carlo(size, encoded_scale_drivers, encoded_cost_drivers, model)
-            result['riskAnalysis'] = monte_carlo_results
+        if timings is not None:
+            result['timings'] = timings.to_dict()
         
-        print(json.dumps(result))
+        # With the samples on stdout the summary goes to stderr
+        summary_stream = sys.stderr if params.get('samplesOut') == '-' else sys.stdout
+        print(json.dumps(result), file=summary_stream)
         return 0
     
     except Exception as e:
         print(f"Error in advanced prediction: {str(e)}", file=sys.stderr)
         sys.exit(1)
 
-def perform_monte_carlo(size, scale_drivers, cost_drivers, model, iterations=1000):
-    """Perform Monte Carlo simulation for risk analysis"""
-    efforts = []
-    schedules = []
-    team_sizes = []
+# Rows per model.predict call in the risk simulation; bounds the size of the feature matrix
+DEFAULT_CHUNK_SIZE = 100000
+
+def simulate_risk_batch(size, scale_drivers, cost_drivers, model, n, rng, sampler=None):
+    """Jitter size and drivers for n iterations and return effort, schedule and team size samples
+
+    sampler (see samplers.make_sampler) replaces the pseudo-random draws with
+    unit points: one column for size, one per driver.
+    """
+    import numpy as np
     
     # Size variation (±15%)
     size_variation = 0.15
@@ -200,76 +418,111 @@ def perform_monte_carlo(size, scale_drivers, cost_drivers, model, iterations=100
     # Driver variation (±1 category)
     driver_variation = 1
     
-    for _ in range(iterations):
+    base_drivers = np.array(list(scale_drivers) + list(cost_drivers), dtype=float)
+    num_scale_drivers = len(scale_drivers)
+    
+    features = np.empty((n, 1 + len(base_drivers)))
+    
+    if sampler is not None:
+        u = sampler.draw(n)
+        features[:, 0] = size * (1 + uniform_range(u[:, 0], -size_variation, size_variation))
+        jitter = driver_steps(u[:, 1:], driver_variation)
+    else:
         # Randomize size
-        random_size = size * (1 + np.random.uniform(-size_variation, size_variation))
-        
-        # Randomize scale drivers (with constraints)
-        random_scale_drivers = []
-        for val in scale_drivers:
-            # Add random variation but keep within bounds (1-6)
-            new_val = val + np.random.randint(-driver_variation, driver_variation + 1)
-            random_scale_drivers.append(max(1, min(6, new_val)))
-        
-        # Randomize cost drivers (with constraints)
-        random_cost_drivers = []
-        for val in cost_drivers:
-            # Add random variation but keep within bounds (1-6)
-            new_val = val + np.random.randint(-driver_variation, driver_variation + 1)
-            random_cost_drivers.append(max(1, min(6, new_val)))
-        
-        # Create features for this iteration
-        features = np.array([[random_size] + random_scale_drivers + random_cost_drivers])
+        features[:, 0] = size * (1 + rng.uniform(-size_variation, size_variation, n))
         
-        # Predict effort
-        effort = float(model.predict(features)[0])
-        efforts.append(effort)
-        
-        # Calculate scale factor for schedule calculation
-        scale_factor = sum(random_scale_drivers)
-        exponent = 0.91 + 0.01 * scale_factor
-        
-        # Calculate schedule
-        schedule = 3.67 * (effort ** (0.28 + 0.2 * (exponent - 0.91)))
-        schedules.append(schedule)
-        
-        # Calculate team size
-        team_size = effort / schedule
-        team_sizes.append(team_size)
+        # Randomize drivers
+        jitter = rng.integers(-driver_variation, driver_variation + 1, (n, len(base_drivers)))
+    
+    # Keep drivers within bounds (1-6)
+    np.clip(base_drivers + jitter, 1, 6, out=features[:, 1:])
+    
+    # Predict effort for the whole batch
+    with stage('monte_carlo.predict'):
+        effort = np.asarray(model.predict(features), dtype=float)
     
-    # Sort results for percentile calculations
-    efforts.sort()
-    schedules.sort()
-    team_sizes.sort()
+    # Calculate scale factor for schedule calculation
+    scale_factor = features[:, 1:1 + num_scale_drivers].sum(axis=1)
+    exponent = 0.91 + 0.01 * scale_factor
     
-    # Calculate percentiles
-    def get_percentile(data, percentile):
-        index = int(len(data) * percentile / 100)
-        return data[index]
+    # Calculate schedule
+    schedule = 3.67 * (effort ** (0.28 + 0.2 * (exponent - 0.91)))
     
     return {
-        'effort': {
-            'min': efforts[0],
-            'p10': get_percentile(efforts, 10),
-            'p50': get_percentile(efforts, 50),
-            'p90': get_percentile(efforts, 90),
-            'max': efforts[-1]
-        },
-        'schedule': {
-            'min': schedules[0],
-            'p10': get_percentile(schedules, 10),
-            'p50': get_percentile(schedules, 50),
-            'p90': get_percentile(schedules, 90),
-            'max': schedules[-1]
-        },
-        'teamSize': {
-            'min': team_sizes[0],
-            'p10': get_percentile(team_sizes, 10),
-            'p50': get_percentile(team_sizes, 50),
-            'p90': get_percentile(team_sizes, 90),
-            'max': team_sizes[-1]
-        }
+        'effort': effort,
+        'schedule': schedule,
+        # Calculate team size
+        'teamSize': effort / schedule
+    }
+
+@timed('monte_carlo')
+def perform_monte_carlo(size, scale_drivers, cost_drivers, model, iterations=1000,
+                        chunk_size=DEFAULT_CHUNK_SIZE, n_jobs=None, seed=None,
+                        streaming=False, tolerance=DEFAULT_TOLERANCE, on_progress=None, export=None,
+                        sampler=DEFAULT_SAMPLER):
+    """Perform Monte Carlo simulation for risk analysis
+
+    In streaming mode the chunks feed running quantile sketches instead of
+    sample arrays, and the run stops early once p10/p50/p90 are stable.
+    export (see sample_output.samples_options) writes the raw samples and
+    adds histograms; it needs the full arrays, so not in streaming mode.
+    sampler is 'random', 'lhs' or 'sobol' (see samplers).
+    """
+    import numpy as np
+    
+    if export is not None and streaming:
+        raise ValueError("samplesOut and histogramBins need a non-streaming risk analysis")
+    
+    rng = np.random.default_rng(seed)
+    unit_sampler = make_sampler(sampler, 1 + len(scale_drivers) + len(cost_drivers), rng)
+    chunk_size = max(1, int(chunk_size or iterations))
+    
+    # Let the forest spread its trees over n_jobs threads when requested
+    if n_jobs is not None:
+        from joblib import parallel_backend
+        backend = parallel_backend('threading', n_jobs=n_jobs)
+    else:
+        backend = contextlib.nullcontext()
+    
+    def draw_batch(n):
+        return simulate_risk_batch(size, scale_drivers, cost_drivers, model, n, rng, unit_sampler)
+    
+    with backend:
+        if streaming:
+            return run_streaming(
+                draw_batch,
+                {name: SUMMARY_PERCENTILES for name in ('effort', 'schedule', 'teamSize')},
+                max_iterations=iterations,
+                batch_size=chunk_size,
+                tolerance=tolerance,
+                on_progress=on_progress
+            )
+        
+        efforts = np.empty(iterations)
+        schedules = np.empty(iterations)
+        team_sizes = np.empty(iterations)
+        
+        # Only one chunk of the (N x 22) feature matrix exists at a time
+        for start in range(0, iterations, chunk_size):
+            n = min(chunk_size, iterations - start)
+            samples = draw_batch(n)
+            efforts[start:start + n] = samples['effort']
+            schedules[start:start + n] = samples['schedule']
+            team_sizes[start:start + n] = samples['teamSize']
+    
+    result = {
+        'effort': summarize_samples(efforts),
+        'schedule': summarize_samples(schedules),
+        'teamSize': summarize_samples(team_sizes)
     }
+    
+    if export is not None:
+        with stage('export_samples'):
+            result.update(export_samples(
+                {'effort': efforts, 'schedule': schedules, 'teamSize': team_sizes}, export
+            ))
+    
+    return result
 
 if __name__ == "__main__":
     if len(sys.argv) < 2:
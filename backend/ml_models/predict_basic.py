@@ -1,56 +1,118 @@
 #!/usr/bin/env python3
 import sys
 import json
-import pickle
-import numpy as np
 import os
 
+import model_store
+from linear_predictor import coefficients_path
+from result_cache import make_key, default_cache
+from instrumentation import stage, request_timings
+from cocomo_formulas import formula_only, BasicFormulaModel
+
+MODEL_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'cocomo_basic_model.pkl')
+
 def load_model(model_path):
-    """Load a trained model from a .pkl file"""
+    """Load a trained model from the per-process model store"""
     try:
-        with open(model_path, 'rb') as f:
-            model = pickle.load(f)
-        return model
+        return model_store.get_model(model_path)
     except Exception as e:
         print(f"Error loading model: {str(e)}", file=sys.stderr)
         sys.exit(1)
 
-def predict_effort(size, mode, reliability, complexity):
-    """Predict effort using trained model"""
+def basic_model_path():
+    """Closed-form coefficient file when exported, the pickled model otherwise"""
+    coef_path = coefficients_path(MODEL_PATH)
+    return coef_path if os.path.exists(coef_path) else MODEL_PATH
+
+def feature_row(size, mode, reliability, complexity):
+    """Model input row [size, mode number, reliability, complexity]"""
+    # Convert mode to numerical value
+    mode_map = {'organic': 1, 'semi-detached': 2, 'embedded': 3}
+    mode_num = mode_map.get(mode.lower(), 3)  # Default to embedded
+    
+    return [float(size), mode_num, float(reliability), float(complexity)]
+
+def basic_outputs(effort, mode):
+    """Schedule and team size for a predicted effort"""
+    # Calculate schedule using standard formula (could also be predicted by a model)
+    if mode.lower() == 'organic':
+        schedule = 2.5 * (effort ** 0.38)
+    elif mode.lower() == 'semi-detached':
+        schedule = 2.5 * (effort ** 0.35)
+    else:  # embedded
+        schedule = 2.5 * (effort ** 0.32)
+    
+    # Calculate team size
+    team_size = effort / schedule
+    
+    return {
+        'effort': effort,
+        'schedule': schedule,
+        'teamSize': team_size
+    }
+
+def estimate_basic(size, mode, reliability, complexity, model, cache=None, model_version=None):
+    """Compute a basic COCOMO estimate with an already loaded model
+
+    With a cache, results are memoized by the normalized feature row and the model version.
+    """
+    # Create feature row for prediction
+    row = feature_row(size, mode, reliability, complexity)
+    
+    key = None
+    if cache is not None:
+        key = make_key('basic', model_version, row)
+        cached = cache.get(key)
+        if cached is not None:
+            return cached
+    
+    # Make prediction (a closed-form linear model needs neither numpy nor sklearn)
+    with stage('predict'):
+        if hasattr(model, 'predict_one'):
+            effort = model.predict_one(row)
+        else:
+            import numpy as np
+            effort = float(model.predict(np.array([row]))[0])
+    
+    result = basic_outputs(effort, mode)
+    
+    if key is not None:
+        cache.set(key, result)
+    
+    return result
+
+def estimate_basic_batch(params_list, model):
+    """Basic estimates for many parameter sets with a single model.predict call"""
+    modes = [params.get('mode', 'embedded') for params in params_list]
+    rows = [
+        feature_row(params['size'], mode, params.get('reliability', 1.15), params.get('complexity', 1.30))
+        for params, mode in zip(params_list, modes)
+    ]
+    efforts = model.predict(rows)
+    return [basic_outputs(float(effort), mode) for effort, mode in zip(efforts, modes)]
+
+def predict_effort(size, mode, reliability, complexity, timings=False, profile=False, formula=False):
+    """Predict effort using trained model (or the COCOMO formula in formula-only mode)"""
     try:
-        # Path to the model
-        model_path = os.path.join(os.path.dirname(__file__), 'cocomo_basic_model.pkl')
-        
-        # Load the trained model
-        model = load_model(model_path)
-        
-        # Convert mode to numerical value
-        mode_map = {'organic': 1, 'semi-detached': 2, 'embedded': 3}
-        mode_num = mode_map.get(mode.lower(), 3)  # Default to embedded
-        
-        # Create feature array for prediction
-        features = np.array([[size, mode_num, float(reliability), float(complexity)]])
-        
-        # Make prediction
-        effort = float(model.predict(features)[0])
-        
-        # Calculate schedule using standard formula (could also be predicted by a model)
-        if mode.lower() == 'organic':
-            schedule = 2.5 * (effort ** 0.38)
-        elif mode.lower() == 'semi-detached':
-            schedule = 2.5 * (effort ** 0.35)
-        else:  # embedded
-            schedule = 2.5 * (effort ** 0.32)
-        
-        # Calculate team size
-        team_size = effort / schedule
+        with request_timings({'timings': timings, 'profile': profile}, 'basic', startup=True) as stages:
+            # Results survive across runs only with an on-disk cache
+            cache = default_cache(persistent_only=True)
+            
+            if formula or formula_only():
+                model = BasicFormulaModel()
+                model_version = 'formula'
+            else:
+                # Load the trained model
+                model_path = basic_model_path()
+                with stage('load_model'):
+                    model = load_model(model_path)
+                model_version = model_store.model_version(model_path) if cache is not None else None
+            
+            # Return results as JSON
+            result = estimate_basic(size, mode, reliability, complexity, model, cache, model_version)
         
-        # Return results as JSON
-        result = {
-            'effort': effort,
-            'schedule': schedule,
-            'teamSize': team_size
-        }
+        if stages is not None:
+            result['timings'] = stages.to_dict()
         
         print(json.dumps(result))
         return 0
@@ -60,7 +122,8 @@ def predict_effort(size, mode, reliability, complexity):
 
 if __name__ == "__main__":
     if len(sys.argv) < 5:
-        print("Usage: python predict_basic.py <size> <mode> <reliability> <complexity>", file=sys.stderr)
+        print("Usage: python predict_basic.py <size> <mode> <reliability> <complexity> "
+              "[--timings] [--profile] [--formula-only]", file=sys.stderr)
         sys.exit(1)
     
     size = float(sys.argv[1])
@@ -68,4 +131,6 @@ if __name__ == "__main__":
     reliability = float(sys.argv[3])
     complexity = float(sys.argv[4])
     
-    sys.exit(predict_effort(size, mode, reliability, complexity))
\ No newline at end of file
+    flags = sys.argv[5:]
+    sys.exit(predict_effort(size, mode, reliability, complexity,
+                            '--timings' in flags, '--profile' in flags, '--formula-only' in flags))
\ No newline at end of file
@@ -0,0 +1,151 @@
+#!/usr/bin/env python3
+"""Batch advanced COCOMO II estimation.
+
+Reads many parameter sets (a JSON array, JSONL or CSV) and writes one JSON
+line per project, or an "error" line for a project without a usable size.
+Each chunk of projects is encoded with the vectorized encoders and
+predicted with a single model.predict call, so memory stays flat however
+many rows are streamed through.
+
+Usage: python predict_batch.py [--input FILE] [--format json|jsonl|csv] [--chunk-size N]
+"""
+import sys
+import json
+import csv
+import os
+import argparse
+import itertools
+
+from predict_advanced import (
+    load_model, advanced_model_path, prepare_batch, size_error, derive_outputs, SCALE_DRIVERS, COST_DRIVERS
+)
+
+DEFAULT_CHUNK_SIZE = 50000
+
+# CSV columns copied as numbers into the parameter set
+NUMERIC_COLUMNS = ['size', 'unadjustedFP', 'sced', 'rcpx']
+
+def read_json(stream):
+    """Projects from a JSON array or an object with a 'projects' array"""
+    data = json.load(stream)
+    if isinstance(data, dict):
+        data = data.get('projects', [])
+    return iter(data)
+
+def read_jsonl(stream):
+    """Projects from a stream with one JSON object per line"""
+    for line in stream:
+        if line.strip():
+            yield json.loads(line)
+
+def csv_row_to_params(row):
+    """Map a flat CSV row (one column per driver) to a parameter set"""
+    params = {}
+    for column in NUMERIC_COLUMNS:
+        if row.get(column):
+            params[column] = float(row[column])
+    if row.get('id'):
+        params['id'] = row['id']
+    if row.get('sizingMethod'):
+        params['sizingMethod'] = row['sizingMethod']
+    params['scaleDrivers'] = {name: row[name] for name, _ in SCALE_DRIVERS if row.get(name)}
+    params['costDrivers'] = {name: row[name] for name in COST_DRIVERS if row.get(name)}
+    return params
+
+def read_csv(stream):
+    """Projects from a CSV file with a header row"""
+    for row in csv.DictReader(stream):
+        yield csv_row_to_params(row)
+
+READERS = {
+    'json': read_json,
+    'jsonl': read_jsonl,
+    'csv': read_csv
+}
+
+def estimate_batch(params_list, model):
+    """Estimate many projects with one model.predict call, returns one result dict per project
+
+    A project without a usable size gets an {'error': ...} result instead of
+    failing the whole batch.
+    """
+    errors = [size_error(params) for params in params_list]
+    valid = [params for params, error in zip(params_list, errors) if error is None]
+    if not valid:
+        return [_error_result(params, error) for params, error in zip(params_list, errors)]
+
+    features, sced = prepare_batch(valid)
+
+    # Make prediction using model, then apply SCED adjustment
+    effort = model.predict(features) * (1 + sced / 100)
+
+    # Scale factor is the sum of the scale driver columns
+    scale_factor = features[:, 1:1 + len(SCALE_DRIVERS)].sum(axis=1)
+    outputs = derive_outputs(effort, scale_factor)
+
+    results = []
+    i = 0
+    for params, error in zip(params_list, errors):
+        if error is not None:
+            results.append(_error_result(params, error))
+            continue
+        result = {}
+        if 'id' in params:
+            result['id'] = params['id']
+        result['effort'] = float(outputs['effort'][i])
+        result['schedule'] = float(outputs['schedule'][i])
+        result['teamSize'] = float(outputs['teamSize'][i])
+        result['weeks'] = float(outputs['weeks'][i])
+        result['projectCategory'] = str(outputs['projectCategory'][i])
+        results.append(result)
+        i += 1
+
+    return results
+
+def _error_result(params, error):
+    result = {'id': params['id']} if 'id' in params else {}
+    result['error'] = error
+    return result
+
+def stream_estimates(records, model, out, chunk_size=DEFAULT_CHUNK_SIZE):
+    """Estimate an iterable of parameter sets chunk by chunk, writing JSONL to out"""
+    index = 0
+    records = iter(records)
+    while True:
+        chunk = list(itertools.islice(records, chunk_size))
+        if not chunk:
+            break
+
+        for result in estimate_batch(chunk, model):
+            result['index'] = index
+            out.write(json.dumps(result) + '\n')
+            index += 1
+        out.flush()
+
+    return index
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Batch advanced COCOMO II estimation (JSONL output)")
+    parser.add_argument('--input', default='-', help="Input file, '-' for stdin (default)")
+    parser.add_argument('--format', choices=sorted(READERS), help="Input format (default: from file extension, else json)")
+    parser.add_argument('--chunk-size', type=int, default=DEFAULT_CHUNK_SIZE, help="Projects per model.predict call")
+    args = parser.parse_args()
+
+    input_format = args.format
+    if input_format is None:
+        extension = os.path.splitext(args.input)[1].lstrip('.').lower()
+        input_format = extension if extension in READERS else 'json'
+
+    try:
+        model = load_model(advanced_model_path(args.chunk_size))
+
+        if args.input == '-':
+            stream = sys.stdin
+        else:
+            stream = open(args.input, newline='')
+
+        with stream:
+            stream_estimates(READERS[input_format](stream), model, sys.stdout, args.chunk_size)
+    except Exception as e:
+        print(f"Error in batch prediction: {str(e)}", file=sys.stderr)
+        sys.exit(1)
@@ -0,0 +1,137 @@
+#!/usr/bin/env python3
+"""Mergeable quantile sketches for simulations that do not keep their samples.
+
+QuantileSketch is a log-bucketed histogram (the DDSketch scheme): a value v
+lands in bucket ceil(log_gamma(|v|)), so every quantile it returns is within
+`relative_accuracy` of a value from the stream. Memory depends only on the
+dynamic range of the values, not on how many were added. Buckets are
+integer counts, so merging sketches in any order gives identical results.
+"""
+import math
+import numpy as np
+
+DEFAULT_RELATIVE_ACCURACY = 0.001
+
+class _Buckets:
+    """Dense integer counts over a growing range of bucket indices"""
+
+    def __init__(self):
+        self.offset = 0
+        self.counts = np.zeros(0, dtype=np.int64)
+
+    def add_indices(self, indices):
+        if len(indices) == 0:
+            return
+        low, high = int(indices.min()), int(indices.max())
+        self._extend(low, high)
+        self.counts += np.bincount(indices - self.offset, minlength=len(self.counts))
+
+    def _extend(self, low, high):
+        if len(self.counts) == 0:
+            self.offset = low
+            self.counts = np.zeros(high - low + 1, dtype=np.int64)
+            return
+        new_low = min(low, self.offset)
+        new_high = max(high, self.offset + len(self.counts) - 1)
+        if new_low == self.offset and new_high == self.offset + len(self.counts) - 1:
+            return
+        counts = np.zeros(new_high - new_low + 1, dtype=np.int64)
+        start = self.offset - new_low
+        counts[start:start + len(self.counts)] = self.counts
+        self.offset, self.counts = new_low, counts
+
+    def merge(self, other):
+        if len(other.counts) == 0:
+            return
+        self._extend(other.offset, other.offset + len(other.counts) - 1)
+        start = other.offset - self.offset
+        self.counts[start:start + len(other.counts)] += other.counts
+
+    @property
+    def total(self):
+        return int(self.counts.sum())
+
+class QuantileSketch:
+    """Relative-accuracy quantile sketch with exact count, min and max"""
+
+    def __init__(self, relative_accuracy=DEFAULT_RELATIVE_ACCURACY):
+        self.relative_accuracy = relative_accuracy
+        self.gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self._log_gamma = math.log(self.gamma)
+        self.positive = _Buckets()
+        self.negative = _Buckets()
+        self.zero_count = 0
+        self.count = 0
+        self.min = math.inf
+        self.max = -math.inf
+
+    def add(self, values):
+        """Add an array of samples (NaN and infinite values are ignored)"""
+        values = np.asarray(values, dtype=float).ravel()
+        values = values[np.isfinite(values)]
+        if len(values) == 0:
+            return
+
+        self.count += len(values)
+        self.min = min(self.min, float(values.min()))
+        self.max = max(self.max, float(values.max()))
+
+        positive = values[values > 0]
+        negative = -values[values < 0]
+        self.zero_count += int(len(values) - len(positive) - len(negative))
+        self.positive.add_indices(self._indices(positive))
+        self.negative.add_indices(self._indices(negative))
+
+    def _indices(self, magnitudes):
+        return np.ceil(np.log(magnitudes) / self._log_gamma).astype(np.int64)
+
+    def _bucket_value(self, index):
+        # Midpoint of bucket (gamma^(i-1), gamma^i] in the relative sense
+        return 2 * self.gamma ** index / (self.gamma + 1)
+
+    def merge(self, other):
+        """Add every sample of another sketch with the same accuracy"""
+        if other.relative_accuracy != self.relative_accuracy:
+            raise ValueError("Cannot merge sketches with different accuracy")
+        self.positive.merge(other.positive)
+        self.negative.merge(other.negative)
+        self.zero_count += other.zero_count
+        self.count += other.count
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+        return self
+
+    def quantile(self, q):
+        """Approximate value at quantile q (0..1), same rank rule as summarize_samples"""
+        if self.count == 0:
+            return math.nan
+        rank = min(int(self.count * q), self.count - 1)
+        if rank == 0:
+            return self.min
+        if rank == self.count - 1:
+            return self.max
+
+        # Negative values come first, largest magnitude first
+        negative_total = self.negative.total
+        if rank < negative_total:
+            cumulative = np.cumsum(self.negative.counts[::-1])
+            position = int(np.searchsorted(cumulative, rank, side='right'))
+            index = self.negative.offset + len(self.negative.counts) - 1 - position
+            value = -self._bucket_value(index)
+        elif rank < negative_total + self.zero_count:
+            value = 0.0
+        else:
+            cumulative = np.cumsum(self.positive.counts)
+            position = int(np.searchsorted(cumulative, rank - negative_total - self.zero_count, side='right'))
+            value = self._bucket_value(self.positive.offset + position)
+
+        # Never report a value outside the observed range
+        return min(max(value, self.min), self.max)
+
+    def summary(self, percentiles):
+        """Min, max and percentiles in the same shape as monte_carlo.summarize_samples"""
+        summary = {'min': float(self.min)}
+        for p in percentiles:
+            summary[f'p{p}'] = float(self.quantile(p / 100))
+        summary['max'] = float(self.max)
+        return summary
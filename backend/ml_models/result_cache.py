@@ -0,0 +1,159 @@
+#!/usr/bin/env python3
+"""Memoizing cache for estimation results.
+
+Results are keyed by a SHA-256 of the canonical JSON of the normalized
+inputs (after driver encoding and size adjustments) together with the
+model file's content hash, so retraining a model invalidates its entries.
+
+The in-memory tier is an LRU with an optional TTL. An optional SQLite tier
+keeps results across restarts. The default cache is configured through
+environment variables:
+
+    COCOMO_CACHE_SIZE   max in-memory entries (default 1024, 0 disables the cache)
+    COCOMO_CACHE_TTL    entry lifetime in seconds (default: no expiry)
+    COCOMO_CACHE_DB     path of the SQLite file for the on-disk tier (default: none)
+    COCOMO_CACHE_DB_SIZE  max on-disk entries (default 100000)
+"""
+import os
+import json
+import time
+import threading
+from collections import OrderedDict
+
+def make_key(kind, model_version, inputs):
+    """Canonical hash of an operation, a model version and its normalized inputs"""
+    import hashlib
+    canonical = json.dumps([kind, model_version, inputs], sort_keys=True, separators=(',', ':'))
+    return hashlib.sha256(canonical.encode('utf-8')).hexdigest()
+
+class ResultCache:
+    """LRU/TTL cache of JSON-serializable results with an optional SQLite tier"""
+
+    def __init__(self, max_entries=1024, ttl=None, db_path=None, max_disk_entries=100000):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.db_path = db_path
+        self.max_disk_entries = max_disk_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+        self._db = None
+        if db_path:
+            import sqlite3
+            self._db = sqlite3.connect(db_path, check_same_thread=False)
+            self._db.execute(
+                'CREATE TABLE IF NOT EXISTS results (key TEXT PRIMARY KEY, value TEXT, created REAL)'
+            )
+            self._db.commit()
+
+    def _expired(self, created, now):
+        return self.ttl is not None and now - created > self.ttl
+
+    def get(self, key):
+        """Cached result for a key, or None"""
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                value, created = entry
+                if not self._expired(created, now):
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return json.loads(value)
+                del self._entries[key]
+
+            if self._db is not None:
+                row = self._db.execute(
+                    'SELECT value, created FROM results WHERE key = ?', (key,)
+                ).fetchone()
+                if row is not None and not self._expired(row[1], now):
+                    self._remember(key, row[0], row[1])
+                    self.hits += 1
+                    self.disk_hits += 1
+                    return json.loads(row[0])
+
+            self.misses += 1
+            return None
+
+    def set(self, key, result):
+        """Store a result under a key"""
+        value = json.dumps(result)
+        now = time.time()
+        with self._lock:
+            self._remember(key, value, now)
+            if self._db is not None:
+                self._db.execute(
+                    'INSERT OR REPLACE INTO results (key, value, created) VALUES (?, ?, ?)',
+                    (key, value, now)
+                )
+                self._trim_disk(now)
+                self._db.commit()
+
+    def _remember(self, key, value, created):
+        self._entries[key] = (value, created)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def _trim_disk(self, now):
+        if self.ttl is not None:
+            self._db.execute('DELETE FROM results WHERE created < ?', (now - self.ttl,))
+        # Drop the oldest rows beyond the size limit
+        self._db.execute(
+            'DELETE FROM results WHERE key IN ('
+            'SELECT key FROM results ORDER BY created DESC LIMIT -1 OFFSET ?)',
+            (self.max_disk_entries,)
+        )
+
+    def clear(self):
+        """Drop every entry from both tiers"""
+        with self._lock:
+            self._entries.clear()
+            if self._db is not None:
+                self._db.execute('DELETE FROM results')
+                self._db.commit()
+
+    def stats(self):
+        """Hit/miss counters and sizes"""
+        with self._lock:
+            stats = {
+                'hits': self.hits,
+                'diskHits': self.disk_hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'entries': len(self._entries),
+                'maxEntries': self.max_entries,
+                'ttl': self.ttl
+            }
+            if self._db is not None:
+                stats['diskEntries'] = self._db.execute('SELECT COUNT(*) FROM results').fetchone()[0]
+            return stats
+
+_default_cache = None
+
+def default_cache(persistent_only=False):
+    """Process-wide cache configured from the environment, or None when disabled
+
+    One-shot CLI runs pass persistent_only=True: an in-memory tier alone
+    would never see a second request, so they only cache with a SQLite file.
+    """
+    global _default_cache
+    max_entries = int(os.environ.get('COCOMO_CACHE_SIZE', 1024))
+    if max_entries <= 0:
+        return None
+    if persistent_only and not os.environ.get('COCOMO_CACHE_DB'):
+        return None
+    if _default_cache is None:
+        ttl = os.environ.get('COCOMO_CACHE_TTL')
+        _default_cache = ResultCache(
+            max_entries=max_entries,
+            ttl=float(ttl) if ttl else None,
+            db_path=os.environ.get('COCOMO_CACHE_DB') or None,
+            max_disk_entries=int(os.environ.get('COCOMO_CACHE_DB_SIZE', 100000))
+        )
+    return _default_cache
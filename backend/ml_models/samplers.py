@@ -0,0 +1,170 @@
+#!/usr/bin/env python3
+"""Pseudo-random and low-discrepancy samplers for the Monte Carlo simulations.
+
+A sampler draws points in the unit hypercube, one dimension per simulated
+input. The simulations map each column onto their input ranges: the
+continuous +-20% / +-15% / 0.7-1.65 ranges, or the discrete -1/0/+1 driver
+steps (see uniform_range and driver_steps).
+
+    random  the simulations keep their original numpy draws, so seeded
+            results are unchanged
+    lhs     Latin hypercube: every input is stratified into n equal bins
+    sobol   scrambled Sobol sequence (balanced when n is a power of two)
+
+lhs and sobol need scipy (scipy.stats.qmc). Chunked and streaming runs
+draw each chunk from the same engine: Sobol continues its sequence, and
+LHS stratifies each chunk on its own.
+
+    python samplers.py report [--basic | --advanced]
+        percentile error of each sampler against a large reference run,
+        and the iterations each sampler needs to match the random sampler
+"""
+import sys
+import json
+import warnings
+import argparse
+
+SAMPLERS = ('random', 'lhs', 'sobol')
+DEFAULT_SAMPLER = 'random'
+
+class UnitSampler:
+    """Points in [0, 1)^d from a scipy.stats.qmc engine"""
+
+    def __init__(self, kind, dimensions, rng):
+        try:
+            from scipy.stats import qmc
+        except ImportError:
+            raise RuntimeError(f"The {kind} sampler needs scipy (pip install scipy)")
+        engine_class = qmc.LatinHypercube if kind == 'lhs' else qmc.Sobol
+        try:
+            self.engine = engine_class(dimensions, rng=rng)
+        except TypeError:
+            # scipy < 1.15 takes the generator as seed
+            self.engine = engine_class(dimensions, seed=rng)
+        self.kind = kind
+        self.dimensions = dimensions
+
+    def draw(self, n):
+        with warnings.catch_warnings():
+            # Sobol warns when n is not a power of two; the points are still valid
+            warnings.simplefilter('ignore', UserWarning)
+            return self.engine.random(n)
+
+def make_sampler(kind, dimensions, rng):
+    """A UnitSampler for 'lhs' or 'sobol', None for the plain random draws"""
+    kind = kind or DEFAULT_SAMPLER
+    if kind not in SAMPLERS:
+        raise ValueError(f"Unknown sampler: {kind} (expected one of {', '.join(SAMPLERS)})")
+    if kind == 'random':
+        return None
+    return UnitSampler(kind, dimensions, rng)
+
+def uniform_range(u, low, high):
+    """Map unit draws onto [low, high)"""
+    return low + (high - low) * u
+
+def driver_steps(u, variation=1):
+    """Map unit draws onto the integer steps -variation..+variation with equal probability"""
+    import numpy as np
+    steps = 2 * variation + 1
+    return np.minimum(np.floor(u * steps), steps - 1).astype(int) - variation
+
+# Iteration counts compared in the report (powers of two, where Sobol is balanced)
+REPORT_ITERATIONS = (256, 1024, 4096, 16384, 65536, 262144)
+REPORT_PERCENTILES = (10, 50, 90)
+
+def _percentiles(values, percentiles=REPORT_PERCENTILES):
+    from monte_carlo import summarize_samples
+    summary = summarize_samples(values, percentiles)
+    return [summary[f'p{p}'] for p in percentiles]
+
+def convergence_report(simulate, iterations=REPORT_ITERATIONS, repeats=20, reference_iterations=1 << 22, seed=0):
+    """Relative RMS error of p10/p50/p90 effort per sampler and iteration count
+
+    simulate(n, sampler_kind, rng) returns an effort sample array. The
+    reference percentiles come from one large Sobol run. For each sampler
+    the report also gives the iterations it needs to reach the error of the
+    random sampler at the largest count (log-log interpolation).
+    """
+    import numpy as np
+    seeds = np.random.SeedSequence(seed)
+    reference_seed, *run_seeds = seeds.spawn(1 + repeats)
+    reference = np.array(_percentiles(simulate(reference_iterations, 'sobol', np.random.default_rng(reference_seed))))
+
+    errors = {}
+    for kind in SAMPLERS:
+        errors[kind] = []
+        for n in iterations:
+            estimates = np.array([
+                _percentiles(simulate(n, kind, np.random.default_rng(run_seed))) for run_seed in run_seeds
+            ])
+            relative = (estimates - reference) / reference
+            errors[kind].append(float(np.sqrt(np.mean(relative ** 2))))
+
+    target = errors['random'][-1]
+    log_n = np.log(iterations)
+    report = {
+        'referenceIterations': reference_iterations,
+        'repeats': repeats,
+        'percentiles': list(REPORT_PERCENTILES),
+        'iterations': list(iterations),
+        'relativeRmsError': errors,
+        'targetError': target,
+        'iterationsForTarget': {},
+        'savings': {}
+    }
+    for kind, values in errors.items():
+        # Errors fall with n; interpolate where the curve crosses the target
+        log_error = np.log(values)
+        if values[-1] > target:
+            needed = None
+        elif values[0] <= target:
+            needed = iterations[0]
+        else:
+            needed = float(np.exp(np.interp(np.log(target), log_error[::-1], log_n[::-1])))
+        report['iterationsForTarget'][kind] = needed
+        report['savings'][kind] = iterations[-1] / needed if needed else None
+    return report
+
+def basic_simulator(size=50000, mode='organic'):
+    """Effort samples of monte_carlo.simulate_basic (COCOMO formula, no model)"""
+    from monte_carlo import simulate_basic
+    def simulate(n, kind, rng):
+        return simulate_basic(size, mode, n, None, rng, make_sampler(kind, 4, rng))['effort']
+    return simulate
+
+def advanced_simulator(size=120000):
+    """Effort samples of the advanced risk simulation with the served model"""
+    import model_store
+    from predict_advanced import advanced_model_path, simulate_risk_batch, SCALE_DRIVERS, COST_DRIVERS, DEFAULT_CHUNK_SIZE
+    model = model_store.get_model(advanced_model_path(DEFAULT_CHUNK_SIZE))
+    scale = [nominal for _, nominal in SCALE_DRIVERS]
+    cost = [3] * len(COST_DRIVERS)
+    dimensions = 1 + len(scale) + len(cost)
+    def simulate(n, kind, rng):
+        return simulate_risk_batch(size, scale, cost, model, n, rng, make_sampler(kind, dimensions, rng))['effort']
+    return simulate
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Convergence of the Monte Carlo samplers")
+    commands = parser.add_subparsers(dest='command', required=True)
+    report_parser = commands.add_parser('report', help="Percentile error per sampler and iteration count")
+    target = report_parser.add_mutually_exclusive_group()
+    target.add_argument('--basic', action='store_true', help="Basic COCOMO simulation (default)")
+    target.add_argument('--advanced', action='store_true', help="Advanced risk simulation with the served model")
+    report_parser.add_argument('--repeats', type=int, default=20, help="Independent runs per point")
+    report_parser.add_argument('--reference', type=int, help="Iterations of the reference run")
+    report_parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    try:
+        if args.advanced:
+            report = convergence_report(advanced_simulator(), repeats=args.repeats,
+                                        reference_iterations=args.reference or 1 << 20, seed=args.seed)
+        else:
+            report = convergence_report(basic_simulator(), repeats=args.repeats,
+                                        reference_iterations=args.reference or 1 << 22, seed=args.seed)
+        print(json.dumps(report, indent=2))
+    except Exception as e:
+        print(f"Error: {str(e)}", file=sys.stderr)
+        sys.exit(1)
@@ -0,0 +1,176 @@
+#!/usr/bin/env python3
+"""Sensitivity (tornado) analysis of the advanced COCOMO II model.
+
+Starting from one project's encoded driver vector, every scale and cost
+driver is moved to each rating 1..6 while the others stay put (21 x 6
+one-at-a-time rows). With "pairwise": true, every pair of drivers is also
+moved to the four combinations of its extreme ratings. All rows go to the
+model in a single predict call. The result ranks drivers by effort swing
+(tornado data) and pairs by interaction, the part of a pair's effort change
+that is not the sum of the two single changes.
+
+Parameters are those of predict_advanced plus:
+    pairwise   include the pairwise rows (default false)
+    top        number of pairs reported, largest |interaction| first (default 20)
+
+Usage: python sensitivity.py <json_params>
+"""
+import sys
+import json
+import itertools
+from datetime import datetime
+
+from predict_advanced import (
+    load_model, advanced_model_path, prepare_batch,
+    SCALE_DRIVERS, SCALE_VALUE_MAP, COST_DRIVERS, COST_VALUE_MAP, FEATURE_NAMES
+)
+from instrumentation import stage, request_timings
+from cocomo_formulas import formula_only, AdvancedFormulaModel
+
+# Ratings every driver is swept over (encoded values)
+LEVELS = (1, 2, 3, 4, 5, 6)
+
+DEFAULT_TOP_PAIRS = 20
+
+SCALE_RATINGS = {value: rating for rating, value in SCALE_VALUE_MAP.items()}
+COST_RATINGS = {value: rating for rating, value in COST_VALUE_MAP.items()}
+
+# (feature column, name, kind) of every driver
+DRIVERS = (
+    [(1 + i, name, 'scale') for i, (name, _) in enumerate(SCALE_DRIVERS)]
+    + [(1 + len(SCALE_DRIVERS) + i, name, 'cost') for i, name in enumerate(COST_DRIVERS)]
+)
+
+def rating_label(kind, value):
+    """Rating name of an encoded value, None for the fractional scale driver defaults"""
+    if float(value) != int(value):
+        return None
+    return (SCALE_RATINGS if kind == 'scale' else COST_RATINGS).get(int(value))
+
+def sensitivity_features(base, pairwise=False):
+    """Perturbed copies of one feature row
+
+    Returns the (N x 22) matrix and, per row, the list of (column, value)
+    changes it applies. Row 0 is the unchanged base.
+    """
+    import numpy as np
+    changes = [[]]
+    for column, _, _ in DRIVERS:
+        changes.extend([(column, level)] for level in LEVELS)
+    if pairwise:
+        extremes = (LEVELS[0], LEVELS[-1])
+        for (a, _, _), (b, _, _) in itertools.combinations(DRIVERS, 2):
+            changes.extend([(a, x), (b, y)] for x in extremes for y in extremes)
+
+    features = np.repeat(np.asarray(base, dtype=float)[np.newaxis, :], len(changes), axis=0)
+    for row, change in enumerate(changes):
+        for column, value in change:
+            features[row, column] = value
+    return features, changes
+
+def evaluated_rows(params):
+    """Rows of the single predict call of an analysis"""
+    rows = 1 + len(DRIVERS) * len(LEVELS)
+    if params.get('pairwise'):
+        rows += 4 * len(DRIVERS) * (len(DRIVERS) - 1) // 2
+    return rows
+
+def analyze_sensitivity(params, model):
+    """Tornado ranking (and optional pairwise interactions) for one project"""
+    import numpy as np
+    pairwise = bool(params.get('pairwise', False))
+    top = int(params.get('top', DEFAULT_TOP_PAIRS))
+
+    with stage('encode'):
+        base_features, sced = prepare_batch([params])
+        base = base_features[0]
+        features, changes = sensitivity_features(base, pairwise)
+
+    # Every perturbation in one call
+    with stage('predict'):
+        effort = np.asarray(model.predict(features), dtype=float) * (1 + sced[0] / 100)
+
+    base_effort = float(effort[0])
+    delta = effort - base_effort
+
+    with stage('rank'):
+        drivers = []
+        single = {}
+        for index, (column, name, kind) in enumerate(DRIVERS):
+            rows = slice(1 + index * len(LEVELS), 1 + (index + 1) * len(LEVELS))
+            efforts = effort[rows]
+            for level, value in zip(LEVELS, delta[rows]):
+                single[(column, level)] = value
+            low, high = int(np.argmin(efforts)), int(np.argmax(efforts))
+            drivers.append({
+                'driver': name,
+                'type': kind,
+                'baseline': float(base[column]),
+                'baselineRating': rating_label(kind, base[column]),
+                'lowEffort': float(efforts[low]),
+                'lowRating': rating_label(kind, LEVELS[low]),
+                'highEffort': float(efforts[high]),
+                'highRating': rating_label(kind, LEVELS[high]),
+                'swing': float(efforts[high] - efforts[low]),
+                'levels': [{
+                    'value': level,
+                    'rating': rating_label(kind, level),
+                    'effort': float(value),
+                    'delta': float(value - base_effort)
+                } for level, value in zip(LEVELS, efforts)]
+            })
+        drivers.sort(key=lambda entry: entry['swing'], reverse=True)
+
+        result = {
+            'baseEffort': base_effort,
+            'evaluations': len(changes),
+            'drivers': drivers
+        }
+
+        if pairwise:
+            start = 1 + len(DRIVERS) * len(LEVELS)
+            interactions = delta[start:] - np.array([
+                single[change[0]] + single[change[1]] for change in changes[start:]
+            ])
+            order = np.argsort(-np.abs(interactions), kind='stable')[:max(top, 0)]
+            kinds = {column: kind for column, _, kind in DRIVERS}
+            result['pairwise'] = [{
+                'drivers': [FEATURE_NAMES[column] for column, _ in changes[start + i]],
+                'ratings': [rating_label(kinds[column], value) for column, value in changes[start + i]],
+                'effort': float(effort[start + i]),
+                'delta': float(delta[start + i]),
+                'interaction': float(interactions[i])
+            } for i in order]
+
+    result['currentUser'] = 'Huy-VNNIC'
+    result['timestamp'] = datetime.utcnow().strftime('%Y-%m-%d %H:%M:%S')
+    return result
+
+def run_sensitivity(params):
+    """Run the sensitivity analysis and print the result as JSON"""
+    try:
+        with request_timings(params, 'sensitivity', startup=True) as timings:
+            if formula_only(params):
+                model = AdvancedFormulaModel()
+            else:
+                with stage('load_model'):
+                    model = load_model(advanced_model_path(evaluated_rows(params)))
+            result = analyze_sensitivity(params, model)
+
+        if timings is not None:
+            result['timings'] = timings.to_dict()
+
+        print(json.dumps(result))
+        return 0
+
+    except Exception as e:
+        print(f"Error in sensitivity analysis: {str(e)}", file=sys.stderr)
+        sys.exit(1)
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2:
+        print("Usage: python sensitivity.py <json_params>", file=sys.stderr)
+        sys.exit(1)
+
+    params = json.loads(sys.argv[1])
+    sys.exit(run_sensitivity(params))
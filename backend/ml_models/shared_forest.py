@@ -0,0 +1,224 @@
+#!/usr/bin/env python3
+"""Host the flattened advanced forest in shared memory for several workers.
+
+A host process flattens the forest once (forest_engine.flatten_forest),
+copies its node arrays into one multiprocessing.shared_memory segment and
+writes a small JSON descriptor naming the segment and the array offsets.
+Workers started with COCOMO_SHARED_FOREST=<descriptor> load the descriptor
+through model_store like any other model file and get a FlatForest whose
+arrays are read-only views of the segment. The tree data then exists once
+per host instead of once per worker.
+
+    python shared_forest.py host cocomo_advanced_model.pkl --workers 4 --socket-prefix /tmp/cocomo
+        hosts the segment, starts 4 `worker.py --socket /tmp/cocomo-<i>.sock`
+        processes attached to it and unlinks the segment when stopped
+    python shared_forest.py report <pid> [<pid> ...]
+        private vs shared memory of each process (Linux /proc)
+
+The segment is removed only by the host; attached processes just close
+their mapping. A worker can report its own memory with the 'memory' op.
+"""
+import sys
+import os
+import json
+import signal
+import argparse
+import subprocess
+import numpy as np
+
+from forest_engine import FlatForest, ARRAY_NAMES, flatten_forest
+
+DIRECTORY = os.path.dirname(os.path.abspath(__file__))
+
+# Environment variable naming the descriptor that workers attach to
+DESCRIPTOR_ENV = 'COCOMO_SHARED_FOREST'
+
+# Array offsets inside the segment are aligned to a cache line
+ALIGNMENT = 64
+
+def descriptor_path(model_path):
+    """Default descriptor file for a pickled model"""
+    return os.path.splitext(model_path)[0] + '.shm'
+
+def _align(offset):
+    return (offset + ALIGNMENT - 1) // ALIGNMENT * ALIGNMENT
+
+def share_forest(forest, name=None):
+    """Copy a FlatForest's arrays into a new shared memory segment
+
+    Returns the SharedMemory (the caller owns it and must unlink it) and the
+    JSON-ready descriptor needed to attach.
+    """
+    from multiprocessing import shared_memory
+    layout = {}
+    offset = 0
+    for array_name, array in forest.arrays().items():
+        array = np.ascontiguousarray(array)
+        offset = _align(offset)
+        layout[array_name] = {'offset': offset, 'dtype': array.dtype.str, 'shape': list(array.shape)}
+        offset += array.nbytes
+
+    segment = shared_memory.SharedMemory(name=name, create=True, size=max(offset, 1))
+    for array_name, array in forest.arrays().items():
+        entry = layout[array_name]
+        view = np.ndarray(entry['shape'], dtype=entry['dtype'], buffer=segment.buf, offset=entry['offset'])
+        view[...] = array
+
+    descriptor = {
+        'segment': segment.name,
+        'size': segment.size,
+        'n_features': forest.n_features_in_,
+        'arrays': layout
+    }
+    return segment, descriptor
+
+def attach(descriptor):
+    """FlatForest over read-only views of a hosted segment"""
+    from multiprocessing import shared_memory
+    segment = shared_memory.SharedMemory(name=descriptor['segment'])
+    # Before Python 3.13 attaching registers the segment with this process's
+    # resource tracker, which would unlink it when the process exits
+    if sys.version_info < (3, 13):
+        from multiprocessing import resource_tracker
+        resource_tracker.unregister(segment._name, 'shared_memory')
+
+    arrays = {}
+    for name in ARRAY_NAMES:
+        entry = descriptor['arrays'][name]
+        view = np.ndarray(entry['shape'], dtype=entry['dtype'], buffer=segment.buf, offset=entry['offset'])
+        view.flags.writeable = False
+        arrays[name] = view
+    forest = FlatForest(n_features=descriptor['n_features'], **arrays)
+    # The mapping lives as long as the forest
+    forest.segment = segment
+    return forest
+
+def load_descriptor(path):
+    """model_store loader for .shm descriptor files"""
+    with open(path) as f:
+        return attach(json.load(f))
+
+def write_descriptor(descriptor, path):
+    # Write then rename, so a worker never reads a half-written descriptor
+    temporary = f'{path}.tmp'
+    with open(temporary, 'w') as f:
+        json.dump(descriptor, f, indent=2)
+        f.write('\n')
+    os.replace(temporary, path)
+    return path
+
+def host_model(model_path, path=None):
+    """Flatten a pickled forest into shared memory and write its descriptor"""
+    import model_store
+    forest = flatten_forest(model_store.get_model(model_path))
+    segment, descriptor = share_forest(forest)
+    descriptor['model'] = os.path.abspath(model_path)
+    descriptor['modelVersion'] = model_store.model_version(model_path)
+    return segment, write_descriptor(descriptor, path or descriptor_path(model_path))
+
+MEMORY_FIELDS = ('Rss', 'Pss', 'Shared_Clean', 'Shared_Dirty', 'Private_Clean', 'Private_Dirty', 'Swap')
+
+def _parse_kb(lines):
+    fields = {}
+    for line in lines:
+        key, _, value = line.partition(':')
+        if key in MEMORY_FIELDS:
+            fields[key] = int(value.split()[0])
+    return fields
+
+def memory_report(pid=None, segment=None):
+    """Private, shared and proportional memory (kB) of a process, from /proc
+
+    With a segment name, also the part of it this process has mapped in.
+    """
+    pid = pid or os.getpid()
+    with open(f'/proc/{pid}/smaps_rollup') as f:
+        totals = _parse_kb(f)
+
+    report = {
+        'pid': pid,
+        'rssKb': totals.get('Rss', 0),
+        'pssKb': totals.get('Pss', 0),
+        'privateKb': totals.get('Private_Clean', 0) + totals.get('Private_Dirty', 0),
+        'sharedKb': totals.get('Shared_Clean', 0) + totals.get('Shared_Dirty', 0),
+        'swapKb': totals.get('Swap', 0)
+    }
+
+    if segment:
+        # The segment shows up as a /dev/shm mapping in the detailed smaps
+        mapped = {'Rss': 0, 'Pss': 0}
+        inside = False
+        with open(f'/proc/{pid}/smaps') as f:
+            for line in f:
+                first = line.split(None, 1)[0]
+                if '-' in first and not first.endswith(':'):
+                    inside = line.rstrip().endswith('/' + segment.lstrip('/'))
+                elif inside:
+                    for key, value in _parse_kb([line]).items():
+                        if key in mapped:
+                            mapped[key] += value
+        report['segment'] = {'name': segment, 'rssKb': mapped['Rss'], 'pssKb': mapped['Pss']}
+
+    return report
+
+def start_workers(descriptor_file, count, socket_prefix):
+    """Start worker.py processes on Unix sockets, attached to the hosted forest"""
+    env = dict(os.environ, **{DESCRIPTOR_ENV: os.path.abspath(descriptor_file)})
+    return [
+        subprocess.Popen(
+            [sys.executable, os.path.join(DIRECTORY, 'worker.py'), '--socket', f'{socket_prefix}-{i}.sock'],
+            env=env
+        )
+        for i in range(count)
+    ]
+
+def host(model_path, workers=0, socket_prefix=None, path=None):
+    """Host the forest until SIGTERM/SIGINT, optionally with attached workers"""
+    # Background shells start us with SIGINT ignored; handle both explicitly
+    for signum in (signal.SIGINT, signal.SIGTERM):
+        signal.signal(signum, lambda signum, frame: sys.exit(0))
+
+    segment, descriptor_file = host_model(model_path, path)
+    processes = []
+    try:
+        print(json.dumps({'descriptor': descriptor_file, 'segment': segment.name, 'bytes': segment.size}), flush=True)
+        if workers:
+            processes = start_workers(descriptor_file, workers, socket_prefix)
+            print(json.dumps({'workers': [process.pid for process in processes]}), flush=True)
+        signal.pause()
+    finally:
+        # SIGINT lets each worker remove its socket on the way out
+        for process in processes:
+            process.send_signal(signal.SIGINT)
+        for process in processes:
+            process.wait()
+        os.unlink(descriptor_file)
+        segment.close()
+        segment.unlink()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Shared-memory hosting of the flattened advanced forest")
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    host_parser = commands.add_parser('host', help="Load the forest into shared memory and keep it there")
+    host_parser.add_argument('model', help="Pickled forest (e.g. cocomo_advanced_model.pkl)")
+    host_parser.add_argument('--descriptor', help="Descriptor file (default: <model>.shm)")
+    host_parser.add_argument('--workers', type=int, default=0, help="Worker processes to start attached")
+    host_parser.add_argument('--socket-prefix', default='/tmp/cocomo-worker',
+                             help="Workers listen on <prefix>-<i>.sock")
+
+    report_parser = commands.add_parser('report', help="Private vs shared memory of processes")
+    report_parser.add_argument('pids', type=int, nargs='+')
+    report_parser.add_argument('--segment', help="Also report this shared memory segment's mapped size")
+    args = parser.parse_args()
+
+    try:
+        if args.command == 'host':
+            host(args.model, args.workers, args.socket_prefix, args.descriptor)
+        else:
+            print(json.dumps([memory_report(pid, args.segment) for pid in args.pids], indent=2))
+    except KeyboardInterrupt:
+        pass
+    except Exception as e:
+        print(f"Error: {str(e)}", file=sys.stderr)
+        sys.exit(1)
@@ -0,0 +1,73 @@
+#!/usr/bin/env python3
+"""Batched Monte Carlo runner with running quantiles and early stopping.
+
+run_streaming() draws samples batch by batch and folds each batch into a
+QuantileSketch per output, so memory does not grow with the iteration
+count. After every batch it compares p10/p50/p90 of the checked outputs
+with the previous batch and stops once the largest relative change has
+stayed within the requested tolerance for `patience` batches in a row.
+"""
+DEFAULT_BATCH_SIZE = 10000
+DEFAULT_TOLERANCE = 0.01
+
+# Percentiles that must be stable before a run stops early
+CHECK_PERCENTILES = (10, 50, 90)
+
+# Consecutive stable batches required to stop
+DEFAULT_PATIENCE = 2
+
+def _relative_change(current, previous):
+    change = 0.0
+    for name, values in current.items():
+        for value, before in zip(values, previous[name]):
+            scale = max(abs(before), 1e-12)
+            change = max(change, abs(value - before) / scale)
+    return change
+
+def run_streaming(draw_batch, percentiles, max_iterations, batch_size=DEFAULT_BATCH_SIZE,
+                  tolerance=DEFAULT_TOLERANCE, patience=DEFAULT_PATIENCE, check=('effort', 'schedule'),
+                  relative_accuracy=None, on_progress=None):
+    """Run draw_batch(n) until the checked percentiles are stable or max_iterations is reached
+
+    draw_batch returns a dict of sample arrays; percentiles maps each output name
+    to the percentiles reported for it. on_progress, if given, receives a snapshot
+    dict after every batch.
+    """
+    from quantile_sketch import QuantileSketch, DEFAULT_RELATIVE_ACCURACY
+    
+    sketches = {name: QuantileSketch(relative_accuracy or DEFAULT_RELATIVE_ACCURACY) for name in percentiles}
+    batch_size = max(1, int(batch_size))
+
+    iterations = 0
+    previous = None
+    stable_batches = 0
+    converged = False
+    while iterations < max_iterations:
+        n = min(batch_size, max_iterations - iterations)
+        samples = draw_batch(n)
+        for name, sketch in sketches.items():
+            sketch.add(samples[name])
+        iterations += n
+
+        current = {
+            name: [sketches[name].quantile(p / 100) for p in CHECK_PERCENTILES]
+            for name in check
+        }
+        change = _relative_change(current, previous) if previous is not None else None
+
+        if on_progress is not None:
+            snapshot = {'type': 'progress', 'iterations': iterations, 'change': change}
+            for name, values in current.items():
+                snapshot[name] = {f'p{p}': value for p, value in zip(CHECK_PERCENTILES, values)}
+            on_progress(snapshot)
+
+        stable_batches = stable_batches + 1 if change is not None and change <= tolerance else 0
+        if stable_batches >= patience:
+            converged = True
+            break
+        previous = current
+
+    result = {name: sketch.summary(percentiles[name]) for name, sketch in sketches.items()}
+    result['iterations'] = iterations
+    result['converged'] = converged
+    return result
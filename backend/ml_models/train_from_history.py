@@ -0,0 +1,224 @@
+#!/usr/bin/env python3
+"""Train an advanced effort model from historical project data.
+
+Rows are read from CSV or Parquet in chunks, mapped to the 22 features of
+predict_advanced (size, scale drivers, cost drivers, in that order) and fed
+to IncrementalEffortRegressor.partial_fit, so memory is bounded by the chunk
+size whatever the size of the file. Driver columns hold the same rating
+labels as the API ('Nominal', 'High', ...); --column renames source
+columns, e.g. --column effort=actual_pm.
+
+Each chunk is scored before the model learns from it, which gives a
+progressive validation error without a separate holdout. A JSON report
+with rows/sec and peak RSS is printed at the end.
+
+The model takes the advanced model's inputs, so its registry schema
+(<output>.schema.json) is a copy of cocomo_advanced_model.schema.json and
+model_registry serves it under the output file's name.
+
+Usage: python train_from_history.py history.csv [--format csv|parquet] [--chunk-size N]
+                                     [--epochs N] [--column FEATURE=SOURCE] [--output model.pkl]
+"""
+import sys
+import os
+import csv
+import json
+import time
+import pickle
+import hashlib
+import argparse
+import itertools
+import resource
+
+import numpy as np
+
+from predict_advanced import prepare_batch, size_error, FEATURE_NAMES, MODEL_PATH
+from model_registry import schema_path
+from predict_batch import csv_row_to_params
+from incremental_regressor import IncrementalEffortRegressor, DEFAULT_SGD_PARAMS
+from create_dummy_model import write_manifest
+
+DEFAULT_CHUNK_SIZE = 50000
+
+# Column holding the actual effort in person-months
+TARGET_COLUMN = 'effort'
+
+def read_csv_chunks(path, chunk_size):
+    """Lists of row dicts from a CSV file with a header row"""
+    with open(path, newline='') as f:
+        rows = csv.DictReader(f)
+        while True:
+            chunk = list(itertools.islice(rows, chunk_size))
+            if not chunk:
+                break
+            yield chunk
+
+def read_parquet_chunks(path, chunk_size):
+    """Lists of row dicts from a Parquet file, one record batch at a time"""
+    try:
+        import pyarrow.parquet as pq
+    except ImportError:
+        raise RuntimeError("Reading Parquet needs pyarrow (pip install pyarrow)")
+    for batch in pq.ParquetFile(path).iter_batches(batch_size=chunk_size):
+        yield batch.to_pylist()
+
+CHUNK_READERS = {
+    'csv': read_csv_chunks,
+    'parquet': read_parquet_chunks
+}
+
+def rename_columns(row, column_map):
+    """Expose source columns under the names csv_row_to_params expects"""
+    if not column_map:
+        return row
+    row = dict(row)
+    for feature, source in column_map.items():
+        if source in row:
+            row[feature] = row[source]
+    return row
+
+def encode_chunk(rows, column_map=None):
+    """Feature matrix and pre-SCED effort targets for one chunk
+
+    Rows without a valid effort or a usable size are dropped; the third
+    value counts them: {'effort': n, 'size': n}.
+    """
+    params_list, targets = [], []
+    rejected = {'effort': 0, 'size': 0}
+    for row in rows:
+        row = rename_columns(row, column_map)
+        try:
+            effort = float(row.get(TARGET_COLUMN) or 0)
+        except ValueError:
+            effort = 0
+        if effort <= 0:
+            rejected['effort'] += 1
+            continue
+        # csv_row_to_params works on strings, as read from CSV
+        try:
+            params = csv_row_to_params({
+                key: '' if value is None else str(value) for key, value in row.items()
+            })
+        except ValueError:
+            # A numeric column that does not parse
+            params = {}
+        if size_error(params) is not None:
+            rejected['size'] += 1
+            continue
+        params_list.append(params)
+        targets.append(effort)
+
+    if not params_list:
+        return np.empty((0, len(FEATURE_NAMES))), np.empty(0), rejected
+
+    features, sced = prepare_batch(params_list)
+    # Predictions are scaled by (1 + sced / 100) afterwards, so learn the unscaled effort
+    return features, np.array(targets) / (1 + sced / 100), rejected
+
+def peak_rss_mb():
+    """Peak resident set size of this process in MiB"""
+    # ru_maxrss is in KiB on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+def train(path, input_format, chunk_size=DEFAULT_CHUNK_SIZE, epochs=1, column_map=None,
+          seed=42, **sgd_params):
+    """Fit an IncrementalEffortRegressor chunk by chunk, returns (model, report)"""
+    model = IncrementalEffortRegressor(random_state=seed, **sgd_params)
+    reader = CHUNK_READERS[input_format]
+
+    digest = hashlib.sha256()
+    rows = 0
+    skipped = {'effort': 0, 'size': 0}
+    abs_log_error = 0.0
+    scored = 0
+    start = time.perf_counter()
+
+    for epoch in range(epochs):
+        for chunk in reader(path, chunk_size):
+            X, y, rejected = encode_chunk(chunk, column_map)
+            if epoch == 0:
+                for reason, count in rejected.items():
+                    skipped[reason] += count
+                digest.update(X.tobytes())
+                digest.update(y.tobytes())
+            if len(y) == 0:
+                continue
+
+            # Score the chunk before learning from it (progressive validation, last epoch)
+            if epoch == epochs - 1 and model.n_features_in_ is not None:
+                abs_log_error += float(np.abs(np.log(model.predict(X)) - np.log(y)).sum())
+                scored += len(y)
+
+            model.partial_fit(X, y)
+            rows += len(y)
+
+    seconds = time.perf_counter() - start
+    report = {
+        'rows': rows // epochs,
+        'skipped': sum(skipped.values()),
+        'skippedNoEffort': skipped['effort'],
+        'skippedNoSize': skipped['size'],
+        'epochs': epochs,
+        'seconds': seconds,
+        'rowsPerSecond': rows / seconds if seconds > 0 else None,
+        'peakRssMb': peak_rss_mb(),
+        'meanAbsLogError': abs_log_error / scored if scored else None,
+        'dataSha256': digest.hexdigest()
+    }
+    return model, report
+
+def write_schema(model_path):
+    """Registry schema of a history model: the advanced model's, under this model's name"""
+    with open(schema_path(MODEL_PATH)) as f:
+        schema = json.load(f)
+    schema['name'] = os.path.splitext(os.path.basename(model_path))[0]
+    path = schema_path(model_path)
+    with open(path, 'w') as f:
+        json.dump(schema, f, indent=2)
+        f.write('\n')
+    return path
+
+def parse_column(value):
+    feature, sep, source = value.partition('=')
+    if not sep or not feature or not source:
+        raise argparse.ArgumentTypeError("expected FEATURE=SOURCE")
+    return feature, source
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Train an effort model from historical projects, chunk by chunk")
+    parser.add_argument('input', help="CSV or Parquet file of past projects")
+    parser.add_argument('--format', choices=sorted(CHUNK_READERS), help="Input format (default: from file extension)")
+    parser.add_argument('--chunk-size', type=int, default=DEFAULT_CHUNK_SIZE, help="Rows per partial_fit call")
+    parser.add_argument('--epochs', type=int, default=1, help="Passes over the file")
+    parser.add_argument('--column', type=parse_column, action='append', default=[],
+                        help="Map a feature to a source column, e.g. effort=actual_pm (repeatable)")
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--alpha', type=float, default=DEFAULT_SGD_PARAMS['alpha'])
+    parser.add_argument('--eta0', type=float, default=DEFAULT_SGD_PARAMS['eta0'])
+    parser.add_argument('--output', default=os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                                         'cocomo_history_model.pkl'),
+                        help="Where to write the model (default: cocomo_history_model.pkl)")
+    args = parser.parse_args()
+
+    input_format = args.format
+    if input_format is None:
+        extension = os.path.splitext(args.input)[1].lstrip('.').lower()
+        input_format = 'parquet' if extension in ('parquet', 'pq') else 'csv'
+
+    try:
+        model, report = train(args.input, input_format, args.chunk_size, max(1, args.epochs),
+                              dict(args.column), args.seed, alpha=args.alpha, eta0=args.eta0)
+        if report['rows'] == 0:
+            raise ValueError(f"No rows with a positive '{TARGET_COLUMN}' column and a usable size")
+
+        with open(args.output, 'wb') as f:
+            pickle.dump(model, f)
+        write_manifest(args.output, model, report['dataSha256'], report['rows'], FEATURE_NAMES,
+                       model.get_params(), args.seed, report['seconds'])
+        write_schema(args.output)
+
+        report['model'] = args.output
+        print(json.dumps(report, indent=2))
+    except Exception as e:
+        print(f"Error training from history: {str(e)}", file=sys.stderr)
+        sys.exit(1)
@@ -0,0 +1,246 @@
+#!/usr/bin/env python3
+"""Long-lived prediction worker.
+
+Loads both COCOMO models once and serves newline-delimited JSON requests,
+either over stdin/stdout (default) or a Unix socket (--socket PATH).
+
+Request:  {"id": 1, "op": "advanced", "params": {...}}
+Response: {"id": 1, "ok": true, "result": {...}}
+          {"id": 1, "ok": false, "error": "..."}
+
+Requests may come from the network, so samplesOut files are only written
+inside COCOMO_SAMPLES_DIR; without it, exporting samples is left to the CLI
+scripts.
+"""
+import sys
+import json
+import os
+import argparse
+import socketserver
+
+import predict_basic
+import predict_advanced
+import monte_carlo
+import predict_batch
+import model_store
+import result_cache
+import effort_grid
+import sensitivity
+import optimizer
+import portfolio
+import model_registry
+from instrumentation import request_timings
+from cocomo_formulas import formula_only, BasicFormulaModel, AdvancedFormulaModel
+
+# Largest histogramBins a request may ask for
+MAX_HISTOGRAM_BINS = 1000
+
+class EstimationWorker:
+    """Holds the loaded models and dispatches requests to the estimation functions"""
+
+    def __init__(self):
+        # Fail fast at startup if a model cannot be loaded
+        predict_basic.load_model(predict_basic.basic_model_path())
+        predict_advanced.load_model(predict_advanced.advanced_model_path())
+        self.cache = result_cache.default_cache()
+        # Every registered model is loaded up front, so the first request to each is not a cold start
+        self.registry = model_registry.default_registry().preload()
+        self.handlers = {
+            'ping': lambda params: {'pong': True},
+            'basic': self.basic,
+            'advanced': self.advanced,
+            'monte-carlo': self.monte_carlo,
+            'batch': self.batch,
+            'sensitivity': self.sensitivity,
+            'optimize': self.optimize,
+            'portfolio': self.portfolio,
+            'models': lambda params: self.registry.describe(),
+            'predict': self.registry.predict,
+            'cache-stats': self.cache_stats,
+            'cache-clear': self.cache_clear,
+            'memory': self.memory
+        }
+
+    @property
+    def basic_model(self):
+        # The store returns the cached model and reloads it when the file changes
+        return model_store.get_model(predict_basic.basic_model_path())
+
+    def advanced_model(self, rows=1):
+        # The flattened forest for small batches, the pickle for bulk ones
+        return model_store.get_model(predict_advanced.advanced_model_path(rows))
+
+    def _model_version(self, model_path):
+        # Only hash the model file when results are actually cached
+        return model_store.model_version(model_path) if self.cache is not None else None
+
+    def basic(self, params):
+        if formula_only(params):
+            return predict_basic.estimate_basic(
+                float(params['size']),
+                params.get('mode', 'embedded'),
+                float(params.get('reliability', 1.15)),
+                float(params.get('complexity', 1.30)),
+                BasicFormulaModel()
+            )
+        model_path = predict_basic.basic_model_path()
+        return predict_basic.estimate_basic(
+            float(params['size']),
+            params.get('mode', 'embedded'),
+            float(params.get('reliability', 1.15)),
+            float(params.get('complexity', 1.30)),
+            model_store.get_model(model_path),
+            self.cache,
+            self._model_version(model_path)
+        )
+
+    def advanced(self, params):
+        self._check_samples_target(params)
+        if formula_only(params):
+            return predict_advanced.estimate_advanced(params, AdvancedFormulaModel())
+        model_path = predict_advanced.advanced_model_path(predict_advanced.request_rows(params))
+        model = model_store.get_model(model_path)
+        if params.get('interactive') and not params.get('riskAnalysis'):
+            # Slider what-ifs: answer from the precomputed grid when it matches the served model
+            grid = effort_grid.current_grid(model_path)
+            if grid is not None:
+                predictor = effort_grid.GridPredictor(
+                    grid, model, float(params.get('gridMaxError', effort_grid.DEFAULT_MAX_CELL_ERROR))
+                )
+                result = predict_advanced.estimate_advanced(params, predictor)
+                if predictor.hits:
+                    # Interpolated, not a model prediction: say so and how far off it may be
+                    result['approximate'] = True
+                    result['errorBound'] = predictor.error_bound
+                return result
+        return predict_advanced.estimate_advanced(params, model, self.cache, self._model_version(model_path))
+
+    def _check_samples_target(self, params):
+        bins = params.get('histogramBins')
+        if bins is not None and not 1 <= int(bins) <= MAX_HISTOGRAM_BINS:
+            raise ValueError(f"histogramBins must be between 1 and {MAX_HISTOGRAM_BINS}, got {bins}")
+        target = params.get('samplesOut')
+        if not target:
+            return
+        # stdout carries the worker protocol
+        if target == '-':
+            raise ValueError("samplesOut '-' is only supported by the CLI scripts; give a file path")
+        directory = os.environ.get('COCOMO_SAMPLES_DIR')
+        if not directory:
+            raise ValueError("samplesOut is only supported by the CLI scripts unless COCOMO_SAMPLES_DIR is set")
+        # Relative to the export directory, and never outside it
+        directory = os.path.realpath(directory)
+        path = os.path.realpath(os.path.join(directory, target))
+        if os.path.commonpath([directory, path]) != directory or path == directory:
+            raise ValueError(f"samplesOut must be a file inside COCOMO_SAMPLES_DIR, got {target}")
+        params['samplesOut'] = path
+
+    def monte_carlo(self, params):
+        self._check_samples_target(params)
+        return monte_carlo.run_monte_carlo(params, self.basic_model)
+
+    def batch(self, params):
+        projects = params.get('projects', [])
+        return {'results': predict_batch.estimate_batch(projects, self.advanced_model(len(projects)))}
+
+    def sensitivity(self, params):
+        if formula_only(params):
+            return sensitivity.analyze_sensitivity(params, AdvancedFormulaModel())
+        return sensitivity.analyze_sensitivity(params, self.advanced_model(sensitivity.evaluated_rows(params)))
+
+    def optimize(self, params):
+        if formula_only(params):
+            return optimizer.optimize_drivers(params, AdvancedFormulaModel())
+        return optimizer.optimize_drivers(params, self.advanced_model(optimizer.frontier_rows(params)))
+
+    def portfolio(self, params):
+        if formula_only(params):
+            return portfolio.simulate_portfolio(params, AdvancedFormulaModel())
+        return portfolio.simulate_portfolio(params, self.advanced_model(portfolio.chunk_rows(params)))
+
+    def cache_stats(self, params):
+        return self.cache.stats() if self.cache is not None else {'enabled': False}
+
+    def cache_clear(self, params):
+        if self.cache is not None:
+            self.cache.clear()
+        return self.cache_stats(params)
+
+    def memory(self, params):
+        # Private vs shared memory of this worker, including the hosted forest segment if attached
+        import shared_forest
+        model = self.advanced_model()
+        segment = model.segment.name if hasattr(model, 'segment') else None
+        return shared_forest.memory_report(segment=segment)
+
+    def handle(self, request):
+        """Run one request and build its response envelope"""
+        request_id = request.get('id')
+        try:
+            handler = self.handlers.get(request.get('op'))
+            if handler is None:
+                raise ValueError(f"Unknown op: {request.get('op')}")
+            params = request.get('params', {})
+            # Opt-in stage timings / cProfile dump for this one request
+            with request_timings(params, request.get('op')) as timings:
+                result = handler(params)
+            if timings is not None and isinstance(result, dict):
+                result['timings'] = timings.to_dict()
+            return {'id': request_id, 'ok': True, 'result': result}
+        except Exception as e:
+            return {'id': request_id, 'ok': False, 'error': str(e)}
+
+    def handle_line(self, line):
+        """Decode one JSON line and return the encoded response line"""
+        try:
+            request = json.loads(line)
+        except ValueError as e:
+            response = {'id': None, 'ok': False, 'error': f"Invalid JSON: {str(e)}"}
+        else:
+            response = self.handle(request)
+        return json.dumps(response) + '\n'
+
+def serve_stdio(worker):
+    """Serve requests from stdin, one JSON object per line"""
+    for line in sys.stdin:
+        if not line.strip():
+            continue
+        sys.stdout.write(worker.handle_line(line))
+        sys.stdout.flush()
+
+def serve_socket(worker, socket_path):
+    """Serve requests on a Unix socket, one connection per client"""
+    class Handler(socketserver.StreamRequestHandler):
+        def handle(self):
+            for line in self.rfile:
+                if not line.strip():
+                    continue
+                self.wfile.write(worker.handle_line(line).encode('utf-8'))
+                self.wfile.flush()
+
+    if os.path.exists(socket_path):
+        os.unlink(socket_path)
+    with socketserver.ThreadingUnixStreamServer(socket_path, Handler) as server:
+        server.daemon_threads = True
+        try:
+            server.serve_forever()
+        finally:
+            os.unlink(socket_path)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Persistent COCOMO prediction worker")
+    parser.add_argument('--socket', help="Listen on this Unix socket instead of stdin/stdout")
+    args = parser.parse_args()
+
+    worker = EstimationWorker()
+    try:
+        if args.socket:
+            serve_socket(worker, args.socket)
+        else:
+            serve_stdio(worker)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        # Monte Carlo runs with workers > 1 leave a process pool behind
+        import parallel_monte_carlo
+        parallel_monte_carlo.shutdown_pools()
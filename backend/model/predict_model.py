@@ -1,31 +1,28 @@
 import sys
+import os
 import json
-import pickle
-import numpy as np
-import pandas as pd
 
-# Đường dẫn đến file mô hình của bạn
-MODEL_PATH = './model/your_model.pkl'
+# Mô hình được tìm và mã hóa bởi model registry trong ml_models/
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'ml_models'))
+
+from model_registry import default_registry
+
+# Mô hình dùng khi input chỉ là một dict các feature
+DEFAULT_MODEL = 'linear_model_best'
 
 try:
-    # Load mô hình đã train
-    with open(MODEL_PATH, 'rb') as f:
-        model = pickle.load(f)
-    
     # Nhận dữ liệu từ Node.js
     input_json = sys.argv[1]
     input_data = json.loads(input_json)
-    
-    # Chuyển đổi input_data thành định dạng mà mô hình của bạn mong đợi
-    # Đoạn này cần điều chỉnh dựa trên cấu trúc mô hình và dữ liệu train của bạn
-    features = pd.DataFrame([input_data])
-    
-    # Thực hiện dự đoán
-    prediction = model.predict(features)[0]
-    
-    # Trả kết quả về cho Node.js
-    print(json.dumps(float(prediction)))
+
+    if 'model' in input_data:
+        # {"model", "version", "features" | "rows"}: trả về cả tên và phiên bản mô hình
+        print(json.dumps(default_registry().predict(input_data)))
+    else:
+        # Dạng cũ: dict các feature, trả về một số
+        prediction = default_registry().predict({'model': DEFAULT_MODEL, 'features': input_data})['prediction']
+        print(json.dumps(float(prediction)))
 
 except Exception as e:
     print(json.dumps({"error": str(e)}))
-    sys.exit(1)
\ No newline at end of file
+    sys.exit(1)
@@ -0,0 +1,133 @@
+const { spawn } = require('child_process');
+const path = require('path');
+const readline = require('readline');
+
+/**
+ * Client for the long-lived Python prediction worker (ml_models/worker.py).
+ * The worker is started lazily on the first request, keeps both models
+ * loaded, and is restarted automatically if it exits. A request that times
+ * out kills the worker, so a runaway job does not block every later request
+ * behind it on the single serial worker.
+ */
+class PythonWorker {
+  constructor(options = {}) {
+    this.pythonPath = options.pythonPath || process.env.PYTHON || 'python';
+    this.scriptPath = options.scriptPath || path.join(__dirname, 'ml_models', 'worker.py');
+    this.timeout = options.timeout || 60000;
+    this.process = null;
+    this.nextId = 1;
+    this.pending = new Map();
+  }
+
+  /**
+   * Start the worker process if it is not running
+   */
+  _ensureStarted() {
+    if (this.process) {
+      return;
+    }
+
+    const child = spawn(this.pythonPath, [this.scriptPath]);
+    this.process = child;
+
+    const lines = readline.createInterface({ input: child.stdout });
+    lines.on('line', (line) => this._onLine(line));
+
+    child.stderr.on('data', (data) => {
+      console.error(`Python Error: ${data}`);
+    });
+
+    child.on('error', (error) => this._onExit(child, error));
+    // EPIPE when a write lands after the worker died; unhandled it would crash the server
+    child.stdin.on('error', (error) => this._onExit(child, error));
+    child.on('close', (code) => {
+      this._onExit(child, new Error(`Python worker exited with code ${code}`));
+    });
+  }
+
+  /**
+   * Resolve the pending request matching a response line
+   */
+  _onLine(line) {
+    let response;
+    try {
+      response = JSON.parse(line);
+    } catch (error) {
+      console.error('Error parsing Python worker output:', error);
+      return;
+    }
+
+    const entry = this.pending.get(response.id);
+    if (!entry) {
+      return;
+    }
+    this.pending.delete(response.id);
+    clearTimeout(entry.timer);
+
+    if (response.ok) {
+      entry.resolve(response.result);
+    } else {
+      entry.reject(new Error(response.error));
+    }
+  }
+
+  /**
+   * Fail every in-flight request and allow the next request to respawn the worker
+   */
+  _onExit(child, error) {
+    if (this.process !== child) {
+      return;
+    }
+    this.process = null;
+    this._rejectAll(error);
+  }
+
+  /**
+   * Reject every in-flight request
+   */
+  _rejectAll(error) {
+    for (const entry of this.pending.values()) {
+      clearTimeout(entry.timer);
+      entry.reject(error);
+    }
+    this.pending.clear();
+  }
+
+  /**
+   * Send one request to the worker
+   * @param {string} op - Operation name (basic, advanced, monte-carlo)
+   * @param {Object} params - Parameters for the operation
+   * @return {Promise<Object>} Result object from the worker
+   */
+  request(op, params) {
+    this._ensureStarted();
+
+    const id = this.nextId++;
+    const child = this.process;
+    return new Promise((resolve, reject) => {
+      const timer = setTimeout(() => {
+        this.pending.delete(id);
+        reject(new Error(`Python worker timed out on ${op}`));
+        // The worker is still busy with this request: restart it rather than queue behind it
+        this._onExit(child, new Error(`Python worker restarted after ${op} timed out`));
+        child.kill();
+      }, this.timeout);
+
+      this.pending.set(id, { resolve, reject, timer });
+      child.stdin.write(JSON.stringify({ id, op, params }) + '\n');
+    });
+  }
+
+  /**
+   * Stop the worker process
+   */
+  close() {
+    if (this.process) {
+      this.process.stdin.end();
+      this.process = null;
+      this._rejectAll(new Error('Python worker closed'));
+    }
+  }
+}
+
+module.exports = PythonWorker;